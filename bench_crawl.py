@@ -0,0 +1,145 @@
+"""Offline throughput benchmark for web_sc.py against mock_eshop.py.
+
+Every (crawl mode, concurrency) pair runs in its own subprocess so peak
+memory and CPU time are measured per run, Chromium children included.
+
+    python bench_crawl.py --modes http,evaluate,browser --concurrency 1,4,8 \
+        --limit 300 --from-products eca_products --latency 80 --jitter 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import mock_eshop
+
+RESULT_PREFIX = "BENCH_RESULT "
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+def run_one(args):
+    import web_sc
+
+    workdir = args.workdir
+    web_sc.BASE_URL = args.base_url
+    web_sc.OUTPUT_DIR = os.path.join(workdir, "products")
+    web_sc.JSONL_FILENAME = os.path.join(workdir, "products.jsonl")
+    web_sc.STATE_FILENAME = os.path.join(workdir, "crawl_state.sqlite3")
+    web_sc.STORE_FILENAME = os.path.join(workdir, "products_store.sqlite3")
+    web_sc.RESUME = False
+    web_sc.CRAWL_MODE = args.mode
+    web_sc.CONCURRENCY = args.concurrency
+    web_sc.LIMIT_PRODUCTS = args.limit
+    web_sc.LIMIT_SUBCATEGORIES = None
+    web_sc.LIMIT_CATEGORY_ITEMS = None
+    # menu clicks only happen twice per run; don't let them dominate
+    web_sc.MIN_DELAY = web_sc.MAX_DELAY = 0
+    if args.pace_min_interval is not None:
+        web_sc.PACE_MIN_INTERVAL = args.pace_min_interval
+        web_sc.PACE_INITIAL_INTERVAL = max(args.pace_min_interval, web_sc.PACE_INITIAL_INTERVAL / 10)
+
+    started = time.perf_counter()
+    asyncio.run(web_sc.scrape())
+    wall = time.perf_counter() - started
+
+    latencies = [t for values in web_sc.extract_timings.values() for t in values]
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result = {
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "products": web_sc.product_counter,
+        "seconds": round(wall, 2),
+        "products_per_sec": round(web_sc.product_counter / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "extract_modes": {mode: len(values) for mode, values in web_sc.extract_timings.items()},
+        # ru_maxrss is in KiB on Linux; children is the largest single child
+        "max_rss_mb": round(own.ru_maxrss / 1024, 1),
+        "child_max_rss_mb": round(children.ru_maxrss / 1024, 1),
+        "cpu_seconds": round(own.ru_utime + own.ru_stime, 2),
+        "child_cpu_seconds": round(children.ru_utime + children.ru_stime, 2),
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+def run_matrix(args):
+    shop = mock_eshop.build_shop(args)
+    server, base_url = mock_eshop.start_server(shop)
+    total = sum(len(items) for subs in shop.catalog.values() for items in subs.values())
+    print(f"Mock e-shop: {total} products at {base_url}")
+
+    results = []
+    try:
+        for mode in args.modes.split(","):
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                with tempfile.TemporaryDirectory(prefix="bench_crawl_") as workdir:
+                    command = [
+                        sys.executable, os.path.abspath(__file__), "--run-one",
+                        "--mode", mode,
+                        "--concurrency", str(concurrency),
+                        "--limit", str(args.limit),
+                        "--base-url", base_url,
+                        "--workdir", workdir,
+                    ]
+                    if args.pace_min_interval is not None:
+                        command += ["--pace-min-interval", str(args.pace_min_interval)]
+                    print(f"\n▶ mode={mode} concurrency={concurrency}")
+                    proc = subprocess.run(command, capture_output=True, text=True, encoding="utf-8")
+                    lines = [l for l in proc.stdout.splitlines() if l.startswith(RESULT_PREFIX)]
+                    if proc.returncode != 0 or not lines:
+                        print(proc.stdout[-2000:])
+                        print(proc.stderr[-2000:])
+                        print(f"  run failed (exit {proc.returncode})")
+                        continue
+                    result = json.loads(lines[-1][len(RESULT_PREFIX):])
+                    results.append(result)
+                    print(
+                        f"  {result['products']} products in {result['seconds']}s "
+                        f"({result['products_per_sec']}/s), p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms"
+                    )
+    finally:
+        server.shutdown()
+
+    print(f"\n{'mode':<10}{'conc':>5}{'prod/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}{'child MB':>10}{'CPU s':>8}{'child CPU s':>13}")
+    for r in results:
+        print(
+            f"{r['mode']:<10}{r['concurrency']:>5}{r['products_per_sec']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+            f"{r['max_rss_mb']:>9}{r['child_max_rss_mb']:>10}{r['cpu_seconds']:>8}{r['child_cpu_seconds']:>13}"
+        )
+    print(f"mock server requests: {shop.requests}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r) + "\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="http,evaluate,browser")
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--limit", type=int, default=200, help="products per run")
+    parser.add_argument("--pace-min-interval", type=float, default=None,
+                        help="override web_sc.PACE_MIN_INTERVAL (seconds between request starts)")
+    parser.add_argument("--output", default="", help="write results as JSONL")
+    mock_eshop.add_shop_arguments(parser)
+    # internal: a single measured run inside a subprocess
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="http", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        args.concurrency = int(args.concurrency)
+        run_one(args)
+    else:
+        run_matrix(args)
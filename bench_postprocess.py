@@ -0,0 +1,88 @@
+"""Micro-benchmark for the crawler's post-processing stage.
+
+Rebuilds description HTML and raw product fields from the existing
+``eca_products`` TXT files, then times the old uncompiled clean_html
+against product_record.clean_html, and build_record inline against a
+process pool.
+
+    python bench_postprocess.py --input eca_products --repeat 5 --workers 4
+"""
+import argparse
+import html
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from mock_eshop import parse_product_txt
+from product_record import build_record, clean_html
+
+def clean_html_reference(html_text: str) -> str:
+    """clean_html as web_sc.py shipped it, for comparison."""
+    if not html_text:
+        return ""
+    text = re.sub(r'<br\s*/?>', '\n', html_text)
+    text = re.sub(r'</?p[^>]*>', '\n', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = html.unescape(text)
+    text = re.sub(r'\n\s*\n+', '\n\n', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    return text.strip()
+
+def load_products(root):
+    products = []
+    for path in sorted(Path(root).rglob("*.txt")):
+        if path.parent == Path(root):
+            continue  # scrape logs
+        item = parse_product_txt(path)
+        products.append((
+            {
+                "title": item["title"],
+                "price": item["price"],
+                "short_desc": item["short_desc"],
+                "desc_html": item["description"],
+                "specs": item["specs"],
+            },
+            f"https://eshop.eca.ir/{path.stem}",
+            path.parent.parent.name,
+            path.parent.name,
+        ))
+    return products
+
+def timed(label, fn, count):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36}{elapsed:>9.3f}s{elapsed / count * 1e6:>10.1f} µs/item")
+    return elapsed
+
+def build_inline(products):
+    return [build_record(*p, "out") for p in products]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default="eca_products")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    products = load_products(args.input) * args.repeat
+    descriptions = [p[0]["desc_html"] for p in products if p[0]["desc_html"]]
+    print(f"{len(products)} products, {len(descriptions)} descriptions "
+          f"({sum(map(len, descriptions)) / 1e6:.1f} MB of HTML)\n")
+
+    mismatches = sum(clean_html(d) != clean_html_reference(d) for d in descriptions)
+    print(f"clean_html parity: {len(descriptions) - mismatches}/{len(descriptions)} identical\n")
+
+    timed("clean_html (reference, re.sub)", lambda: [clean_html_reference(d) for d in descriptions], len(descriptions))
+    timed("clean_html (precompiled)", lambda: [clean_html(d) for d in descriptions], len(descriptions))
+    inline = timed("build_record inline", lambda: build_inline(products), len(products))
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(build_record, *zip(*products[:args.workers]), ["out"] * args.workers))  # warm up
+        pooled = timed(
+            f"build_record pool ({args.workers} workers)",
+            lambda: list(pool.map(build_record, *zip(*products), ["out"] * len(products), chunksize=64)),
+            len(products),
+        )
+    print(f"\npool speed-up: {inline / pooled:.2f}x")
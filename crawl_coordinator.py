@@ -0,0 +1,255 @@
+"""Sharded crawl: split web_sc's top-level categories across processes/hosts.
+
+Shards are claimed through lock files in a shared segments directory, so
+any number of worker processes on one host or on several hosts mounting the
+same directory can cooperate. Each shard is crawled by its own web_sc
+subprocess into ``<segments>/shard_XX/`` (TXT tree, JSONL, product store
+and crawl state), and ``merge`` folds the finished segments into the
+canonical tree, JSONL and product store.
+
+    # one host, 4 processes, 12 shards, then merge
+    python crawl_coordinator.py run --shards 12 --processes 4
+
+    # several hosts sharing /mnt/crawl
+    python crawl_coordinator.py worker --shards 12 --segments /mnt/crawl   # on every host
+    python crawl_coordinator.py merge --shards 12 --segments /mnt/crawl    # once, at the end
+
+Each shard process runs one Chromium and, with --postprocess-workers N, a
+pool of N processes cleaning descriptions, so the two settings multiply:
+--processes P starts P * (N + 1) Python processes. The default N = 0
+cleans inside the shard process, which already has a core of its own.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from product_store import ProductStore
+
+SEGMENTS_DIR = "crawl_segments"
+OUTPUT_DIR = "eca_products"
+JSONL_FILENAME = "products_dataset.jsonl"
+STORE_FILENAME = "products_store.sqlite3"
+STALE_CLAIM_HOURS = 1
+POSTPROCESS_WORKERS = 0  # per shard, see above; web_sc's default assumes one crawler per host
+HEARTBEAT_SECONDS = 60
+
+def shard_dir(segments, index):
+    return Path(segments) / f"shard_{index:02d}"
+
+def try_claim(segments, index, stale_after):
+    """Atomically claim a shard; stale claims of crashed workers are taken over."""
+    lock = Path(segments) / f"shard_{index:02d}.lock"
+    done = Path(segments) / f"shard_{index:02d}.done"
+    if done.exists():
+        return False
+    tombstone = None
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            stale = lock.stat()
+        except FileNotFoundError:
+            return False
+        if time.time() - stale.st_mtime < stale_after:
+            return False
+        # the shard keeps its crawl state, so a takeover resumes the crawl.
+        # Only one worker can link the stale lock to its tombstone name, and
+        # only that worker removes the lock, so a fresh lock of whoever took
+        # the shard over first is never deleted by a second worker.
+        tombstone = lock.with_name(f"{lock.name}.{stale.st_ino}-{stale.st_mtime_ns}.stale")
+        try:
+            os.link(lock, tombstone)
+        except (FileExistsError, FileNotFoundError):
+            return False
+        if tombstone.stat().st_ino != stale.st_ino:
+            # the lock was replaced after we looked at it
+            tombstone.unlink()
+            return False
+        lock.unlink()
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+    with os.fdopen(fd, "w") as f:
+        json.dump({"host": socket.gethostname(), "pid": os.getpid(), "claimed_at": time.time()}, f)
+    if tombstone is not None:
+        # it keeps the stale lock's inode from being reused until the new
+        # lock exists; a late linker now sees a different inode and backs off
+        tombstone.unlink(missing_ok=True)
+    return True
+
+def crawl_shard(index, shards, segments, limit, postprocess_workers=POSTPROCESS_WORKERS):
+    """Run one shard in a fresh process (web_sc keeps its run state in globals).
+
+    The claim's lock file is touched while the shard runs so other workers
+    don't mistake a long crawl for a crashed one.
+    """
+    command = [
+        sys.executable, os.path.abspath(__file__), "shard",
+        "--index", str(index), "--shards", str(shards),
+        "--segments", str(segments), "--postprocess-workers", str(postprocess_workers),
+    ]
+    if limit:
+        command += ["--limit", str(limit)]
+    lock = Path(segments) / f"shard_{index:02d}.lock"
+    proc = subprocess.Popen(command)
+    while True:
+        try:
+            return proc.wait(timeout=HEARTBEAT_SECONDS)
+        except subprocess.TimeoutExpired:
+            lock.touch()
+
+def run_shard(args):
+    import web_sc
+
+    out = shard_dir(args.segments, args.index).resolve()
+    out.mkdir(parents=True, exist_ok=True)
+    web_sc.SHARD_INDEX = args.index
+    web_sc.SHARD_COUNT = args.shards
+    web_sc.OUTPUT_DIR = str(out / "products")
+    web_sc.JSONL_FILENAME = str(out / "products.jsonl")
+    web_sc.STATE_FILENAME = str(out / "crawl_state.sqlite3")
+    web_sc.STORE_FILENAME = str(out / "products_store.sqlite3")
+    web_sc.LIMIT_PRODUCTS = args.limit
+    web_sc.POSTPROCESS_WORKERS = args.postprocess_workers
+    asyncio.run(web_sc.scrape())
+
+def run_worker(args):
+    """Claim and crawl shards until none are left."""
+    segments = Path(args.segments)
+    segments.mkdir(parents=True, exist_ok=True)
+    stale_after = args.stale_hours * 3600
+    limit = math.ceil(args.limit / args.shards) if args.limit else None
+
+    crawled = 0
+    for index in range(args.shards):
+        if not try_claim(segments, index, stale_after):
+            continue
+        print(f"[{socket.gethostname()}:{os.getpid()}] crawling shard {index + 1}/{args.shards}")
+        code = crawl_shard(index, args.shards, segments, limit, args.postprocess_workers)
+        if code == 0:
+            (segments / f"shard_{index:02d}.done").touch()
+            crawled += 1
+        else:
+            print(f"shard {index} failed with exit code {code}; it can be reclaimed after {args.stale_hours}h")
+    return crawled
+
+def merge_segments(segments, shards, output_dir, jsonl_path, store_path=STORE_FILENAME):
+    """Fold shard segments into the canonical TXT tree, one JSONL file and
+    the product store."""
+    segments = Path(segments)
+    missing = [i for i in range(shards) if not (segments / f"shard_{i:02d}.done").exists()]
+    if missing:
+        print(f"⚠️ shards not finished yet: {missing}")
+
+    records = {}
+    copied = stored = 0
+    store = ProductStore(str(store_path))
+    for index in range(shards):
+        seg = shard_dir(segments, index)
+        seg_store = seg / "products_store.sqlite3"
+        if seg_store.exists():
+            stored += store.merge_from(str(seg_store))
+        seg_jsonl = seg / "products.jsonl"
+        if seg_jsonl.exists():
+            with open(seg_jsonl, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        records[record["id"]] = record
+
+        seg_products = seg / "products"
+        if not seg_products.is_dir():
+            continue
+        for category in seg_products.iterdir():
+            if not category.is_dir():
+                continue
+            for path in category.rglob("*.txt"):
+                target = Path(output_dir) / path.relative_to(seg_products)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(path, target)
+                copied += 1
+    store.close()
+    # tombstones of takeovers that crashed before removing them
+    for tombstone in segments.glob("shard_*.lock.*.stale"):
+        tombstone.unlink(missing_ok=True)
+
+    ordered = sorted(records.values(), key=lambda r: (r["category"] or "", r["subcategory"] or "", r["id"]))
+    tmp_path = str(jsonl_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in ordered:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, jsonl_path)
+
+    print(f"✅ merged {len(ordered)} products into {jsonl_path}, {copied} TXT files into {output_dir}, "
+          f"{stored} store rows into {store_path}")
+    return len(ordered)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("--shards", type=int, default=8)
+        p.add_argument("--segments", default=SEGMENTS_DIR)
+
+    def crawling(p):
+        p.add_argument("--postprocess-workers", type=int, default=POSTPROCESS_WORKERS,
+                       help="cleaning processes per shard process (0: clean inline)")
+
+    p_run = sub.add_parser("run", help="crawl all shards with local processes, then merge")
+    common(p_run)
+    crawling(p_run)
+    p_run.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    p_run.add_argument("--limit", type=int, default=0, help="total product limit split across shards (0: no limit)")
+    p_run.add_argument("--stale-hours", type=float, default=STALE_CLAIM_HOURS)
+    p_run.add_argument("--output-dir", default=OUTPUT_DIR)
+    p_run.add_argument("--jsonl", default=JSONL_FILENAME)
+    p_run.add_argument("--store", default=STORE_FILENAME)
+
+    p_worker = sub.add_parser("worker", help="claim and crawl shards from a shared segments dir")
+    common(p_worker)
+    crawling(p_worker)
+    p_worker.add_argument("--limit", type=int, default=0)
+    p_worker.add_argument("--stale-hours", type=float, default=STALE_CLAIM_HOURS)
+
+    p_merge = sub.add_parser("merge", help="merge finished segments")
+    common(p_merge)
+    p_merge.add_argument("--output-dir", default=OUTPUT_DIR)
+    p_merge.add_argument("--jsonl", default=JSONL_FILENAME)
+    p_merge.add_argument("--store", default=STORE_FILENAME)
+
+    p_shard = sub.add_parser("shard", help=argparse.SUPPRESS)
+    common(p_shard)
+    crawling(p_shard)
+    p_shard.add_argument("--index", type=int, required=True)
+    p_shard.add_argument("--limit", type=int, default=0)
+
+    args = parser.parse_args()
+
+    if args.command == "shard":
+        args.limit = args.limit or None
+        run_shard(args)
+    elif args.command == "worker":
+        run_worker(args)
+    elif args.command == "merge":
+        merge_segments(args.segments, args.shards, args.output_dir, args.jsonl, args.store)
+    elif args.command == "run":
+        worker_cmd = [
+            sys.executable, os.path.abspath(__file__), "worker",
+            "--shards", str(args.shards), "--segments", args.segments,
+            "--limit", str(args.limit), "--stale-hours", str(args.stale_hours),
+            "--postprocess-workers", str(args.postprocess_workers),
+        ]
+        procs = [subprocess.Popen(worker_cmd) for _ in range(min(args.processes, args.shards))]
+        for proc in procs:
+            proc.wait()
+        merge_segments(args.segments, args.shards, args.output_dir, args.jsonl, args.store)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    parent TEXT,
+    category TEXT,
+    subcategory TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    product_id TEXT,
+    discovered_at REAL NOT NULL,
+    last_fetch REAL,
+    content_hash TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS urls_parent ON urls(parent);
+CREATE INDEX IF NOT EXISTS urls_kind_status ON urls(kind, status);
+"""
+
+def content_hash(data: dict) -> str:
+    """Stable hash of a record, independent of key order."""
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def stable_product_id(url: str) -> str:
+    """Product id derived from the URL, identical across runs, shards and hosts."""
+    return "prod_" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+class CrawlState:
+    """Persistent frontier and seen-URL store for web_sc.scrape().
+
+    Every discovered category, listing and product URL is a row with its
+    status, last fetch time and the hash of the last saved content, so an
+    interrupted crawl can resume and a refresh only re-fetches stale pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def discover(self, url, kind, parent=None, category=None, subcategory=None):
+        self.conn.execute(
+            """
+            INSERT INTO urls (url, kind, parent, category, subcategory, discovered_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                parent = excluded.parent,
+                category = excluded.category,
+                subcategory = excluded.subcategory
+            """,
+            (url, kind, parent, category, subcategory, time.time()),
+        )
+        self.conn.commit()
+
+    def is_fresh(self, url, max_age_seconds) -> bool:
+        row = self.conn.execute(
+            "SELECT status, last_fetch FROM urls WHERE url = ?", (url,)
+        ).fetchone()
+        if not row or row[0] != "done" or row[1] is None:
+            return False
+        if max_age_seconds is None:
+            return True
+        return time.time() - row[1] < max_age_seconds
+
+    def children(self, parent, kind):
+        """(url, category, subcategory) of the URLs of one kind discovered under a page."""
+        return self.conn.execute(
+            "SELECT url, category, subcategory FROM urls WHERE parent = ? AND kind = ? ORDER BY discovered_at",
+            (parent, kind),
+        ).fetchall()
+
+    def stored_hash(self, url):
+        row = self.conn.execute(
+            "SELECT content_hash FROM urls WHERE url = ?", (url,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def product_id(self, url) -> str:
+        product_id = stable_product_id(url)
+        self.conn.execute(
+            "UPDATE urls SET product_id = ? WHERE url = ?", (product_id, url)
+        )
+        return product_id
+
+    def mark_done(self, url, digest=None):
+        self.conn.execute(
+            """
+            UPDATE urls SET status = 'done', last_fetch = ?, error = NULL,
+                content_hash = COALESCE(?, content_hash)
+            WHERE url = ?
+            """,
+            (time.time(), digest, url),
+        )
+        self.conn.commit()
+
+    def mark_failed(self, url, error):
+        self.conn.execute(
+            """
+            UPDATE urls SET status = 'failed', attempts = attempts + 1, error = ?
+            WHERE url = ?
+            """,
+            (str(error)[:500], url),
+        )
+        self.conn.commit()
+
+    def count(self, kind, status=None) -> int:
+        if status is None:
+            query, params = "SELECT COUNT(*) FROM urls WHERE kind = ?", (kind,)
+        else:
+            query, params = "SELECT COUNT(*) FROM urls WHERE kind = ? AND status = ?", (kind, status)
+        return self.conn.execute(query, params).fetchone()[0]
+
+def compact_jsonl(path: str) -> int:
+    """Keep only the last record per URL in a JSONL file; returns records kept."""
+    records = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            records.pop(record["url"], None)
+            records[record["url"]] = record
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records.values():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    return len(records)
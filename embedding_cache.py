@@ -0,0 +1,220 @@
+"""Persistent, content-addressed cache of embedding vectors.
+
+Vectors live in one memory-mapped float32 matrix per model
+(``<cache_dir>/<model>.f32``); a small SQLite index maps
+sha1(normalized text) to a row of that matrix and tracks when the row was
+last used. When the matrix is full the least recently used rows are
+evicted in bulk. Ingest and query share the cache, so boilerplate chunks
+and repeated questions skip the transformer entirely.
+
+    from embedding_cache import with_cache
+    embedding = with_cache(HuggingFaceEmbeddings(...), MODEL_NAME)
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "embedding_cache")  # "" disables the cache
+CACHE_MAX_MB = int(os.environ.get("EMBEDDING_CACHE_MB", "256"))
+EVICT_FRACTION = 0.1  # share of the matrix freed at once when it is full
+SQL_BATCH = 500  # keys per IN (...) lookup
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vectors (
+    hash TEXT PRIMARY KEY,
+    slot INTEGER NOT NULL UNIQUE,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors(last_used);
+CREATE TABLE IF NOT EXISTS free_slots (
+    slot INTEGER PRIMARY KEY
+);
+"""
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+def model_key(model_name: str) -> str:
+    """"sentence-transformers/x" and "models_cache/x" name the same model."""
+    return model_name.replace("\\", "/").rstrip("/").split("/")[-1]
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, cache_dir: str = CACHE_DIR, max_mb: int = CACHE_MAX_MB):
+        self.model = model_key(model_name)
+        os.makedirs(cache_dir, exist_ok=True)
+        base = os.path.join(cache_dir, self.model)
+        self.matrix_path = base + ".f32"
+        # autocommit; writes take an explicit IMMEDIATE transaction. The
+        # service embeds queries on its request threads, so one connection is
+        # shared across threads behind a lock.
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(base + ".sqlite3", timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.matrix = None
+        self.dim = self.capacity = None
+        self.hits = self.misses = 0
+        self._open()
+
+    def _open(self):
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        if "dim" in meta and os.path.exists(self.matrix_path):
+            self.dim = int(meta["dim"])
+            self.capacity = int(meta["capacity"])
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+    def _create(self, dim):
+        # the size is fixed at creation; changing max_mb later needs a fresh cache dir
+        self.dim = dim
+        self.capacity = max(1, self.max_bytes // (dim * 4))
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="w+", shape=(self.capacity, self.dim))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [("dim", str(dim)), ("capacity", str(self.capacity)), ("next_slot", "0")],
+        )
+        self.conn.execute("DELETE FROM vectors")
+        self.conn.execute("DELETE FROM free_slots")
+
+    def get_many(self, texts):
+        """Cached vector (a list) or None for every text."""
+        with self.lock:
+            return self._get_many(texts)
+
+    def _get_many(self, texts):
+        if self.matrix is None:
+            self._open()
+        keys = [text_key(t) for t in texts]
+        slots = {}
+        if self.matrix is not None:
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), SQL_BATCH):
+                part = unique[i:i + SQL_BATCH]
+                slots.update(self.conn.execute(
+                    f"SELECT hash, slot FROM vectors WHERE hash IN ({','.join('?' * len(part))})", part
+                ))
+        results = [self.matrix[slots[k]].tolist() if k in slots else None for k in keys]
+        if slots:
+            now = time.time()
+            self.conn.executemany("UPDATE vectors SET last_used = ? WHERE hash = ?", [(now, k) for k in slots])
+        found = sum(1 for r in results if r is not None)
+        self.hits += found
+        self.misses += len(results) - found
+        return results
+
+    def _allocate(self, count):
+        slots = [s for (s,) in self.conn.execute("SELECT slot FROM free_slots ORDER BY slot LIMIT ?", (count,))]
+        self.conn.executemany("DELETE FROM free_slots WHERE slot = ?", [(s,) for s in slots])
+
+        next_slot = int(self.conn.execute("SELECT value FROM meta WHERE key = 'next_slot'").fetchone()[0])
+        fresh = min(count - len(slots), self.capacity - next_slot)
+        slots += range(next_slot, next_slot + fresh)
+        self.conn.execute("UPDATE meta SET value = ? WHERE key = 'next_slot'", (str(next_slot + fresh),))
+
+        if len(slots) < count:
+            evict = max(count - len(slots), int(self.capacity * EVICT_FRACTION))
+            rows = self.conn.execute(
+                "SELECT hash, slot FROM vectors ORDER BY last_used LIMIT ?", (evict,)
+            ).fetchall()
+            self.conn.executemany("DELETE FROM vectors WHERE hash = ?", [(h,) for h, _ in rows])
+            freed = [s for _, s in rows]
+            needed = count - len(slots)
+            slots += freed[:needed]
+            self.conn.executemany("INSERT INTO free_slots (slot) VALUES (?)", [(s,) for s in freed[needed:]])
+        return slots
+
+    def put_many(self, texts, vectors):
+        entries = {}
+        for text, vector in zip(texts, vectors):
+            entries[text_key(text)] = vector
+        if not entries:
+            return
+        with self.lock:
+            self._put_many(entries)
+
+    def _put_many(self, entries):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.matrix is None:
+                self._open()
+            if self.matrix is None:
+                self._create(len(next(iter(entries.values()))))
+            known = set()
+            keys = list(entries)
+            for i in range(0, len(keys), SQL_BATCH):
+                part = keys[i:i + SQL_BATCH]
+                known.update(h for (h,) in self.conn.execute(
+                    f"SELECT hash FROM vectors WHERE hash IN ({','.join('?' * len(part))})", part
+                ))
+            keys = [k for k in keys if k not in known][:self.capacity]
+            slots = self._allocate(len(keys))
+            for key, slot in zip(keys, slots):
+                self.matrix[slot] = entries[key]
+            self.matrix.flush()
+            now = time.time()
+            self.conn.executemany(
+                "INSERT INTO vectors (hash, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for key, slot in zip(keys, slots)],
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> dict:
+        with self.lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        return {"model": self.model, "entries": size, "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self.lock:
+            if self.matrix is not None:
+                self.matrix.flush()
+            self.conn.close()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the wrapped model."""
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            computed = dict(zip(missing, self.inner.embed_documents(missing)))
+            self.cache.put_many(missing, [computed[t] for t in missing])
+            vectors = [v if v is not None else computed[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def embed_query(self, text):
+        vector = self.cache.get_many([text])[0]
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self.cache.put_many([text], [vector])
+        return vector
+
+    def __getattr__(self, name):
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+def with_cache(embedding: Embeddings, model_name: str, cache_dir: str = CACHE_DIR) -> Embeddings:
+    """Wrap `embedding` in the on-disk cache unless it is disabled."""
+    if not cache_dir:
+        return embedding
+    return CachedEmbeddings(embedding, EmbeddingCache(model_name, cache_dir))
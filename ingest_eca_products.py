@@ -1,126 +1,542 @@
 # -*- coding: utf-8 -*-
 
+import argparse
+import glob
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 
+from embedding_cache import with_cache
+from lexical_index import open_index
+from product_record import DESCRIPTION_HEAD, description_head
+import spec_index
+import vector_index
+from query_cache import bump_store_version
+
 BASE_DIR = "eca_products_merged"  # مسیر رو اصلاح کردم
+PRODUCT_STORE = os.environ.get("PRODUCT_STORE", "")  # products_store.sqlite3 → بدون merge مستقیم از store
+JSONL_GLOB = "products_dataset*.jsonl"  # خروجی JSONL خود web_sc
+# "merged" | "store" | "jsonl"; empty: the store when PRODUCT_STORE is set, else the merged files
+INGEST_SOURCE = os.environ.get("INGEST_SOURCE", "")
+PERSIST_DIRECTORY = "eca_products_vector_db"
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")  # "onnx": int8 model from onnx_embedding.py
+
+# chunks per embed + upsert round; memory stays bounded by this, not the catalog
+BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "64"))
+# 0: embed in this process; N: N worker processes, each with its own model copy
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", "0"))
+PROGRESS_EVERY = 10  # batches
+PRODUCT_CHUNK_SIZE = 1200  # a product up to this size stays one chunk, full description included
+GET_PAGE_SIZE = 5000  # ids read per page when diffing against the existing store
+MERGE_SEPARATOR = "=" * 120  # between products in the merged files
+
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=800,
+    chunk_overlap=100,
+    length_function=len,
+    separators=["\n\n", "\n", " ", ""]
+)
 
 # -----------------------------
-# Load TXT documents
+# Load TXT documents (streamed, one at a time)
 # -----------------------------
-documents: list[Document] = []
-
-print(f"Checking directory: {BASE_DIR}")
-if not os.path.exists(BASE_DIR):
-    print(f"❌ Directory {BASE_DIR} does not exist!")
-    exit(1)
-
-for category in os.listdir(BASE_DIR):
-    category_path = os.path.join(BASE_DIR, category)
-
-    if not os.path.isdir(category_path):
-        continue
-
-    print(f"Processing category: {category}")
-    
-    for filename in os.listdir(category_path):
-        if filename.endswith(".txt"):
-            file_path = os.path.join(category_path, filename)
-
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    text = f.read()
-
-                documents.append(
-                    Document(
-                        page_content=text,
-                        metadata={
-                            "category": category,
-                            "source": filename,
-                        }
-                    )
+def iter_store_documents(path):
+    """One document per subcategory, rendered exactly like the merged file
+    merge_all_categories.py writes from the same store, so switching the
+    ingest source between the two keeps the chunk ids.
+
+    The store yields products ordered by subcategory, so only the current
+    subcategory is held in memory.
+    """
+    from product_record import clean_content, clean_name, render_txt
+    from product_store import ProductStore
+
+    store = ProductStore(path)
+    current, texts = None, []
+    try:
+        for product in store.iter_products():
+            key = (clean_name(product["category"]), clean_name(product["subcategory"]))
+            if key != current and texts:
+                yield store_document(current, texts)
+                texts = []
+            current = key
+            content = clean_content(render_txt(
+                product["url"], product["title"], product["price"],
+                product["short_desc"], product["specs"], product["description"],
+            ))
+            if content:
+                texts.append(content)
+        if texts:
+            yield store_document(current, texts)
+    finally:
+        store.close()
+
+def store_document(key, texts):
+    from product_record import MERGED_SEPARATOR
+
+    category, subcategory = key
+    return Document(
+        page_content=MERGED_SEPARATOR.join(texts),
+        metadata={
+            "category": category,
+            "source": f"{subcategory}_merged.txt",
+        }
+    )
+
+def iter_dir_documents(base_dir=BASE_DIR):
+    print(f"Checking directory: {base_dir}")
+    if not os.path.exists(base_dir):
+        print(f"❌ Directory {base_dir} does not exist!")
+        return
+
+    for category in sorted(os.listdir(base_dir)):
+        category_path = os.path.join(base_dir, category)
+
+        if not os.path.isdir(category_path):
+            continue
+
+        print(f"Processing category: {category}")
+
+        for filename in sorted(os.listdir(category_path)):
+            if filename.endswith(".txt"):
+                file_path = os.path.join(category_path, filename)
+
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                except Exception as e:
+                    print(f"  Error loading {filename}: {e}")
+                    continue
+
+                yield Document(
+                    page_content=text,
+                    metadata={
+                        "category": category,
+                        "source": filename,
+                    }
                 )
-                print(f"  Loaded: {filename}")
-            except Exception as e:
-                print(f"  Error loading {filename}: {e}")
 
-print(f"\n✅ Loaded documents: {len(documents)}")
+# -----------------------------
+# Split documents into chunks with deterministic ids
+# -----------------------------
+def chunk_id(key, position, digest):
+    """Stable id: the same chunk text at the same place keeps its id across runs."""
+    return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}:{position}:{digest[:16]}"
+
+def with_id(chunk, key, position):
+    digest = hashlib.sha1(chunk.page_content.encode("utf-8")).hexdigest()
+    chunk.metadata["chunk"] = position
+    chunk.metadata["content_hash"] = digest
+    chunk.id = chunk_id(key, position, digest)
+    return chunk
 
-if len(documents) == 0:
-    print("❌ No documents loaded! Exiting.")
-    exit(1)
+def iter_chunks(documents):
+    for document in documents:
+        key = f"{document.metadata.get('category')}/{document.metadata.get('source')}"
+        for position, chunk in enumerate(text_splitter.split_documents([document])):
+            yield with_id(chunk, key, position)
 
 # -----------------------------
-# Split documents
+# Product-level chunks straight from the crawler's JSONL
 # -----------------------------
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=800,
-    chunk_overlap=100,
-    length_function=len,
-    separators=["\n\n", "\n", " ", ""]
-)
+def product_chunks(record):
+    """One chunk per product; only the part of a long description that
+    combined_text leaves out is split into extra chunks."""
+    from product_record import clean_name
+
+    title = record.get("title") or ""
+    description = record.get("description") or ""
+    head = record.get("combined_text") or f"عنوان: {title}"
+    price = f". قیمت: {record['price']}" if record.get("price") else ""
+    metadata = {
+        "category": clean_name(record.get("category")),
+        # same source names as the merged files, so rag_system's filters keep working
+        "source": f"{clean_name(record.get('subcategory'))}_merged.txt",
+        "url": record["url"],
+        "title": title,
+        "price": record.get("price") or "",
+        "specs": json.dumps(record.get("specs") or {}, ensure_ascii=False),
+    }
+    if record.get("id"):
+        metadata["product_id"] = record["id"]
+
+    # combined_text ends with the head of the description (records written
+    # before description_head existed: cut at DESCRIPTION_HEAD, maybe inside
+    # a word); it is re-cut before a word and the rest continues it. Records
+    # without it get the description labelled.
+    covered = 0
+    if description:
+        cut = description_head(description)
+        for old in (cut, description[:DESCRIPTION_HEAD]):
+            if head.endswith(old):
+                head, covered = head[:len(head) - len(old)] + cut, len(cut)
+                break
+    rest = description[covered:]
+    if rest.strip():
+        addition = rest if covered else f". توضیحات: {rest}"
+        if len(head) + len(addition) + len(price) <= PRODUCT_CHUNK_SIZE:
+            head += addition
+            rest = ""
+    yield Document(page_content=head.rstrip() + price, metadata=metadata)
+
+    if rest.strip():
+        for part in text_splitter.split_text(rest):
+            yield Document(page_content=f"عنوان: {title}. توضیحات: {part}", metadata=dict(metadata))
+
+def iter_jsonl_records(pattern=JSONL_GLOB):
+    """The last record per URL across every matching JSONL file.
+
+    The first pass only remembers where each URL's last record is, so
+    memory stays proportional to the number of products, not their text.
+    """
+    paths = sorted(glob.glob(pattern))
+    latest = {}
+    for n, path in enumerate(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                try:
+                    latest[json.loads(line)["url"]] = (n, i)
+                except (ValueError, KeyError):
+                    continue
+    print(f"Reading {len(latest)} products from {len(paths)} JSONL file(s)")
+
+    for n, path in enumerate(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if latest.get(record.get("url")) == (n, i):
+                    yield record
+
+def iter_jsonl_chunks(pattern=JSONL_GLOB):
+    for record in iter_jsonl_records(pattern):
+        for position, chunk in enumerate(product_chunks(record)):
+            yield with_id(chunk, record["url"], position)
 
-chunks = text_splitter.split_documents(documents)
+def default_source():
+    return "store" if PRODUCT_STORE and os.path.exists(PRODUCT_STORE) else "merged"
 
-print(f"📄 Total chunks: {len(chunks)}")
+def iter_source_chunks(source=INGEST_SOURCE):
+    source = source or default_source()
+    print(f"Ingest source: {source}")
+    if source == "jsonl":
+        return iter_jsonl_chunks()
+    if source == "store":
+        return iter_chunks(iter_store_documents(PRODUCT_STORE))
+    return iter_chunks(iter_dir_documents())
 
 # -----------------------------
-# Embedding model (HuggingFace - local)
+# Product records for the spec index
 # -----------------------------
-print("🔄 Loading embedding model...")
-embedding = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-    model_kwargs={'device': 'cpu'},  # اگر GPU دارید، می‌تونید 'cuda' بذارید
-    encode_kwargs={'normalize_embeddings': True}
-)
+def iter_store_records(path):
+    from product_store import ProductStore
+
+    store = ProductStore(path)
+    try:
+        yield from store.iter_products()
+    finally:
+        store.close()
+
+def iter_merged_records(base_dir=BASE_DIR):
+    from product_store import parse_product_sections
+
+    for document in iter_dir_documents(base_dir):
+        category, source = document.metadata["category"], document.metadata["source"]
+        for n, block in enumerate(document.page_content.split(MERGE_SEPARATOR)):
+            fields = parse_product_sections(block.strip().splitlines())
+            if fields["title"]:
+                yield {**fields, "id": f"{category}/{source}#{n}", "category": category, "source": source}
 
-# تست embedding
-vec = embedding.embed_query("دیود پل 10 آمپر 1000 ولت")
-print(f"✅ Embedding vector size: {len(vec)}")
+def iter_source_records(source=INGEST_SOURCE):
+    """Every product of the ingest source, with the fields spec_index reads."""
+    from product_record import clean_name
+
+    source = source or default_source()
+    if source == "merged":
+        yield from iter_merged_records()
+        return
+    products = iter_jsonl_records() if source == "jsonl" else iter_store_records(PRODUCT_STORE)
+    for product in products:
+        yield {
+            "id": product.get("id") or product["url"],
+            "title": product.get("title"),
+            "price": product.get("price"),
+            # same names as the chunk metadata, so rag_system's filters apply
+            "category": clean_name(product.get("category")),
+            "source": f"{clean_name(product.get('subcategory'))}_merged.txt",
+            "url": product["url"],
+            "specs": product.get("specs") or {},
+        }
+
+def batched(items, batch_size=BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 # -----------------------------
-# Create Final Vector DB
+# Embedding model (HuggingFace - local)
 # -----------------------------
-print("🔄 Creating vector database...")
-persist_directory = "eca_products_vector_db"
-
-# اگه دایرکتوری قبلی وجود داره، پاکش می‌کنیم
-if os.path.exists(persist_directory):
-    import shutil
-    print(f"Removing existing {persist_directory}")
-    shutil.rmtree(persist_directory)
-
-# ایجاد vector store با تمام chunks
-vectorstore = Chroma.from_documents(
-    documents=chunks,
-    embedding=embedding,
-    persist_directory=persist_directory
-)
+def embedding_model_name():
+    """Name the embedding cache keys on; the ONNX vectors differ slightly."""
+    if EMBEDDING_BACKEND == "onnx":
+        from onnx_embedding import ONNX_DIR
+        return ONNX_DIR
+    return MODEL_NAME
+
+def load_embedding(threads=0):
+    if EMBEDDING_BACKEND == "onnx":
+        from onnx_embedding import ONNX_DIR, OnnxEmbeddings
+        return OnnxEmbeddings(ONNX_DIR, threads=threads)
+    return HuggingFaceEmbeddings(
+        model_name=MODEL_NAME,
+        model_kwargs={'device': 'cpu'},  # اگر GPU دارید، می‌تونید 'cuda' بذارید
+        encode_kwargs={'normalize_embeddings': True}
+    )
 
-print(f"✅ Final Vector DB created and persisted to {persist_directory}")
+_worker_embedding = None
+
+def _init_embed_worker(threads):
+    global _worker_embedding
+    if EMBEDDING_BACKEND != "onnx":
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    _worker_embedding = load_embedding(threads)
+
+def _embed_in_worker(texts):
+    return _worker_embedding.embed_documents(texts)
 
 # -----------------------------
-# Test the vector store
+# Streaming ingest
 # -----------------------------
-print("\n🔄 Testing similarity search...")
-test_queries = [
-    "دیود پل 10 آمپر 1000 ولت",
-    "مقاومت SMD 10 کیلواهم",
-    "آی سی رگولاتور 7805"
-]
-
-for query in test_queries:
-    print(f"\n📝 Query: {query}")
-    results = vectorstore.similarity_search(query, k=2)
-    
-    for i, doc in enumerate(results, 1):
-        print(f"\n  Result {i}:")
-        print(f"  Category: {doc.metadata.get('category', 'N/A')}")
-        print(f"  Source: {doc.metadata.get('source', 'N/A')}")
-        print(f"  Preview: {doc.page_content[:150]}...")
-        print("-" * 50)
-
-print("\n✅ All done!")
\ No newline at end of file
+def upsert_batch(vectorstore, chunks, vectors, lexical=None):
+    vectorstore._collection.upsert(
+        ids=[c.id for c in chunks],
+        embeddings=vectors,
+        documents=[c.page_content for c in chunks],
+        metadatas=[c.metadata for c in chunks],
+    )
+    if lexical is not None:
+        lexical.add(chunks)
+
+def existing_chunks(vectorstore):
+    """id -> content hash of every chunk already in the store, read page by page."""
+    existing = {}
+    offset = 0
+    while True:
+        page = vectorstore._collection.get(include=["metadatas"], limit=GET_PAGE_SIZE, offset=offset)
+        for stored_id, metadata in zip(page["ids"], page["metadatas"]):
+            existing[stored_id] = (metadata or {}).get("content_hash")
+        if len(page["ids"]) < GET_PAGE_SIZE:
+            return existing
+        offset += GET_PAGE_SIZE
+
+def stored_vectors(vectorstore, ids):
+    page = vectorstore._collection.get(ids=ids, include=["embeddings"])
+    return dict(zip(page["ids"], page["embeddings"]))
+
+def ingest(chunks, vectorstore, embedding, workers=EMBED_WORKERS, batch_size=BATCH_SIZE, rebuild=False,
+           lexical=None):
+    """Bring the store in line with `chunks` (with ids); returns the counts.
+
+    Chunks whose id is already stored are skipped. A chunk that only moved
+    (same text, new position) reuses its stored vector instead of being
+    re-embedded; only new text goes through the model, batch by batch.
+    Chunks no longer produced by the source are deleted at the end, after
+    their replacements are in, so the store stays queryable throughout.
+    With rebuild=True every chunk is re-embedded.
+
+    With workers > 0 batches are embedded in a process pool, with at most
+    two batches per worker in flight so memory stays bounded.
+
+    A lexical index (lexical_index.py) is kept in step with the store;
+    unchanged chunks it doesn't have yet are added without touching Chroma.
+    """
+    started = time.perf_counter()
+    existing = existing_chunks(vectorstore)
+    by_hash = {} if rebuild else {digest: stored_id for stored_id, digest in existing.items() if digest}
+    indexed = lexical.ids() if lexical is not None else set()
+    seen = set()
+    counts = {"total": 0, "unchanged": 0, "reused": 0, "embedded": 0, "deleted": 0}
+    batches = 0
+
+    def done(chunks, vectors):
+        nonlocal batches
+        upsert_batch(vectorstore, chunks, vectors, lexical)
+        counts["embedded"] += len(chunks)
+        batches += 1
+        if batches % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - started
+            print(f"  {counts['total']} chunks scanned, {counts['embedded']} embedded in {elapsed:.1f}s "
+                  f"({counts['embedded'] / elapsed:.1f} chunks/s)")
+
+    def to_embed():
+        """Yield the chunks that need the model; store the rest directly."""
+        for batch in batched(chunks, batch_size):
+            fresh, moved, unindexed = [], [], []
+            for chunk in batch:
+                counts["total"] += 1
+                if chunk.id in seen:
+                    continue
+                seen.add(chunk.id)
+                if chunk.id in existing and not rebuild:
+                    counts["unchanged"] += 1
+                    if lexical is not None and chunk.id not in indexed:
+                        unindexed.append(chunk)
+                elif chunk.metadata["content_hash"] in by_hash:
+                    moved.append(chunk)
+                else:
+                    fresh.append(chunk)
+            if moved:
+                sources = [by_hash[c.metadata["content_hash"]] for c in moved]
+                vectors = stored_vectors(vectorstore, sources)
+                reused = [(c, vectors[i]) for c, i in zip(moved, sources) if i in vectors]
+                fresh += [c for c, i in zip(moved, sources) if i not in vectors]
+                if reused:
+                    upsert_batch(vectorstore, [c for c, _ in reused], [v for _, v in reused], lexical)
+                    counts["reused"] += len(reused)
+            if unindexed:
+                lexical.add(unindexed)
+            yield from fresh
+
+    if workers <= 0:
+        for batch in batched(to_embed(), batch_size):
+            done(batch, embedding.embed_documents([c.page_content for c in batch]))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_embed_worker,
+            initargs=(threads,),
+        ) as pool:
+            # cache lookups and writes stay in this process; workers only see misses
+            cache = getattr(embedding, "cache", None)
+
+            def collect(future):
+                chunks, vectors, missing = in_flight.pop(future)
+                computed = iter(future.result())
+                if cache and missing:
+                    cache.put_many([c.page_content for c in missing], future.result())
+                done(chunks, [v if v is not None else next(computed) for v in vectors])
+
+            in_flight = {}
+            for batch in batched(to_embed(), batch_size):
+                if len(in_flight) >= workers * 2:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future)
+                texts = [c.page_content for c in batch]
+                vectors = cache.get_many(texts) if cache else [None] * len(texts)
+                missing = [c for c, v in zip(batch, vectors) if v is None]
+                future = pool.submit(_embed_in_worker, [c.page_content for c in missing])
+                in_flight[future] = (batch, vectors, missing)
+            for future in list(in_flight):
+                collect(future)
+
+    # an empty source (missing directory, empty store) must not wipe the collection
+    stale = [stored_id for stored_id in existing if stored_id not in seen] if seen else []
+    for ids in batched(stale, GET_PAGE_SIZE):
+        vectorstore._collection.delete(ids=ids)
+    counts["deleted"] = len(stale)
+    if lexical is not None and seen:
+        lexical.delete(indexed - seen)
+
+    elapsed = time.perf_counter() - started
+    rate = counts["embedded"] / elapsed if elapsed else 0.0
+    print(
+        f"📄 Total chunks: {counts['total']} in {elapsed:.1f}s - unchanged {counts['unchanged']}, "
+        f"reused {counts['reused']}, embedded {counts['embedded']} ({rate:.1f} chunks/s), deleted {counts['deleted']}"
+    )
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="re-embed every chunk instead of only new/changed ones")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="embedding processes (0: in-process)")
+    parser.add_argument("--source", choices=["merged", "store", "jsonl"], default=INGEST_SOURCE or None,
+                        help="merged TXT files, the product store, or one chunk per product from the JSONL")
+    args = parser.parse_args()
+
+    print("🔄 Loading embedding model...")
+    embedding = with_cache(load_embedding(), embedding_model_name())
+
+    # تست embedding
+    vec = embedding.embed_query("دیود پل 10 آمپر 1000 ولت")
+    print(f"✅ Embedding vector size: {len(vec)}")
+
+    # -----------------------------
+    # Create Final Vector DB
+    # -----------------------------
+    print("🔄 Updating vector database...")
+    persist_directory = PERSIST_DIRECTORY
+
+    # دیگه پاکش نمی‌کنیم؛ فقط chunk های جدید/تغییرکرده embed می‌شن و حذف‌شده‌ها پاک می‌شن
+    vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embedding)
+    lexical = open_index(persist_directory)  # BM25 index for part numbers, next to Chroma
+    counts = ingest(iter_source_chunks(args.source), vectorstore, embedding, workers=args.workers, rebuild=args.rebuild,
+                    lexical=lexical)
+    changed = bool(counts["reused"] or counts["embedded"] or counts["deleted"])
+    if changed:
+        # cached answers may quote what just changed
+        bump_store_version(persist_directory)
+
+    if counts["total"] == 0:
+        print("❌ No documents loaded! Exiting.")
+        exit(1)
+
+    print(f"✅ Final Vector DB updated and persisted to {persist_directory}")
+    print(f"✅ Lexical index: {lexical.stats()}")
+    products = spec_index.build(iter_source_records(args.source), os.path.join(persist_directory, spec_index.INDEX_FILE))
+    print(f"✅ Spec index: {products} products")
+    mmap_dir = os.path.join(persist_directory, vector_index.INDEX_DIR)
+    if changed or not os.path.exists(os.path.join(mmap_dir, vector_index.CURRENT_FILE)):
+        # in-process backend for rag_system (VECTOR_BACKEND=mmap)
+        exported = vector_index.export(vectorstore._collection, mmap_dir)
+        print(f"✅ Memory-mapped index: {exported} vectors ({vector_index.DTYPE})")
+
+    # -----------------------------
+    # Test the vector store
+    # -----------------------------
+    print("\n🔄 Testing similarity search...")
+    test_queries = [
+        "دیود پل 10 آمپر 1000 ولت",
+        "مقاومت SMD 10 کیلواهم",
+        "آی سی رگولاتور 7805"
+    ]
+
+    for query in test_queries:
+        print(f"\n📝 Query: {query}")
+        results = vectorstore.similarity_search(query, k=2)
+
+        for i, doc in enumerate(results, 1):
+            print(f"\n  Result {i}:")
+            print(f"  Category: {doc.metadata.get('category', 'N/A')}")
+            print(f"  Source: {doc.metadata.get('source', 'N/A')}")
+            print(f"  Preview: {doc.page_content[:150]}...")
+            print("-" * 50)
+
+    if hasattr(embedding, "cache"):
+        print(f"Embedding cache: {embedding.cache.stats()}")
+    print("\n✅ All done!")
+
+if __name__ == "__main__":
+    main()
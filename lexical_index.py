@@ -0,0 +1,222 @@
+"""BM25 index over the chunks in the vector store, for part numbers and values.
+
+The MiniLM embedding barely tells "7805" from "7812" or "1N4007" from
+"1N4148", so rag_system searches this index next to Chroma and fuses both
+rankings. The tokenizer keeps part numbers whole ("1n4007", "lm7805" for
+"LM-7805") and also indexes their digit runs ("4007", "7805"), so either
+spelling finds the product; Persian text is split on words after unifying
+digits and Arabic letters.
+
+The index is a SQLite file next to Chroma, kept in sync by
+ingest_eca_products.py and stream_ingest.py (chunks are added and deleted
+together with their vectors).
+
+    python lexical_index.py build                 # index an existing vector store
+    python lexical_index.py search "رگولاتور 7805"
+"""
+import argparse
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from spec_index import parse_packages, parse_quantities
+
+INDEX_FILE = "lexical_index.sqlite3"  # inside the vector store directory
+K1 = 1.2
+B = 0.75
+STRONG_MAX_DF = 30  # a part number in at most this many chunks identifies the product
+PAGE_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id TEXT PRIMARY KEY,
+    category TEXT,
+    source TEXT,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    id TEXT NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_id ON postings(id);
+"""
+
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "أ": "ا", "إ": "ا", "‌": " ", "ـ": None})
+_WORD = re.compile(r"[0-9a-z]+(?:[-./][0-9a-z]+)*|[^\W\d_a-z]+")
+_JOINERS = re.compile(r"[-/]")
+_DIGIT_RUN = re.compile(r"\d{3,}")
+_LETTER_THEN_DIGIT = re.compile(r"[a-z][^0-9]*[0-9]")  # lm317, 1n4007, bc547b; not 10k, 12v, 100uh
+_RKM_VALUE = re.compile(r"\d+[rkm]\d+")  # 4k7, 2r2: resistor values
+_NUMERIC_FAMILY = re.compile(r"(78|79|74|40|45)\d{2,3}")  # 7805, 7912, 74595, 4017, 4511
+STOPWORDS = frozenset(
+    "و در با به از که را این آن برای یا تا ها های می است هر یک چه چیست دارید کنید the and of for with".split()
+)
+
+def tokenize(text: str) -> list:
+    text = text.translate(_DIGITS).translate(_LETTERS).lower()
+    terms = []
+    for word in _WORD.findall(text):
+        if word in STOPWORDS:
+            continue
+        if not word[0].isascii():
+            terms.append(word)
+            continue
+        parts = _JOINERS.split(word)
+        if len(parts) > 1:
+            terms.append("".join(parts))  # "lm-7805" -> "lm7805"
+        for part in parts:
+            terms.append(part)
+            if not part.isdigit() and not part.isalpha():
+                terms.extend(run for run in _DIGIT_RUN.findall(part) if run != part)  # "1n4007" -> "4007"
+    return terms
+
+def is_part_number(term: str) -> bool:
+    """Part numbers like 1n4007, lm317 or 7805; values (10, 4700, 12v, 10uf,
+    4k7) and packages (to220, smd1206) are not."""
+    if len(term) < 3 or not any(c.isdigit() for c in term):
+        return False
+    if term.isdigit():
+        # bare numbers are mostly values; only the numeric families count
+        return bool(_NUMERIC_FAMILY.fullmatch(term)) and not term.endswith("00")
+    if not _LETTER_THEN_DIGIT.search(term) or _RKM_VALUE.fullmatch(term):
+        return False
+    if any(start == 0 and end == len(term) for _, _, start, end in parse_quantities(term)):
+        return False
+    return not parse_packages(term)
+
+class LexicalIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def ids(self) -> set:
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT id FROM docs")}
+
+    def add(self, chunks):
+        """Index Documents with ids; re-adding an id replaces it."""
+        docs, postings = [], []
+        for chunk in chunks:
+            terms = Counter(tokenize(chunk.page_content))
+            docs.append((chunk.id, chunk.metadata.get("category"), chunk.metadata.get("source"), sum(terms.values())))
+            postings.extend((term, chunk.id, tf) for term, tf in terms.items())
+        if not docs:
+            return
+        with self.lock:
+            self.conn.executemany("DELETE FROM postings WHERE id = ?", [(d[0],) for d in docs])
+            self.conn.executemany("INSERT OR REPLACE INTO docs (id, category, source, length) VALUES (?, ?, ?, ?)", docs)
+            self.conn.executemany("INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)", postings)
+            self.conn.commit()
+
+    def delete(self, ids):
+        rows = [(i,) for i in ids]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany("DELETE FROM postings WHERE id = ?", rows)
+            self.conn.executemany("DELETE FROM docs WHERE id = ?", rows)
+            self.conn.commit()
+
+    def search(self, query: str, k: int = 6, category=None, source=None):
+        """Top-k (id, score) by BM25, and whether a rare part number of the
+        query is in the best hit (then the vector search can be skipped)."""
+        terms = set(tokenize(query))
+        if not terms:
+            return [], False
+        where, params = "", []
+        if source:
+            where, params = " AND d.source = ?", [source]
+        elif category:
+            where, params = " AND d.category = ?", [category]
+
+        scores, matched = Counter(), {}
+        rare = set()
+        with self.lock:
+            total, avg_length = self.conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            if not total:
+                return [], False
+            for term in terms:
+                df = self.conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+                if not df:
+                    continue
+                if is_part_number(term) and df <= STRONG_MAX_DF:
+                    rare.add(term)
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                rows = self.conn.execute(
+                    "SELECT p.id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.id WHERE p.term = ?" + where,
+                    [term] + params,
+                )
+                for doc_id, tf, length in rows:
+                    norm = K1 * (1 - B + B * length / avg_length)
+                    scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+                    matched.setdefault(doc_id, set()).add(term)
+
+        hits = scores.most_common(k)
+        strong = bool(hits) and bool(rare) and rare <= matched[hits[0][0]]
+        return hits, strong
+
+    def stats(self) -> dict:
+        with self.lock:
+            docs = self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            terms = self.conn.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0]
+        return {"docs": docs, "terms": terms}
+
+    def close(self):
+        self.conn.close()
+
+def open_index(persist_directory: str) -> LexicalIndex:
+    os.makedirs(persist_directory, exist_ok=True)
+    return LexicalIndex(os.path.join(persist_directory, INDEX_FILE))
+
+def build_from_collection(collection, index: LexicalIndex):
+    """(Re)index every chunk stored in a Chroma collection."""
+    from langchain_core.documents import Document
+
+    stored, offset = set(), 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+        index.add(
+            Document(page_content=text or "", metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+        )
+        stored.update(page["ids"])
+        if len(page["ids"]) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    index.delete(index.ids() - stored)
+    return len(stored)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--persist-directory", default="eca_products_vector_db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build")
+    p_search = sub.add_parser("search")
+    p_search.add_argument("query")
+    p_search.add_argument("-k", type=int, default=6)
+    args = parser.parse_args()
+
+    index = open_index(args.persist_directory)
+    if args.command == "build":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=args.persist_directory)
+        collection = client.get_collection("langchain")
+        count = build_from_collection(collection, index)
+        print(f"✅ Indexed {count} chunks: {index.stats()}")
+    else:
+        print(f"terms: {tokenize(args.query)}")
+        hits, strong = index.search(args.query, args.k)
+        for doc_id, score in hits:
+            print(f"{score:7.3f}  {doc_id}")
+        print(f"strong part-number match: {strong}")
@@ -1,11 +1,16 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from typing import Optional
+import json
 import logging
 import sys
 
+from product_record import MERGED_SEPARATOR as SEPARATOR, clean_content
+
 INPUT_ROOT = Path("eca_products")
 OUTPUT_ROOT = Path("eca_products_merged")
-SEPARATOR = "\n" + "="*120 + "\n\n"
 MAX_FILES_PER_SUBCATEGORY = None
+MANIFEST_NAME = ".merge_manifest.json"
 
 # Setup logging
 def setup_logging():
@@ -25,124 +30,272 @@ def setup_logging():
 
 logger = setup_logging()
 
-def clean_text(text: str) -> str:
-    """Clean text by removing excessive blank lines."""
-    lines = [l.rstrip() for l in text.splitlines()]
-    cleaned, blanks = [], 0
-    for l in lines:
-        if not l.strip():
-            blanks += 1
-            if blanks <= 2: cleaned.append(l)
-        else:
-            blanks = 0
-            cleaned.append(l)
-    return "\n".join(cleaned).strip() + "\n\n"
-
 def extract_clean_content(file_path: Path) -> str:
     """Extract and clean content from a file."""
     try:
-        content = file_path.read_text(encoding="utf-8", errors="ignore")
-        lines = content.splitlines()
-        
-        if not lines:
-            return ""
-        
-        if lines[0].startswith("URL:"):
-            lines = lines[1:]
-        
-        if lines and lines[0].strip().startswith("="):
-            lines = lines[1:]
-        
-        if len(lines) >= 2 and lines[0] == lines[1]:
-            lines = lines[1:]
-        
-        cleaned_text = clean_text("\n".join(lines))
-        
-        if len(cleaned_text.strip()) < 20:
-            return ""
-        
-        return cleaned_text
+        return clean_content(file_path.read_text(encoding="utf-8", errors="ignore"))
     except Exception as e:
         logger.error(f"Error reading {file_path}: {e}")
         return ""
 
-def process_all_categories():
-    """Process all main categories and their subcategories."""
+def subcategory_inputs(sub_path: Path) -> dict:
+    """Input signature of a subcategory: file name -> [mtime_ns, size]."""
+    txt_files = sorted(sub_path.glob("*.txt"))
+    if MAX_FILES_PER_SUBCATEGORY:
+        txt_files = txt_files[:MAX_FILES_PER_SUBCATEGORY]
+    inputs = {}
+    for txt_file in txt_files:
+        stat = txt_file.stat()
+        inputs[txt_file.name] = [stat.st_mtime_ns, stat.st_size]
+    return inputs
+
+def merge_subcategory(sub_path: Path, file_names: list, output_path: Path) -> int:
+    """Stream the cleaned files of one subcategory into its merged file.
+
+    Runs in a worker process. Writes to a temp file that replaces the
+    output only when complete; returns the number of files merged.
+    """
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    valid_files = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for name in file_names:
+                content = extract_clean_content(sub_path / name)
+                if not content:
+                    continue
+                if valid_files:
+                    out.write(SEPARATOR)
+                out.write(content)
+                valid_files += 1
+        if valid_files:
+            tmp_path.replace(output_path)
+        else:
+            tmp_path.unlink()
+            output_path.unlink(missing_ok=True)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return valid_files
+
+def load_manifest() -> dict:
+    path = OUTPUT_ROOT / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        logger.error(f"Ignoring unreadable manifest {path}: {e}")
+        return {}
+
+def save_manifest(manifest: dict):
+    path = OUTPUT_ROOT / MANIFEST_NAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+    tmp_path.replace(path)
+
+def remove_stale_outputs(old_manifest: dict, manifest: dict, main_categories: set) -> int:
+    """Delete merged files whose subcategory vanished since the last run."""
+    deleted = 0
+    for key, previous in old_manifest.items():
+        if key in manifest:
+            continue
+        stale = OUTPUT_ROOT / previous["output"]
+        if stale.exists():
+            stale.unlink()
+            deleted += 1
+            logger.info(f"Deleted stale merged file: {stale}")
+    for category_dir in OUTPUT_ROOT.iterdir():
+        if category_dir.is_dir() and category_dir.name not in main_categories and not any(category_dir.iterdir()):
+            category_dir.rmdir()
+    return deleted
+
+def process_all_categories(force: bool = False, workers: Optional[int] = None):
+    """Process all main categories and their subcategories.
+
+    Only subcategories whose input files changed since the last run (per
+    the manifest in OUTPUT_ROOT) are rebuilt, in parallel; merged files of
+    subcategories that disappeared are deleted.
+    """
     input_root = INPUT_ROOT
-    if not input_root:
+    if not input_root.exists():
         print("\nPlease check the folder location and try again.")
         return
         
     OUTPUT_ROOT.mkdir(exist_ok=True)
-    
-    total_main = 0
-    total_sub = 0
+    old_manifest = {} if force else load_manifest()
+    manifest = {}
+    jobs = []
+    skipped = 0
     
     print(f"\n{'='*60}")
     print(f"Starting Automated Merging Process")
     print(f"{'='*60}")
     
-    # Process each main category
+    # Scan each main category and subcategory (stat only)
+    main_categories = set()
     for main_path in sorted(input_root.iterdir()):
         if not main_path.is_dir():
             continue
                 
         category_name = main_path.name
-        print(f"\nProcessing: {category_name}")
-
-        main_output_dir = OUTPUT_ROOT / category_name
-        main_output_dir.mkdir(exist_ok=True)
+        main_categories.add(category_name)
         
-        # Process each subcategory
         for sub_path in sorted(main_path.iterdir()):
             if not sub_path.is_dir():
                 continue
             
-            sub_name = sub_path.name
-            txt_files = list(sub_path.glob("*.txt"))
-            
-            if not txt_files:
+            inputs = subcategory_inputs(sub_path)
+            if not inputs:
                 continue
 
-            if MAX_FILES_PER_SUBCATEGORY:
-                txt_files = txt_files[:MAX_FILES_PER_SUBCATEGORY]
-            
-            merged_contents = []
-            valid_files = 0
-            
-            for txt_file in txt_files:
-                content = extract_clean_content(txt_file)
-                if content:
-                    merged_contents.append(content)
-                    valid_files += 1
-            
-            if not merged_contents:
+            key = f"{category_name}/{sub_path.name}"
+            output_path = OUTPUT_ROOT / category_name / f"{sub_path.name}_merged.txt"
+            entry = {"output": str(output_path.relative_to(OUTPUT_ROOT)), "inputs": inputs}
+
+            previous = old_manifest.get(key)
+            if previous and previous.get("inputs") == inputs and (
+                output_path.exists() or not previous.get("merged")
+            ):
+                manifest[key] = previous
+                skipped += 1
                 continue
-            
-            output_filename = f"{sub_name}_merged.txt"
-            output_path = main_output_dir / output_filename
-
-            try:
-                output_path.write_text(SEPARATOR.join(merged_contents), encoding="utf-8")
-                total_sub += 1
-            except Exception as e:
-                logger.error(f"Error writing {output_path}: {e}")
-        
-        total_main += 1
+
+            manifest[key] = entry
+            jobs.append((key, sub_path, list(inputs), output_path))
+
+    deleted = remove_stale_outputs(old_manifest, manifest, main_categories)
+
+    print(f"Subcategories to rebuild: {len(jobs)}, unchanged: {skipped}, removed: {deleted}")
+
+    rebuilt = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for key, sub_path, file_names, output_path in jobs:
+                output_path.parent.mkdir(exist_ok=True)
+                futures[pool.submit(merge_subcategory, sub_path, file_names, output_path)] = key
+
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    valid_files = future.result()
+                    manifest[key]["merged"] = valid_files
+                    if valid_files:
+                        rebuilt += 1
+                    print(f"  {key}: {valid_files} files")
+                except Exception as e:
+                    # leave it out of the manifest so the next run retries it
+                    manifest.pop(key, None)
+                    logger.error(f"Error merging {key}: {e}")
+
+    save_manifest(manifest)
               
     # Summary
     print(f"\n{'='*60}")
     print(f"PROCESSING COMPLETE!")
     print(f"{'='*60}")
-    print(f"Main categories: {total_main}")
-    print(f"Subcategories: {total_sub}")
+    print(f"Main categories: {len(main_categories)}")
+    print(f"Subcategories: {sum(1 for e in manifest.values() if e.get('merged'))}")
+    print(f"Rebuilt: {rebuilt}, unchanged: {skipped}, removed: {deleted}")
     print(f"{'='*60}")
 
+def process_store(store_path: str, force: bool = False):
+    """Build the merged files from a product store instead of the TXT tree.
+
+    The store is read with one query ordered by category and subcategory,
+    so only one output file is open at a time; subcategories whose content
+    hashes match the manifest are skipped.
+    """
+    from product_record import clean_name, render_txt
+    from product_store import ProductStore
+
+    store = ProductStore(store_path)
+    OUTPUT_ROOT.mkdir(exist_ok=True)
+    old_manifest = {} if force else load_manifest()
+    manifest = {}
+    pending = {}
+    main_categories = set()
+    skipped = 0
+
+    for (category, subcategory), digest in store.subcategory_hashes().items():
+        category_name, sub_name = clean_name(category), clean_name(subcategory)
+        main_categories.add(category_name)
+        key = f"{category_name}/{sub_name}"
+        output_path = OUTPUT_ROOT / category_name / f"{sub_name}_merged.txt"
+        previous = old_manifest.get(key)
+        if previous and previous.get("store") == digest and (
+            output_path.exists() or not previous.get("merged")
+        ):
+            manifest[key] = previous
+            skipped += 1
+            continue
+        manifest[key] = {"output": str(output_path.relative_to(OUTPUT_ROOT)), "store": digest}
+        pending[(category, subcategory)] = (key, output_path)
+
+    deleted = remove_stale_outputs(old_manifest, manifest, main_categories)
+    print(f"Subcategories to rebuild: {len(pending)}, unchanged: {skipped}, removed: {deleted}")
+
+    def finish(current):
+        (key, output_path), out, tmp_path, valid = current
+        out.close()
+        if valid:
+            tmp_path.replace(output_path)
+        else:
+            tmp_path.unlink()
+            output_path.unlink(missing_ok=True)
+        manifest[key]["merged"] = valid
+        print(f"  {key}: {valid} products")
+        return 1 if valid else 0
+
+    rebuilt = 0
+    current = None
+    try:
+        for product in store.iter_products():
+            group = (product["category"], product["subcategory"])
+            if group not in pending:
+                continue
+            if current is None or current[0] != pending[group]:
+                if current:
+                    rebuilt += finish(current)
+                key, output_path = pending[group]
+                output_path.parent.mkdir(exist_ok=True)
+                tmp_path = output_path.with_name(output_path.name + ".tmp")
+                current = [pending[group], open(tmp_path, "w", encoding="utf-8"), tmp_path, 0]
+            content = clean_content(render_txt(
+                product["url"], product["title"], product["price"],
+                product["short_desc"], product["specs"], product["description"],
+            ))
+            if not content:
+                continue
+            if current[3]:
+                current[1].write(SEPARATOR)
+            current[1].write(content)
+            current[3] += 1
+        if current:
+            rebuilt += finish(current)
+    except Exception:
+        if current:
+            current[1].close()
+            current[2].unlink(missing_ok=True)
+        raise
+    finally:
+        store.close()
+
+    save_manifest(manifest)
+    print(f"\nRebuilt: {rebuilt}, unchanged: {skipped}, removed: {deleted}")
+
 def main():
-    import time
-    time.sleep(2)
-    
-    process_all_categories()
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--force", action="store_true", help="rebuild every merged file")
+    parser.add_argument("--workers", type=int, default=None, help="merge processes (default: CPU count)")
+    parser.add_argument("--from-store", default="", help="read products from a product store instead of INPUT_ROOT")
+    args = parser.parse_args()
+
+    if args.from_store:
+        process_store(args.from_store, force=args.force)
+    else:
+        process_all_categories(force=args.force, workers=args.workers)
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
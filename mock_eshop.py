@@ -0,0 +1,259 @@
+"""Local stand-in for eshop.eca.ir used to benchmark web_sc.py offline.
+
+Serves a home page with the category menu, category pages with
+sub-categories, paginated listings and product pages, all using the exact
+selectors scrape() and scrape_product() read. The catalog is either
+synthetic or rebuilt from an existing ``eca_products`` tree, and latency,
+5xx errors and 429 throttling can be injected per request.
+
+    python mock_eshop.py --port 8765 --from-products eca_products --latency 50
+"""
+import argparse
+import html
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+import product_store
+
+PER_PAGE = 24
+
+def synthetic_catalog(categories=5, subcategories=4, products=60):
+    catalog = {}
+    for c in range(categories):
+        subs = {}
+        for s in range(subcategories):
+            items = []
+            for p in range(products):
+                items.append({
+                    "title": f"محصول آزمایشی {c}-{s}-{p} مدل LM{7800 + p}",
+                    "price": f"{(p + 1) * 1250:,} تومان",
+                    "short_desc": f"توضیح کوتاه محصول {p} در زیر دسته {s}",
+                    "specs": {"ولتاژ": f"{5 + p % 20}V", "جریان": f"{1 + p % 10}A", "پکیج": "TO-220"},
+                    "description": "<p>توضیحات کامل محصول آزمایشی.</p><p>خط دوم توضیحات<br>با شکست خط.</p>",
+                })
+            subs[f"زیر دسته {c}-{s}"] = items
+        catalog[f"دسته {c}"] = subs
+    return catalog
+
+def parse_product_txt(path: Path):
+    """Product fields from a crawler TXT, with the description as HTML again."""
+    item = product_store.parse_product_txt(path)
+    description = item["description"]
+    item["description"] = (
+        "".join(f"<p>{html.escape(p)}</p>" for p in description.split("\n\n")) if description else None
+    )
+    return item
+
+def catalog_from_products(root):
+    catalog = {}
+    for category in sorted(Path(root).iterdir()):
+        if not category.is_dir():
+            continue
+        subs = {}
+        for sub in sorted(category.iterdir()):
+            if sub.is_dir():
+                items = [parse_product_txt(p) for p in sorted(sub.glob("*.txt"))]
+                if items:
+                    subs[sub.name] = items
+        if subs:
+            catalog[category.name] = subs
+    return catalog
+
+def page_html(body):
+    return (
+        "<!doctype html><html lang=\"fa\"><head><meta charset=\"utf-8\">"
+        "<link rel=\"stylesheet\" href=\"/static/theme.css\">"
+        "<script src=\"https://analytics.example.com/tag.js\"></script></head>"
+        f"<body id=\"index\">{body}<img src=\"/static/banner.jpg\"></body></html>"
+    )
+
+class MockShop:
+    def __init__(self, catalog, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1, seed=0):
+        self.catalog = catalog
+        self.categories = list(catalog)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def fault(self):
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def home(self):
+        items = "".join(
+            f"<li><a href=\"/c/{i}\">{html.escape(name)}</a></li>"
+            for i, name in enumerate(self.categories)
+        )
+        menu = (
+            "<div id=\"header-main-menu\"><span class=\"left-nav-trigger\">منو</span></div>"
+            "<div class=\"st-menu\"><div class=\"js-sidebar-category-tree\"><div><ul>"
+            "<li><div class=\"js-collapse-trigger\">خانه</div></li>"
+            "<li><div class=\"js-collapse-trigger\">قطعات</div>"
+            f"<div class=\"js-sub-categories expanded\"><ul>{items}</ul></div></li>"
+            "</ul></div></div></div>"
+        )
+        return page_html(menu)
+
+    def category(self, c):
+        subs = self.catalog[self.categories[c]]
+        links = "".join(
+            f"<a href=\"/c/{c}/{s}\">{html.escape(name)}</a>"
+            for s, name in enumerate(subs)
+        )
+        return page_html(
+            "<div id=\"js-product-list-header\"><aside>"
+            f"<div class=\"subcategories-wrapper\">{links}</div></aside></div>"
+        )
+
+    def listing(self, c, s, page):
+        items = list(self.catalog[self.categories[c]].values())[s]
+        pages = max(1, (len(items) + PER_PAGE - 1) // PER_PAGE)
+        start = (page - 1) * PER_PAGE
+        articles = "".join(
+            f"<article><a href=\"/p/{c}/{s}/{k}\"><img src=\"/static/p{k}.jpg\"></a>"
+            f"<h3><a href=\"/p/{c}/{s}/{k}\">{html.escape(items[k]['title'])}</a></h3></article>"
+            for k in range(start, min(start + PER_PAGE, len(items)))
+        )
+        # a sliding pagination window, like the real theme
+        window = range(max(1, page - 2), min(pages, page + 2) + 1)
+        pager = "".join(f"<a href=\"/c/{c}/{s}?page={n}\">{n}</a>" for n in window)
+        if page < pages:
+            pager += f"<a rel=\"next\" href=\"/c/{c}/{s}?page={page + 1}\">بعدی</a>"
+        return page_html(
+            f"<div id=\"js-product-list\">{articles}<nav class=\"pagination\">{pager}</nav></div>"
+        )
+
+    def product(self, c, s, k):
+        item = list(self.catalog[self.categories[c]].values())[s][k]
+        specs = "".join(
+            f"<dt class=\"name\">{html.escape(n)}</dt><dd class=\"value\">{html.escape(v)}</dd>"
+            for n, v in item["specs"].items()
+        )
+        parts = [
+            f"<section id=\"mainProduct\"><h1>{html.escape(item['title'])}</h1>",
+        ]
+        if item["price"]:
+            parts.append(f"<span class=\"current-price fa-number-conv\">{html.escape(item['price'])}</span>")
+        if item["short_desc"]:
+            parts.append(f"<div class=\"product-description-short typo\">{html.escape(item['short_desc'])}</div>")
+        if item["description"]:
+            parts.append(f"<div class=\"product-description typo\">{item['description']}</div>")
+        if specs:
+            parts.append(f"<section class=\"product-features\"><dl class=\"data-sheet\">{specs}</dl></section>")
+        parts.append("</section>")
+        return page_html("".join(parts))
+
+    def route(self, path, query):
+        segments = [unquote(p) for p in path.strip("/").split("/") if p]
+        try:
+            if not segments:
+                return self.home()
+            if segments[0] == "c" and len(segments) == 2:
+                return self.category(int(segments[1]))
+            if segments[0] == "c" and len(segments) == 3:
+                page = int(query.get("page", ["1"])[0])
+                return self.listing(int(segments[1]), int(segments[2]), page)
+            if segments[0] == "p" and len(segments) == 4:
+                return self.product(int(segments[1]), int(segments[2]), int(segments[3]))
+        except (ValueError, IndexError, KeyError):
+            return None
+        return None
+
+def make_handler(shop):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path.startswith("/static/"):
+                return self.send_body(200, b"", "application/octet-stream")
+
+            status = shop.fault()
+            if status == 429:
+                return self.send_body(429, b"slow down", "text/plain", {"Retry-After": str(shop.retry_after)})
+            if status:
+                return self.send_body(status, b"unavailable", "text/plain")
+
+            body = shop.route(parsed.path, parse_qs(parsed.query))
+            if body is None:
+                return self.send_body(404, b"not found", "text/plain")
+            self.send_body(200, body.encode("utf-8"), "text/html; charset=utf-8")
+
+        def send_body(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def start_server(shop, host="127.0.0.1", port=0):
+    """Start the mock shop in a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(shop))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def build_shop(args):
+    if args.from_products:
+        catalog = catalog_from_products(args.from_products)
+    else:
+        catalog = synthetic_catalog(args.categories, args.subcategories, args.products)
+    return MockShop(
+        catalog,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+
+def add_shop_arguments(parser):
+    parser.add_argument("--from-products", default="", help="build the catalog from an eca_products tree")
+    parser.add_argument("--categories", type=int, default=5)
+    parser.add_argument("--subcategories", type=int, default=4)
+    parser.add_argument("--products", type=int, default=60, help="products per subcategory")
+    parser.add_argument("--latency", type=float, default=0, help="mean added latency in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="latency jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--seed", type=int, default=0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_shop_arguments(parser)
+    args = parser.parse_args()
+
+    shop = build_shop(args)
+    server, base_url = start_server(shop, args.host, args.port)
+    total = sum(len(items) for subs in shop.catalog.values() for items in subs.values())
+    print(f"Mock e-shop with {len(shop.catalog)} categories / {total} products at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
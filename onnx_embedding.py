@@ -0,0 +1,199 @@
+"""Int8-quantized ONNX Runtime backend for the MiniLM embedding model.
+
+The model in models_cache is exported once to ONNX, dynamically quantized
+to int8 and stored next to it together with its fast tokenizer. At run
+time only onnxruntime, tokenizers and numpy are needed: texts are
+tokenized in one call, grouped into length-sorted batches under a padded
+token budget, and mean-pooled + L2-normalized like sentence-transformers.
+
+    python onnx_embedding.py export   # models_cache/<model> -> models_cache/<model>-onnx-int8
+    python onnx_embedding.py parity   # cosine drift against the PyTorch vectors
+    python onnx_embedding.py bench    # sentences/sec for both backends
+
+Select it with EMBEDDING_BACKEND=onnx (see rag_system.load_embedding).
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+SOURCE_DIR = os.getenv("HF_MODEL_DIR", os.path.join("models_cache", "paraphrase-multilingual-MiniLM-L12-v2"))
+ONNX_DIR = os.getenv("ONNX_MODEL_DIR", SOURCE_DIR.rstrip("/\\") + "-onnx-int8")
+ONNX_FILE = "model_quantized.onnx"
+MAX_LENGTH = 128  # max_seq_length of the sentence-transformers model
+INTRA_OP_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0: onnxruntime picks
+MAX_BATCH = 64
+MAX_BATCH_TOKENS = 8192  # padded tokens per forward pass
+SAMPLE_DIR = "eca_products_merged"
+MERGE_SEPARATOR = "=" * 120
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(self, model_dir: str = ONNX_DIR, threads: int = INTRA_OP_THREADS,
+                 max_batch: int = MAX_BATCH, max_batch_tokens: int = MAX_BATCH_TOKENS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, ONNX_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_LENGTH)
+        self.tokenizer.no_padding()
+        self.model_dir = model_dir
+        self.max_batch = max_batch
+        self.max_batch_tokens = max_batch_tokens
+
+    def _batches(self, lengths):
+        """Indices grouped by similar length so padding stays small."""
+        batch, longest = [], 0
+        for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+            n = lengths[i]
+            if batch and (len(batch) >= self.max_batch or max(longest, n) * (len(batch) + 1) > self.max_batch_tokens):
+                yield batch
+                batch, longest = [], 0
+            batch.append(i)
+            longest = max(longest, n)
+        if batch:
+            yield batch
+
+    def _run(self, encodings):
+        length = max(len(e.ids) for e in encodings)
+        ids = np.zeros((len(encodings), length), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        for row, encoding in enumerate(encodings):
+            ids[row, :len(encoding.ids)] = encoding.ids
+            mask[row, :len(encoding.ids)] = 1
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feed)[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(list(texts))
+        vectors = None
+        for batch in self._batches([len(e.ids) for e in encodings]):
+            pooled = self._run([encodings[i] for i in batch])
+            if vectors is None:
+                vectors = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            vectors[batch] = pooled
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def export(source_dir: str = SOURCE_DIR, target_dir: str = ONNX_DIR, opset: int = 14):
+    """Export the PyTorch model to ONNX and quantize its weights to int8."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(target_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(source_dir)
+    model = AutoModel.from_pretrained(source_dir).eval()
+    sample = tokenizer(["دیود پل 10 آمپر 1000 ولت"], return_tensors="pt")
+    inputs = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    fp32_path = os.path.join(target_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in inputs),
+            fp32_path,
+            input_names=inputs,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in inputs + ["last_hidden_state"]},
+            opset_version=opset,
+        )
+    quantize_dynamic(fp32_path, os.path.join(target_dir, ONNX_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    tokenizer.save_pretrained(target_dir)
+    size = os.path.getsize(os.path.join(target_dir, ONNX_FILE)) / 1e6
+    print(f"✅ Exported {source_dir} -> {target_dir}/{ONNX_FILE} ({size:.1f} MB)")
+
+def sample_texts(limit: int, data_dir: str = SAMPLE_DIR):
+    """Product texts from the merged files, plus a few typical queries."""
+    texts = [
+        "دیود پل 10 آمپر 1000 ولت",
+        "مقاومت SMD 10 کیلواهم",
+        "آی سی رگولاتور 7805",
+    ]
+    for path in sorted(Path(data_dir).glob("*/*.txt")):
+        for part in path.read_text(encoding="utf-8", errors="ignore").split(MERGE_SEPARATOR):
+            part = part.strip()
+            if part:
+                texts.append(part)
+            if len(texts) >= limit:
+                return texts
+    return texts
+
+def load_torch(source_dir: str = SOURCE_DIR):
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(source_dir, device="cpu")
+
+    def encode(texts, batch_size=32):
+        return model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+    return encode
+
+def parity(args):
+    texts = sample_texts(args.limit)
+    reference = load_torch(args.source)(texts)
+    candidate = np.asarray(OnnxEmbeddings(args.model_dir, threads=args.threads).embed_documents(texts))
+    cosine = (reference * candidate).sum(axis=1)
+    print(f"texts: {len(texts)}")
+    print(f"cosine vs PyTorch: mean {cosine.mean():.5f}, p1 {np.percentile(cosine, 1):.5f}, min {cosine.min():.5f}")
+
+    # does the drift change which product a query retrieves?
+    queries = min(50, len(texts) // 2)
+    ref_top = np.argsort(-(reference[:queries] @ reference.T), axis=1)[:, 1:6]
+    onnx_top = np.argsort(-(candidate[:queries] @ candidate.T), axis=1)[:, 1:6]
+    overlap = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(ref_top, onnx_top)])
+    print(f"top-5 neighbour overlap over {queries} texts: {overlap:.3f}")
+
+def bench(args):
+    texts = sample_texts(args.limit)
+    backends = {"onnx-int8": OnnxEmbeddings(args.model_dir, threads=args.threads).embed_documents}
+    if not args.onnx_only:
+        backends = {"torch": load_torch(args.source), **backends}
+    print(f"texts: {len(texts)}, mean length {sum(map(len, texts)) / len(texts):.0f} chars")
+    for name, encode in backends.items():
+        encode(texts[:8])  # warm-up
+        started = time.perf_counter()
+        encode(texts)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<10} {len(texts) / elapsed:8.1f} sentences/s ({elapsed:.2f}s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=SOURCE_DIR, help="PyTorch model dir (or hub id)")
+    parser.add_argument("--model-dir", default=ONNX_DIR, help="quantized ONNX model dir")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export")
+    p_export.add_argument("--opset", type=int, default=14)
+    for name in ("parity", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--limit", type=int, default=500, help="number of sample texts")
+        p.add_argument("--threads", type=int, default=INTRA_OP_THREADS, help="ONNX intra-op threads (0: default)")
+        if name == "bench":
+            p.add_argument("--onnx-only", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.source, args.model_dir, args.opset)
+    elif args.command == "parity":
+        parity(args)
+    else:
+        bench(args)
@@ -0,0 +1,158 @@
+import asyncio
+import collections
+import os
+import queue
+import threading
+import time
+
+class OutputSink:
+    """Background writer for the crawler's TXT, JSONL and log output.
+
+    Producers enqueue line appends and whole-file writes; a single thread
+    drains the bounded queue, batches appends per file on long-lived
+    handles and flushes/fsyncs them every ``flush_interval`` seconds.
+    Whole files are written to a temp file and renamed into place, so a
+    crash never leaves a half-written product TXT behind.
+
+    ``append`` and ``write`` are awaited by the crawl coroutines: they wait
+    (off the event loop) while the queue is full, which is the backpressure
+    signal, and their ``done`` callback runs in the writer thread once the
+    item is flushed to disk. ``append_line`` is for log lines and never
+    blocks; when the queue is full the line goes to an overflow list that
+    the writer drains with the next batch.
+    """
+
+    def __init__(self, maxsize=1000, batch_size=200, flush_interval=1.0, fsync=True):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflow = collections.deque()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.handles = {}
+        self.created_dirs = set()
+        self.thread = None
+        self.error = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="output-sink", daemon=True)
+        self.thread.start()
+        return self
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def append_line(self, path, line):
+        try:
+            self.queue.put_nowait(("append", path, line, None))
+        except queue.Full:
+            self.overflow.append(("append", path, line, None))
+
+    async def append(self, path, line, done=None):
+        await self._put(("append", path, line, done))
+
+    async def write(self, path, text, done=None):
+        await self._put(("write", path, text, done))
+
+    async def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            await asyncio.to_thread(self.queue.put, item)
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        if self.error:
+            raise self.error
+
+    def ensure_dir(self, folder):
+        if folder and folder not in self.created_dirs:
+            os.makedirs(folder, exist_ok=True)
+            self.created_dirs.add(folder)
+
+    def _run(self):
+        pending = []
+        unflushed = []  # done callbacks of items written but not yet flushed
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self.queue.get(timeout=timeout)
+                if item is None:
+                    stopping = True
+                else:
+                    pending.append(item)
+                # drain whatever is already queued into the same batch
+                while not stopping and len(pending) < self.batch_size:
+                    item = self.queue.get_nowait()
+                    if item is None:
+                        stopping = True
+                    else:
+                        pending.append(item)
+            except queue.Empty:
+                pass
+            while self.overflow:
+                pending.append(self.overflow.popleft())
+
+            try:
+                self._write_batch(pending)
+                unflushed.extend(item[3] for item in pending if item[3] is not None)
+                pending = []
+                if stopping or time.monotonic() - last_flush >= self.flush_interval:
+                    self._flush()
+                    last_flush = time.monotonic()
+                    for done in unflushed:
+                        done()
+                    unflushed = []
+            except Exception as e:
+                # items that never reached the disk are not reported as done
+                self.error = e
+                pending = []
+                unflushed = []
+
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+
+    def _write_batch(self, items):
+        appends = {}
+        for kind, path, payload, _ in items:
+            if kind == "append":
+                appends.setdefault(path, []).append(payload + "\n")
+            else:
+                # keep ordering simple: flush pending appends before a file write
+                self._append(appends)
+                appends = {}
+                self._write_atomic(path, payload)
+        self._append(appends)
+
+    def _append(self, appends):
+        for path, lines in appends.items():
+            handle = self.handles.get(path)
+            if handle is None:
+                self.ensure_dir(os.path.dirname(path))
+                handle = open(path, "a", encoding="utf-8")
+                self.handles[path] = handle
+            handle.write("".join(lines))
+
+    def _write_atomic(self, path, text):
+        folder = os.path.dirname(path)
+        self.ensure_dir(folder)
+        tmp_path = os.path.join(folder, f".{os.path.basename(path)}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _flush(self):
+        for handle in self.handles.values():
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
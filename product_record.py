@@ -0,0 +1,158 @@
+import os
+import re
+from html import unescape
+
+from crawl_state import content_hash
+
+# compiled once; build_record runs for every product, usually in a worker process
+_UNSAFE_NAME_CHARS = re.compile(r'[\\/:*?"<>|]')
+_LINE_BREAK_TAGS = re.compile(r'<br\s*/?>|</?p[^>]*>')
+_TAGS = re.compile(r'<[^>]+>')
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+_SPACES = re.compile(r'[ \t]+')
+DESCRIPTION_HEAD = 500  # chars of the description kept in combined_text
+
+def clean_name(name: str) -> str:
+    if not name:
+        return "unknown"
+    name = _UNSAFE_NAME_CHARS.sub('-', name)
+    return name.strip()
+
+def clean_html(html_text: str) -> str:
+    if not html_text:
+        return ""
+    text = _LINE_BREAK_TAGS.sub('\n', html_text)
+    text = _TAGS.sub('', text)
+    text = unescape(text)
+    text = _BLANK_LINES.sub('\n\n', text)
+    text = _SPACES.sub(' ', text)
+    return text.strip()
+
+# between two products in a merged subcategory file
+MERGED_SEPARATOR = "\n" + "=" * 120 + "\n\n"
+
+def description_head(description: str) -> str:
+    """The description up to DESCRIPTION_HEAD chars, cut before a word, not inside one."""
+    if len(description) <= DESCRIPTION_HEAD:
+        return description
+    head = description[:DESCRIPTION_HEAD]
+    if not description[DESCRIPTION_HEAD].isspace():
+        cut = max(head.rfind(" "), head.rfind("\n"), head.rfind("\t"))
+        if cut > 0:
+            head = head[:cut]
+    return head
+
+def render_txt(product_url, title, price, short_desc, specs, description) -> str:
+    """The per-product TXT layout shared by the crawler and the product store."""
+    specs_text = "".join(f"{name}: {value}\n" for name, value in (specs or {}).items())
+    parts = [
+        f"URL: {product_url}\n",
+        f"{'='*80}\n\n",
+        f"عنوان:\n{title}\n\n",
+    ]
+    if price:
+        parts.append(f"قیمت:\n{price}\n\n")
+    if short_desc:
+        parts.append(f"توضیحات کوتاه:\n{short_desc}\n\n")
+    if specs_text:
+        parts.append(f"مشخصات فنی:\n{specs_text}\n")
+    if description:
+        parts.append(f"توضیحات کامل:\n{description}\n\n")
+    return "".join(parts)
+
+def build_record(fields, product_url, category_name, subcategory_name, txt_root=None):
+    """Turn raw extracted fields into the finished TXT and JSONL payloads.
+
+    Pure and picklable so web_sc can run it in a process pool. The JSONL
+    record is returned without its id; the caller assigns it.
+    """
+    title = fields["title"]
+    price = fields["price"]
+    short_desc = fields["short_desc"]
+    specs = fields["specs"]
+    desc_clean = clean_html(fields["desc_html"]) if fields["desc_html"] else None
+
+    digest = content_hash({
+        "title": title,
+        "price": price,
+        "short_desc": short_desc,
+        "specs": specs,
+        "description": desc_clean,
+        "category": category_name,
+        "subcategory": subcategory_name,
+    })
+
+    txt_path = txt = None
+    if txt_root:
+        txt_path = os.path.join(
+            txt_root,
+            clean_name(category_name),
+            clean_name(subcategory_name),
+            clean_name(title[:50]) + ".txt",
+        )
+        txt = render_txt(product_url, title, price, short_desc, specs, desc_clean)
+
+    combined_text = f"عنوان: {title or ''}"
+    if short_desc:
+        combined_text += f". توضیحات کوتاه: {short_desc}"
+    if specs:
+        specs_str = ", ".join([f"{k}: {v}" for k, v in specs.items()])
+        combined_text += f". مشخصات: {specs_str}"
+    if desc_clean:
+        combined_text += f". توضیحات: {description_head(desc_clean)}"
+
+    record = {
+        "url": product_url,
+        "title": title,
+        "price": price,
+        "short_desc": short_desc,
+        "specs": specs,
+        "description": desc_clean,
+        "category": category_name,
+        "subcategory": subcategory_name,
+        "combined_text": combined_text,
+    }
+
+    return {
+        "title": title,
+        "digest": digest,
+        "txt_path": txt_path,
+        "txt": txt,
+        "record": record,
+    }
+
+def clean_text(text: str) -> str:
+    """Clean text by removing excessive blank lines."""
+    lines = [l.rstrip() for l in text.splitlines()]
+    cleaned, blanks = [], 0
+    for l in lines:
+        if not l.strip():
+            blanks += 1
+            if blanks <= 2: cleaned.append(l)
+        else:
+            blanks = 0
+            cleaned.append(l)
+    return "\n".join(cleaned).strip() + "\n\n"
+
+def clean_content(content: str) -> str:
+    """Strip the URL/separator header of one product text and clean it."""
+    lines = content.splitlines()
+    
+    if not lines:
+        return ""
+    
+    if lines[0].startswith("URL:"):
+        lines = lines[1:]
+    
+    if lines and lines[0].strip().startswith("="):
+        lines = lines[1:]
+    
+    if len(lines) >= 2 and lines[0] == lines[1]:
+        lines = lines[1:]
+    
+    cleaned_text = clean_text("\n".join(lines))
+    
+    if len(cleaned_text.strip()) < 20:
+        return ""
+    
+    return cleaned_text
@@ -0,0 +1,294 @@
+"""Single-file product store replacing the per-product TXT trees.
+
+One SQLite file holds every product: the small, frequently filtered fields
+(title, price, category, subcategory, url, content hash) as columns, and
+the bulky text fields (short description, specs, full description) as
+zlib-compressed, content-addressed blobs. Identical blobs - the same
+boilerplate description on hundreds of SMD resistors - are stored once.
+Reading the catalog is one sequential query ordered by category and
+subcategory.
+
+    python product_store.py import eca_products eca_products_short
+    python product_store.py stats
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+
+from crawl_state import content_hash, stable_product_id
+
+STORE_PATH = "products_store.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT,
+    price TEXT,
+    category TEXT NOT NULL,
+    subcategory TEXT NOT NULL,
+    short_desc_ref TEXT,
+    specs_ref TEXT,
+    description_ref TEXT,
+    content_hash TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_category ON products(category, subcategory);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+TXT_SECTIONS = ("عنوان", "قیمت", "توضیحات کوتاه", "مشخصات فنی", "توضیحات کامل")
+
+def parse_product_txt(path: Path) -> dict:
+    """Read back the fields of a product TXT written by the crawler."""
+    lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()
+    url = lines[0][len("URL:"):].strip() if lines and lines[0].startswith("URL:") else None
+    fields = parse_product_sections(lines[2:])
+    return {"url": url, **fields, "title": fields["title"] or path.stem}
+
+def parse_product_sections(lines) -> dict:
+    """The sections of one product, as in the TXT files and the merged files."""
+    sections, current = {}, None
+    for line in lines:
+        if line.endswith(":") and line[:-1] in TXT_SECTIONS:
+            current = line[:-1]
+            sections[current] = []
+        elif current:
+            sections[current].append(line)
+
+    def text(name):
+        return "\n".join(sections.get(name, [])).strip() or None
+
+    specs = {}
+    for line in sections.get("مشخصات فنی", []):
+        if ": " in line:
+            name, value = line.split(": ", 1)
+            specs[name] = value
+    return {
+        "title": text("عنوان"),
+        "price": text("قیمت"),
+        "short_desc": text("توضیحات کوتاه"),
+        "specs": specs,
+        "description": text("توضیحات کامل"),
+    }
+
+class ProductStore:
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.pending = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def commit(self):
+        self.conn.commit()
+        self.pending = 0
+
+    def _put_blob(self, text):
+        if not text:
+            return None
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        self.conn.execute(
+            "INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)",
+            (digest, zlib.compress(text.encode("utf-8"), 6)),
+        )
+        return digest
+
+    def upsert(self, record: dict, digest: str = None, commit_every: int = 100) -> bool:
+        """Insert or update one product; returns False when its content is unchanged."""
+        digest = digest or content_hash({
+            k: record.get(k) for k in
+            ("title", "price", "short_desc", "specs", "description", "category", "subcategory")
+        })
+        row = self.conn.execute(
+            "SELECT content_hash FROM products WHERE url = ?", (record["url"],)
+        ).fetchone()
+        if row and row[0] == digest:
+            return False
+
+        specs = record.get("specs") or {}
+        self.conn.execute(
+            """
+            INSERT INTO products (id, url, title, price, category, subcategory,
+                short_desc_ref, specs_ref, description_ref, content_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                title = excluded.title, price = excluded.price,
+                category = excluded.category, subcategory = excluded.subcategory,
+                short_desc_ref = excluded.short_desc_ref, specs_ref = excluded.specs_ref,
+                description_ref = excluded.description_ref,
+                content_hash = excluded.content_hash, updated_at = excluded.updated_at
+            """,
+            (
+                record.get("id") or stable_product_id(record["url"]),
+                record["url"],
+                record.get("title"),
+                record.get("price"),
+                record.get("category") or "",
+                record.get("subcategory") or "",
+                self._put_blob(record.get("short_desc")),
+                self._put_blob(json.dumps(specs, ensure_ascii=False)) if specs else None,
+                self._put_blob(record.get("description")),
+                digest,
+                time.time(),
+            ),
+        )
+        self.pending += 1
+        if self.pending >= commit_every:
+            self.commit()
+        return True
+
+    def merge_from(self, path: str) -> int:
+        """Copy in the products of another store (a crawl shard's); when both
+        have a product, the more recently updated copy wins."""
+        self.commit()
+        self.conn.execute("ATTACH DATABASE ? AS other", (path,))
+        try:
+            self.conn.execute("INSERT OR IGNORE INTO blobs (hash, data) SELECT hash, data FROM other.blobs")
+            cursor = self.conn.execute(
+                """
+                INSERT INTO products (id, url, title, price, category, subcategory,
+                    short_desc_ref, specs_ref, description_ref, content_hash, updated_at)
+                SELECT id, url, title, price, category, subcategory,
+                    short_desc_ref, specs_ref, description_ref, content_hash, updated_at
+                FROM other.products WHERE true
+                ON CONFLICT(url) DO UPDATE SET
+                    title = excluded.title, price = excluded.price,
+                    category = excluded.category, subcategory = excluded.subcategory,
+                    short_desc_ref = excluded.short_desc_ref, specs_ref = excluded.specs_ref,
+                    description_ref = excluded.description_ref,
+                    content_hash = excluded.content_hash, updated_at = excluded.updated_at
+                WHERE excluded.updated_at > products.updated_at
+                """
+            )
+            self.conn.commit()
+        finally:
+            self.conn.execute("DETACH DATABASE other")
+        return cursor.rowcount
+
+    def iter_products(self, category: str = None):
+        """Yield every product as a dict, ordered by category, subcategory, title."""
+        query = """
+            SELECT p.id, p.url, p.title, p.price, p.category, p.subcategory,
+                   s.data, sp.data, d.data, p.content_hash
+            FROM products p
+            LEFT JOIN blobs s ON s.hash = p.short_desc_ref
+            LEFT JOIN blobs sp ON sp.hash = p.specs_ref
+            LEFT JOIN blobs d ON d.hash = p.description_ref
+        """
+        params = ()
+        if category is not None:
+            query += " WHERE p.category = ?"
+            params = (category,)
+        query += " ORDER BY p.category, p.subcategory, p.title"
+
+        def unpack(blob):
+            return zlib.decompress(blob).decode("utf-8") if blob is not None else None
+
+        for row in self.conn.execute(query, params):
+            specs = unpack(row[7])
+            yield {
+                "id": row[0],
+                "url": row[1],
+                "title": row[2],
+                "price": row[3],
+                "category": row[4],
+                "subcategory": row[5],
+                "short_desc": unpack(row[6]),
+                "specs": json.loads(specs) if specs else {},
+                "description": unpack(row[8]),
+                "content_hash": row[9],
+            }
+
+    def iter_titles(self):
+        """(category, subcategory, title) of every product, ordered like iter_products."""
+        yield from self.conn.execute(
+            "SELECT category, subcategory, title FROM products ORDER BY category, subcategory, title"
+        )
+
+    def subcategory_hashes(self) -> dict:
+        """(category, subcategory) -> digest over its products' content hashes."""
+        groups = {}
+        for category, subcategory, digest in self.conn.execute(
+            "SELECT category, subcategory, content_hash FROM products ORDER BY category, subcategory, url"
+        ):
+            groups.setdefault((category, subcategory), hashlib.sha1()).update(digest.encode())
+        return {key: h.hexdigest() for key, h in groups.items()}
+
+    def prune_blobs(self) -> int:
+        """Drop blobs no product references any more."""
+        cursor = self.conn.execute(
+            """
+            DELETE FROM blobs WHERE hash NOT IN (
+                SELECT short_desc_ref FROM products WHERE short_desc_ref IS NOT NULL
+                UNION SELECT specs_ref FROM products WHERE specs_ref IS NOT NULL
+                UNION SELECT description_ref FROM products WHERE description_ref IS NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        products = self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        refs = self.conn.execute(
+            """
+            SELECT COUNT(short_desc_ref) + COUNT(specs_ref) + COUNT(description_ref) FROM products
+            """
+        ).fetchone()[0]
+        blobs, blob_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+        ).fetchone()
+        return {
+            "products": products,
+            "blob_refs": refs,
+            "unique_blobs": blobs,
+            "compressed_blob_bytes": blob_bytes,
+            "file_bytes": os.path.getsize(self.path),
+        }
+
+def import_txt_tree(store: ProductStore, root) -> int:
+    """Load a category/subcategory/*.txt tree written by the crawler."""
+    count = 0
+    for path in sorted(Path(root).glob("*/*/*.txt")):
+        fields = parse_product_txt(path)
+        if not fields["url"]:
+            continue
+        fields["category"] = path.parent.parent.name
+        fields["subcategory"] = path.parent.name
+        store.upsert(fields)
+        count += 1
+    store.commit()
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", default=STORE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="import one or more TXT trees")
+    p_import.add_argument("roots", nargs="+")
+    sub.add_parser("stats")
+    args = parser.parse_args()
+
+    store = ProductStore(args.store)
+    if args.command == "import":
+        for root in args.roots:
+            started = time.perf_counter()
+            count = import_txt_tree(store, root)
+            print(f"Imported {count} files from {root} in {time.perf_counter() - started:.1f}s")
+        print(f"Pruned {store.prune_blobs()} unreferenced blobs")
+    print(json.dumps(store.stats(), indent=2))
+    store.close()
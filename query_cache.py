@@ -0,0 +1,212 @@
+"""Two-level answer cache in front of rag_system.answer().
+
+Level one is exact: the normalized query plus its category/source filter.
+Level two is semantic: a previous answer under the same filter is reused
+when the new query's embedding is within SIMILARITY_THRESHOLD of it and
+both mention the same part numbers and values ("7805" and "7812" embed
+almost identically but must never share an answer).
+
+Entries live in SQLite with a TTL and a size bound (least recently used
+entries go first). Every ingest writes a new version marker into the
+vector store directory; when the marker changes, the whole cache is
+dropped, because any answer may now be stale.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+
+CACHE_PATH = "query_cache.sqlite3"
+VERSION_FILE = ".ingest_version"
+TTL_SECONDS = 24 * 3600
+MAX_ENTRIES = 5000
+SIMILARITY_THRESHOLD = 0.95  # cosine between normalized query embeddings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    filter TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    vector BLOB,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_filter ON answers(filter);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers(last_used);
+"""
+
+_PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_ARABIC_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "‌": " "})
+_PUNCTUATION = re.compile(r"[؟?!.,،؛;:«»\"'()\[\]]+")
+_SIGNIFICANT = re.compile(r"[a-z]*\d[a-z0-9.]*|[a-z]{2,}")
+
+def normalize_query(query: str) -> str:
+    text = query.translate(_PERSIAN_DIGITS).translate(_ARABIC_LETTERS).lower()
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+def signature(normalized: str) -> str:
+    """Part numbers, values and Latin words; semantic hits must match them exactly."""
+    return " ".join(sorted(set(_SIGNIFICANT.findall(normalized))))
+
+def filter_key(category, source) -> str:
+    return f"{category or ''}\0{source or ''}"
+
+def store_version(persist_directory: str) -> str:
+    try:
+        with open(os.path.join(persist_directory, VERSION_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def bump_store_version(persist_directory: str):
+    """Called after every ingest that changed the store; invalidates query caches."""
+    os.makedirs(persist_directory, exist_ok=True)
+    path = os.path.join(persist_directory, VERSION_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(tmp_path, path)
+
+class QueryCache:
+    def __init__(self, path: str = CACHE_PATH, persist_directory: str = "eca_products_vector_db",
+                 ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES,
+                 threshold: float = SIMILARITY_THRESHOLD):
+        self.path = path
+        self.persist_directory = persist_directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.matrices = {}  # filter -> (keys, signatures, vectors) for the semantic level
+        self.version_mtime = None
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+
+    def _check_version(self):
+        """Drop everything when the vector store was re-ingested."""
+        path = os.path.join(self.persist_directory, VERSION_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self.version_mtime:
+            return
+        self.version_mtime = mtime
+        current = store_version(self.persist_directory)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'store_version'").fetchone()
+        if row is None or row[0] != current:
+            self.conn.execute("DELETE FROM answers")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('store_version', ?)", (current,)
+            )
+            self.conn.commit()
+            self.matrices.clear()
+
+    def _exact_key(self, normalized, flt):
+        return hashlib.sha1(f"{normalized}\0{flt}".encode("utf-8")).hexdigest()
+
+    def _hit(self, key, kind):
+        row = self.conn.execute(
+            "SELECT result, created_at FROM answers WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        self.conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        self.hits[kind] += 1
+        return json.loads(row[0])
+
+    def get_exact(self, query, category=None, source=None):
+        with self.lock:
+            self._check_version()
+            return self._hit(self._exact_key(normalize_query(query), filter_key(category, source)), "exact")
+
+    def _matrix(self, flt):
+        if flt not in self.matrices:
+            rows = self.conn.execute(
+                "SELECT key, signature, vector FROM answers WHERE filter = ? AND vector IS NOT NULL AND created_at > ?",
+                (flt, time.time() - self.ttl),
+            ).fetchall()
+            vectors = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows]) if rows else None
+            self.matrices[flt] = ([r[0] for r in rows], [r[1] for r in rows], vectors)
+        return self.matrices[flt]
+
+    def get_similar(self, query, vector, category=None, source=None):
+        """A cached answer for a near-identical query under the same filter."""
+        with self.lock:
+            self._check_version()
+            flt = filter_key(category, source)
+            keys, signatures, vectors = self._matrix(flt)
+            if vectors is None:
+                self.misses += 1
+                return None
+            query_vector = np.asarray(vector, dtype=np.float32)
+            if vectors.shape[1] != query_vector.shape[0]:
+                self.misses += 1
+                return None
+            scores = vectors @ query_vector
+            wanted = signature(normalize_query(query))
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+                if signatures[i] == wanted:
+                    result = self._hit(keys[i], "semantic")
+                    if result is not None:
+                        return result
+            self.misses += 1
+            return None
+
+    def put(self, query, vector, category, source, result: dict):
+        normalized = normalize_query(query)
+        flt = filter_key(category, source)
+        blob = np.asarray(vector, dtype=np.float32).tobytes() if vector is not None else None
+        now = time.time()
+        with self.lock:
+            self._check_version()
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO answers (key, filter, signature, vector, result, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (self._exact_key(normalized, flt), flt, signature(normalized), blob,
+                 json.dumps(result, ensure_ascii=False), now, now),
+            )
+            self._evict(now)
+            self.conn.commit()
+            self.matrices.pop(flt, None)
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl,))
+        count = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count > self.max_entries:
+            # free a tenth at once so eviction doesn't run on every insert
+            excess = count - self.max_entries + self.max_entries // 10
+            self.conn.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self.matrices.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {"entries": entries, "exact_hits": self.hits["exact"],
+                "semantic_hits": self.hits["semantic"], "misses": self.misses}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,190 @@
+"""Answer a JSONL file of questions in bulk.
+
+Questions are read in slices of --batch-size. Each question goes through
+the same retrieval as rag_system.answer (routing, answer cache, spec index,
+BM25; see rag_system.start_retrieval); the ones that still need their
+embedding are embedded in one call per slice. Questions the cache or the
+spec index answer are written right away, the rest wait on a bounded
+queue for one of --concurrency LLM workers, which also respect --rate
+requests per second; generated answers go into the answer cache.
+Results are appended to the output JSONL as they finish, with per-query
+timings, so a large job is bounded by LLM throughput instead of per-call
+setup.
+
+    python rag_batch.py questions.jsonl answers.jsonl --concurrency 8 --rate 2
+    python rag_batch.py requests.jsonl out.jsonl --field title --id-field request_id --no-llm
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import rag_system
+
+BATCH_SIZE = 64
+CONCURRENCY = 4
+RATE = 0.0  # LLM calls per second; 0 means no limit
+
+class RateLimiter:
+    """Spaces call starts at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            now = loop.time()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def read_queries(path, field, id_field):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            query = (item.get(field) or "").strip() if isinstance(item, dict) else ""
+            if query:
+                yield {
+                    "id": item.get(id_field, line_number),
+                    "query": query,
+                    "category": item.get("category") or None,
+                    "source": item.get("source") or None,
+                }
+
+def read_slices(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def retrieve_slice(vectorstore, items, cache=None):
+    """Retrieve a slice of questions, embedding the ones that need it in one call."""
+    pending = []
+    for item in items:
+        item.update(rag_system.start_retrieval(vectorstore, item["query"], item["category"], item["source"], cache))
+        if item["cached"] is None and item["docs"] is None:
+            pending.append(item)
+
+    if pending:
+        started = time.perf_counter()
+        vectors = vectorstore.embeddings.embed_documents([item["query"] for item in pending])
+        embed_ms = (time.perf_counter() - started) * 1000 / len(pending)
+        for item, vector in zip(pending, vectors):
+            item["timings"]["embed_ms"] = embed_ms
+            rag_system.finish_retrieval(vectorstore, item, vector, cache)
+    for item in items:
+        item["retrieved_at"] = time.perf_counter()
+    return items
+
+async def run_batch(input_path, output_path, field="query", id_field="id", batch_size=BATCH_SIZE,
+                    concurrency=CONCURRENCY, rate=RATE, use_llm=True, use_cache=True):
+    vectorstore = await asyncio.to_thread(rag_system.get_vectorstore)
+    llm = rag_system.get_llm() if use_llm else None
+    cache = rag_system.get_query_cache() if use_cache else None
+    limiter = RateLimiter(rate)
+    # retrieval stays at most a few slices ahead of the LLM workers
+    pending = asyncio.Queue(maxsize=max(batch_size, concurrency * 4))
+    stats = {"done": 0, "failed": 0}
+    started = time.perf_counter()
+
+    out = open(output_path, "a", encoding="utf-8")
+
+    def write(item, answer=None, error=None):
+        timings = dict(item["timings"])
+        timings["total_ms"] = sum(timings.values())
+        result = {
+            "id": item["id"],
+            "query": item["query"],
+            **(answer or rag_system.make_result(item, None)),
+            "cache": item["cache"],
+            "timings": {name: round(value, 1) for name, value in timings.items()},
+        }
+        if error:
+            result["error"] = error
+            stats["failed"] += 1
+        else:
+            stats["done"] += 1
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+        total = stats["done"] + stats["failed"]
+        if total % 100 == 0:
+            elapsed = time.perf_counter() - started
+            print(f"  {total} queries in {elapsed:.1f}s ({total / elapsed:.2f}/s)")
+
+    async def producer():
+        for items in read_slices(read_queries(input_path, field, id_field), batch_size):
+            for item in await asyncio.to_thread(retrieve_slice, vectorstore, items, cache):
+                if item["cached"] is not None:
+                    write(item, item["cached"])
+                    continue
+                text = rag_system.direct_answer(item, llm)
+                if text is not None or llm is None:
+                    write(item, rag_system.make_result(item, text))
+                    continue
+                await pending.put(item)
+        for _ in range(concurrency):
+            await pending.put(None)
+
+    async def worker():
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            await limiter.wait()
+            item["timings"]["queue_ms"] = (time.perf_counter() - item["retrieved_at"]) * 1000
+            mark = time.perf_counter()
+            try:
+                answer = await rag_system.agenerate(llm, item["query"], item["docs"])
+            except Exception as e:
+                item["timings"]["generate_ms"] = (time.perf_counter() - mark) * 1000
+                write(item, error=str(e))
+                continue
+            item["timings"]["generate_ms"] = (time.perf_counter() - mark) * 1000
+            write(item, await asyncio.to_thread(rag_system.make_result, item, answer, cache))
+
+    try:
+        await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+    finally:
+        out.close()
+
+    elapsed = time.perf_counter() - started
+    total = stats["done"] + stats["failed"]
+    print(f"✅ {total} queries ({stats['failed']} failed) in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:.2f}/s) -> {output_path}")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", help="JSONL with one question per line")
+    parser.add_argument("output", help="JSONL results are appended to")
+    parser.add_argument("--field", default="query", help="field holding the question")
+    parser.add_argument("--id-field", default="id", help="field copied to the result as its id (default: line number)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="questions embedded per call")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument("--rate", type=float, default=RATE, help="max LLM calls per second (0: unlimited)")
+    parser.add_argument("--no-llm", action="store_true", help="only route and retrieve")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or fill the answer cache")
+    args = parser.parse_args()
+
+    asyncio.run(run_batch(
+        args.input, args.output, field=args.field, id_field=args.id_field,
+        batch_size=args.batch_size, concurrency=args.concurrency, rate=args.rate,
+        use_llm=not args.no_llm, use_cache=not args.no_cache,
+    ))
@@ -0,0 +1,153 @@
+"""Long-lived RAG query service.
+
+Loads the embedding model, the Chroma collection and the Cohere client
+once at startup and answers queries over a small JSON HTTP API, on a TCP
+port or a Unix socket. Each request is handled in its own thread; at most
+MAX_IN_FLIGHT queries run at once, the rest wait their turn.
+
+    python rag_service.py --port 8766
+    python rag_service.py --socket /tmp/elecyar.sock
+
+    curl -s localhost:8766/query -d '{"query": "قیمت رگولاتور 7805"}'
+    curl -s --unix-socket /tmp/elecyar.sock http://x/health
+
+POST /query  {"query": ..., "category": optional, "source": optional}
+             -> {"answer", "category", "source", "sources", "timings"}
+GET  /health -> {"status": "ok", "queries": n, "in_flight": n, "cache": {...}}
+"""
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rag_system
+
+MAX_IN_FLIGHT = 8
+MAX_BODY_BYTES = 64 * 1024
+
+class ServiceState:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT):
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.in_flight = 0
+        self.started = time.time()
+
+    def query(self, payload: dict) -> dict:
+        if not isinstance(payload, dict):
+            raise ValueError("the body must be a JSON object")
+        query = payload.get("query") or ""
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("query is required")
+        query = query.strip()
+        with self.slots:
+            with self.lock:
+                self.in_flight += 1
+            try:
+                return rag_system.answer(query, category=payload.get("category") or None,
+                                         source=payload.get("source") or None)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+                    self.queries += 1
+
+    def health(self) -> dict:
+        cache = rag_system.get_query_cache()
+        return {
+            "status": "ok",
+            "queries": self.queries,
+            "in_flight": self.in_flight,
+            "uptime_s": round(time.time() - self.started),
+            "cache": cache.stats() if cache is not None else None,
+        }
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/health":
+                return self.send_json(200, service.health())
+            self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/query":
+                return self.send_json(404, {"error": "not found"})
+            try:
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # the body's end is unknown: this connection can't be reused
+                    self.close_connection = True
+                    raise ValueError("invalid Content-Length")
+                if length > MAX_BODY_BYTES:
+                    self.close_connection = True
+                    return self.send_json(413, {"error": "request too large"})
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                result = service.query(payload)
+            except ValueError as e:  # json.JSONDecodeError too
+                return self.send_json(400, {"error": str(e)})
+            except Exception as e:
+                return self.send_json(500, {"error": str(e)})
+            self.send_json(200, result)
+
+        def send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def address_string(self):
+            # Unix socket peers have no (host, port)
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def start_server(service, host="127.0.0.1", port=8766, socket_path=""):
+    """Bind the service; returns (server, address) without serving yet."""
+    handler = make_handler(service)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, handler)
+        return server, f"unix:{socket_path}"
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--socket", default="", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rag_system.warm_up()
+    print(f"Model, vector store and LLM client loaded in {time.perf_counter() - started:.1f}s")
+
+    service = ServiceState(args.max_in_flight)
+    server, address = start_server(service, args.host, args.port, args.socket)
+    print(f"RAG service listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
@@ -1,5 +1,6 @@
 # rag_system_best.py
 import os
+import time
 import warnings
 import logging
 from functools import lru_cache
@@ -11,12 +12,31 @@ from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_cohere import ChatCohere
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.embeddings import Embeddings
+from langchain_core.documents import Document
+
+from embedding_cache import with_cache
+from routing_index import RoutingCache, normalize
+from spec_index import INDEX_FILE as SPEC_INDEX_FILE, SpecIndex, parse_constraints, parse_price, uncovered_terms
+from vector_index import INDEX_DIR as MMAP_INDEX_DIR, VectorIndex
 
 PERSIST_DIRECTORY = "eca_products_vector_db"
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 COHERE_MODEL = os.getenv("COHERE_MODEL", "command-r-plus-08-2024")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch" or "onnx" (int8, see onnx_embedding.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # "mmap": the exported index, see vector_index.py
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE", "query_cache.sqlite3")  # "" disables the answer cache
+LEXICAL_SEARCH = os.getenv("LEXICAL_SEARCH", "1") != "0"  # BM25 next to the vectors, see lexical_index.py
+LEXICAL_K = 6  # BM25 hits fused with the vector results
+HYBRID_K = 4  # documents handed to the LLM after fusion
+RRF_K = 60  # reciprocal rank fusion constant
+DATA_DIR = "eca_products_merged"
+PRODUCT_STORE = os.getenv("PRODUCT_STORE", "")  # route from the product store instead of the merged tree
+SPEC_DIRECT = os.getenv("SPEC_DIRECT", "1") != "0"  # answer spec-index matches without the LLM
+SPEC_LIMIT = 10  # products listed for a numeric question
+SPEC_POOL = 20  # BM25 and vector hits narrowed to the spec matches
 
 # Silence warnings
 warnings.filterwarnings(
@@ -27,21 +47,30 @@ logging.getLogger("transformers").setLevel(logging.ERROR)
 logging.getLogger("tokenizers").setLevel(logging.ERROR)
 logging.getLogger("sentence_transformers").setLevel(logging.ERROR)
 
-def load_embedding() -> HuggingFaceEmbeddings:
+def load_embedding(backend: Optional[str] = None) -> Embeddings:
     os.environ["TRANSFORMERS_OFFLINE"] = "1"
     os.environ["HF_HUB_OFFLINE"] = "1"
 
+    if (backend or EMBEDDING_BACKEND) == "onnx":
+        from onnx_embedding import ONNX_DIR, OnnxEmbeddings
+        if not os.path.isdir(ONNX_DIR):
+            raise RuntimeError(
+                f"ONNX model not found: {ONNX_DIR}. "
+                "Run `python onnx_embedding.py export` once."
+            )
+        return with_cache(OnnxEmbeddings(ONNX_DIR), ONNX_DIR)
+
     explicit_dir = os.getenv(
         "HF_MODEL_DIR",
         os.path.join("models_cache", "paraphrase-multilingual-MiniLM-L12-v2"),
     )
 
     if os.path.isdir(explicit_dir):
-        return HuggingFaceEmbeddings(
+        return with_cache(HuggingFaceEmbeddings(
             model_name=explicit_dir,
             model_kwargs={"device": "cpu", "local_files_only": True},
             encode_kwargs={"normalize_embeddings": True},
-        )
+        ), explicit_dir)
 
     # fallback caches
     cache_paths = [
@@ -53,12 +82,12 @@ def load_embedding() -> HuggingFaceEmbeddings:
     last_error = None
     for cache in cache_paths:
         try:
-            return HuggingFaceEmbeddings(
+            return with_cache(HuggingFaceEmbeddings(
                 model_name=MODEL_NAME,
                 model_kwargs={"device": "cpu", "local_files_only": True},
                 encode_kwargs={"normalize_embeddings": True},
                 cache_folder=cache,
-            )
+            ), MODEL_NAME)
         except Exception as e:
             last_error = e
             continue
@@ -73,50 +102,92 @@ def load_vectorstore(persist_directory: str) -> Chroma:
     if not Path(persist_directory).exists():
         raise FileNotFoundError(f"Vector DB not found: {persist_directory}")
     embedding = load_embedding()
+    if VECTOR_BACKEND == "mmap":
+        index_dir = Path(persist_directory) / MMAP_INDEX_DIR
+        if not index_dir.exists():
+            raise FileNotFoundError(
+                f"Memory-mapped index not found: {index_dir}. Run ingest or `python vector_index.py export`."
+            )
+        return VectorIndex(str(index_dir), embedding)
     return Chroma(persist_directory=persist_directory, embedding_function=embedding)
 
+# Loaded once per process and reused by every query; a long-lived process
+# (rag_service.py, batch jobs) pays the model/Chroma/client setup only once.
+@lru_cache(maxsize=4)
+def get_vectorstore(persist_directory: str = PERSIST_DIRECTORY) -> Chroma:
+    return load_vectorstore(persist_directory)
+
 @lru_cache(maxsize=1)
-def list_categories(data_dir: str = "eca_products_merged"):
-    path = Path(data_dir)
-    if not path.exists():
-        return []
-    return [p.name for p in path.iterdir() if p.is_dir()]
+def get_llm() -> Optional[ChatCohere]:
+    load_dotenv()
+    api_key = os.getenv("COHERE_API_KEY", "")
+    if not api_key:
+        return None
+    return ChatCohere(model=COHERE_MODEL, cohere_api_key=api_key, temperature=0.3, max_tokens=800)
 
-@lru_cache(maxsize=128)
-def list_sources(category: str, data_dir: str = "eca_products_merged"):
-    path = Path(data_dir) / category
-    if not path.exists():
-        return []
-    return [p.name for p in path.iterdir() if p.is_file()]
+@lru_cache(maxsize=1)
+def get_query_cache():
+    if not QUERY_CACHE_PATH:
+        return None
+    from query_cache import QueryCache
+    return QueryCache(QUERY_CACHE_PATH, PERSIST_DIRECTORY)
 
-def normalize_name(name: str) -> str:
-    name = name.replace("_merged.txt", "").replace(".txt", "")
-    for ch in ("_", "-", "(", ")", "[", "]"):
-        name = name.replace(ch, " ")
-    return " ".join(name.split()).strip().lower()
-
-def detect_source(query: str, category: str, data_dir: str = "eca_products_merged") -> Optional[str]:
-    q = normalize_name(query)
-    candidates = list_sources(category, data_dir)
-    scored = []
-    for src in candidates:
-        base = normalize_name(src)
-        if base and base in q:
-            scored.append((len(base), src))
-    if not scored:
+@lru_cache(maxsize=4)
+def get_lexical_index(persist_directory: str = PERSIST_DIRECTORY):
+    from lexical_index import INDEX_FILE, LexicalIndex
+    path = os.path.join(persist_directory, INDEX_FILE)
+    if not LEXICAL_SEARCH or not os.path.exists(path):
         return None
-    scored.sort(reverse=True)
-    return scored[0][1]
+    return LexicalIndex(path)
+
+def warm_up():
+    """Load the embedding model, the vector store and the LLM client now."""
+    vectorstore = get_vectorstore()
+    vectorstore.embeddings.embed_query("warm up")
+    get_llm()
+    get_lexical_index()
+    get_spec_index()
+    list_categories()
+
+# Spec index (spec_index.py), reloaded when ingest rewrites it
+_spec_indexes = {}
 
-def detect_category(query: str, data_dir: str = "eca_products_merged") -> Optional[str]:
-    q = query.strip()
-    if not q:
+def get_spec_index(persist_directory: str = PERSIST_DIRECTORY):
+    path = os.path.join(persist_directory, SPEC_INDEX_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
         return None
-    categories = list_categories(data_dir)
-    for cat in sorted(categories, key=len, reverse=True):
-        if cat and cat in q:
-            return cat
-    return None
+    cached = _spec_indexes.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _spec_indexes[path] = (mtime, SpecIndex(path))
+    return cached[1]
+
+# Routing index over category, source and product-family names (routing_index.py),
+# rebuilt when the merge manifest or the product store changes.
+_routing = {}
+
+def get_routing_index(data_dir: str = DATA_DIR):
+    cache = _routing.get(data_dir)
+    if cache is None:
+        # setdefault: concurrent first calls end up sharing one cache
+        cache = _routing.setdefault(data_dir, RoutingCache(data_dir, PRODUCT_STORE if data_dir == DATA_DIR else ""))
+    return cache.get()
+
+def list_categories(data_dir: str = DATA_DIR):
+    return get_routing_index(data_dir).categories
+
+def list_sources(category: str, data_dir: str = DATA_DIR):
+    return get_routing_index(data_dir).sources.get(category, [])
+
+def normalize_name(name: str) -> str:
+    return normalize(name)
+
+def detect_source(query: str, category: str, data_dir: str = DATA_DIR) -> Optional[str]:
+    return get_routing_index(data_dir).detect_source(query, category)
+
+def detect_category(query: str, data_dir: str = DATA_DIR) -> Optional[str]:
+    return get_routing_index(data_dir).detect_category(query)
 
 def build_chain(retriever, llm):
     template = (
@@ -150,44 +221,301 @@ def build_chain(retriever, llm):
         | StrOutputParser()
     )
 
-def run(query: str, show_sources: bool = False, category: Optional[str] = None, source: Optional[str] = None) -> str:
-    load_dotenv()
-    api_key = os.getenv("COHERE_API_KEY", "")
+def route(query: str, category: Optional[str] = None, source: Optional[str] = None):
+    """The (category, source) filter for a query; explicit values win."""
+    if source:
+        return category or detect_category(query), source
+    return get_routing_index().route(query, category)
+
+def lexical_search(query: str, detected: Optional[str], detected_source: Optional[str], k: int = LEXICAL_K):
+    """BM25 hits under the same filter as the vector search, and whether a
+    rare part number matched strongly enough to skip embedding the query."""
+    lexical = get_lexical_index()
+    if lexical is None:
+        return [], False
+    hits, strong = lexical.search(query, k, category=detected, source=detected_source)
+    if (detected or detected_source) and not hits:
+        hits, strong = lexical.search(query, k)
+    return hits, strong
+
+def docs_by_ids(vectorstore: Chroma, ids):
+    if not ids:
+        return []
+    if isinstance(vectorstore, VectorIndex):
+        return vectorstore.get_by_ids(ids)
+    page = vectorstore._collection.get(ids=list(ids), include=["documents", "metadatas"])
+    found = {
+        doc_id: Document(page_content=text or "", metadata=metadata or {}, id=doc_id)
+        for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+    }
+    return [found[doc_id] for doc_id in ids if doc_id in found]
+
+def fuse(*rankings, k: int = HYBRID_K):
+    """Reciprocal rank fusion of ranked document lists; earlier lists win ties."""
+    scores, docs = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+def spec_search(query: str, detected: Optional[str], detected_source: Optional[str]):
+    """Products meeting the numeric constraints in the query (volts, amps,
+    ohms, farads, watts, package, price), or None when it has none.
+
+    "covered" says whether the constraints and the routed category or
+    source describe the whole query; when nothing was routed, or a part
+    number, a bare value or an unrouted name is left over ("BC547 TO92",
+    "10K 1/4W", "فیوز 2 آمپر"), "products" holds every match, to narrow
+    retrieval with instead of answering from the index.
+    """
+    index = get_spec_index()
+    constraints = parse_constraints(query)
+    if index is None or not constraints:
+        return None
+    if all(attribute == "price" for attribute, _, _ in constraints) and not detected:
+        return None  # "under 20,000 toman" alone doesn't say what
+    covered = bool(detected or detected_source) and all(
+        named(word, detected, detected_source) for word in uncovered_terms(query)
+    )
+    limit = SPEC_LIMIT if covered else None
+    total, products = index.search(constraints, detected, detected_source, limit)
+    if not total and detected_source:
+        total, products = index.search(constraints, category=detected, limit=limit)
+    return {"constraints": constraints, "total": total, "products": products, "covered": covered}
+
+def named(word: str, detected: Optional[str], detected_source: Optional[str]) -> bool:
+    """Whether a word without digits is part of the routed category's name
+    or of its source names ("پل" in "دیود پل" names "پل دیودها")."""
+    if any(c.isdigit() for c in word):
+        return False
+    sources = [detected_source] if detected_source else list_sources(detected) if detected else []
+    names = normalize(" ".join([detected or "", *sources])).split()
+    return all(any(term.startswith(name) for name in names) for term in normalize(word).split())
+
+def spec_filter(docs, products):
+    """The documents of the given products: by url for product chunks, by
+    title for chunks of the merged tree (which have no url)."""
+    urls = {p["url"] for p in products}
+    titles = [p["title"] for p in products if p["title"]]
+    return [
+        doc for doc in docs
+        if doc.metadata.get("url") in urls
+        or (not doc.metadata.get("url") and any(title in doc.page_content for title in titles))
+    ]
+
+def spec_docs(products):
+    return [
+        Document(
+            page_content=f"عنوان: {p['title']}. قیمت: {p['price_text'] or 'ثبت نشده'}",
+            metadata={"category": p["category"], "source": p["source"], "url": p["url"]},
+        )
+        for p in products
+    ]
+
+def format_spec_answer(spec: dict) -> str:
+    lines = [f"{spec['total']} محصول با این مشخصات پیدا شد (به ترتیب قیمت):"]
+    for p in spec["products"]:
+        price = f"{p['price_text']} تومان" if parse_price(p["price_text"]) > 0 else "قیمت ثبت نشده"
+        lines.append(f"- {p['title']} — {price}")
+    if spec["total"] > len(spec["products"]):
+        lines.append(f"... و {spec['total'] - len(spec['products'])} محصول دیگر")
+    return "\n".join(lines)
 
-    vectorstore = load_vectorstore(PERSIST_DIRECTORY)
-    detected = category or detect_category(query)
-    detected_source = source
-    if detected and not detected_source:
-        detected_source = detect_source(query, detected)
+def retrieve(vectorstore: Chroma, query: str, detected: Optional[str], detected_source: Optional[str]):
+    return retrieve_query(vectorstore, query, detected, detected_source)["docs"]
 
-    search_kwargs = {"k": 3, "fetch_k": 6, "lambda_mult": 0.5}  # MMR retriever
+def retrieve_by_vector(vectorstore: Chroma, vector, detected: Optional[str], detected_source: Optional[str],
+                       k: int = 3):
+    """MMR search with an already computed query embedding (batch jobs embed many at once)."""
+    search_kwargs = {"k": k, "fetch_k": 2 * k, "lambda_mult": 0.5}  # MMR retriever
     if detected_source:
         search_kwargs["filter"] = {"source": detected_source}
     elif detected:
         search_kwargs["filter"] = {"category": detected}
 
-    retriever = vectorstore.as_retriever(search_type="mmr", search_kwargs=search_kwargs)
-    docs = retriever.invoke(query)
+    docs = vectorstore.max_marginal_relevance_search_by_vector(vector, **search_kwargs)
 
     # fallback if nothing found
     if (detected or detected_source) and not docs:
-        retriever = vectorstore.as_retriever(search_type="mmr", search_kwargs={"k": 4, "fetch_k": 8, "lambda_mult": 0.5})
-        docs = retriever.invoke(query)
+        docs = vectorstore.max_marginal_relevance_search_by_vector(vector, k=k + 1, fetch_k=2 * (k + 1),
+                                                                    lambda_mult=0.5)
+    return docs
 
-    if show_sources:
-        if detected_source:
-            print(f"[source filter] {detected_source}")
-        elif detected:
-            print(f"[category filter] {detected}")
-        for i, doc in enumerate(docs, 1):
-            print(f"[{i}] {doc.metadata.get('category', 'N/A')} :: {doc.metadata.get('source', 'N/A')}")
+def generate(llm, query: str, docs) -> str:
+    # the documents are already retrieved; don't let the chain search again
+    chain = build_chain(RunnableLambda(lambda _: docs), llm)
+    return chain.invoke(query)
 
-    if not api_key:
-        return "Cohere API key not set. Showing sources only."
+async def agenerate(llm, query: str, docs) -> str:
+    chain = build_chain(RunnableLambda(lambda _: docs), llm)
+    return await chain.ainvoke(query)
 
-    llm = ChatCohere(model=COHERE_MODEL, cohere_api_key=api_key, temperature=0.3, max_tokens=800)
-    chain = build_chain(retriever, llm)
-    return chain.invoke(query)
+def start_retrieval(vectorstore: Chroma, query: str, category: Optional[str] = None,
+                    source: Optional[str] = None, cache=None) -> dict:
+    """Route a query and run every search that doesn't need its embedding.
+
+    Returns the retrieval state shared by answer() and rag_batch.py:
+    "cached" holds an exact answer-cache hit; otherwise "docs" is set when
+    the spec index or a strong BM25 match settled retrieval, and is None
+    when finish_retrieval() must complete it with the query embedding.
+    """
+    timings = {}
+    mark = time.perf_counter()
+    detected, detected_source = route(query, category, source)
+    timings["route_ms"] = (time.perf_counter() - mark) * 1000
+    item = {
+        "query": query, "detected": detected, "detected_source": detected_source, "timings": timings,
+        "spec": None, "spec_hit": False, "narrow": False, "lexical_docs": [], "docs": None, "vector": None,
+        "cached": None, "cache": None,
+    }
+
+    if cache is not None:
+        item["cached"] = cache.get_exact(query, detected, detected_source)
+        if item["cached"] is not None:
+            item["cache"] = "exact"
+            return item
+
+    mark = time.perf_counter()
+    spec = item["spec"] = spec_search(query, detected, detected_source)
+    item["spec_hit"] = bool(spec and spec["total"] and spec["covered"])
+    item["narrow"] = bool(spec and spec["total"] and not spec["covered"])
+    timings["spec_ms"] = (time.perf_counter() - mark) * 1000
+    if item["spec_hit"]:
+        item["docs"] = spec_docs(spec["products"])
+        return item
+
+    mark = time.perf_counter()
+    hits, strong = lexical_search(query, detected, detected_source, SPEC_POOL if item["narrow"] else LEXICAL_K)
+    lexical_docs = item["lexical_docs"] = docs_by_ids(vectorstore, [doc_id for doc_id, _ in hits])
+    if item["narrow"]:
+        # the part number's documents of another package or rating don't count
+        narrowed = spec_filter(lexical_docs, spec["products"])
+        if strong and narrowed and narrowed[0] is lexical_docs[0]:
+            item["docs"] = narrowed[:HYBRID_K]
+    elif strong:
+        item["docs"] = lexical_docs[:HYBRID_K]
+    timings["lexical_ms"] = (time.perf_counter() - mark) * 1000
+    return item
+
+def finish_retrieval(vectorstore: Chroma, item: dict, vector, cache=None) -> dict:
+    """Semantic cache lookup and vector search for a state from start_retrieval()."""
+    item["vector"] = vector
+    detected, detected_source = item["detected"], item["detected_source"]
+    if cache is not None and not item["narrow"]:
+        item["cached"] = cache.get_similar(item["query"], vector, detected, detected_source)
+        if item["cached"] is not None:
+            item["cache"] = "semantic"
+            return item
+
+    mark = time.perf_counter()
+    if item["narrow"]:
+        pool = fuse(
+            item["lexical_docs"], retrieve_by_vector(vectorstore, vector, detected, detected_source, SPEC_POOL),
+            k=2 * SPEC_POOL,
+        )
+        # nothing left: the constraints contradict the part number, show what exists
+        item["docs"] = spec_filter(pool, item["spec"]["products"])[:HYBRID_K] or pool[:HYBRID_K]
+        item["vector"] = None  # cache the answer for this exact query only
+    else:
+        item["docs"] = fuse(item["lexical_docs"], retrieve_by_vector(vectorstore, vector, detected, detected_source))
+    item["timings"]["retrieve_ms"] = (time.perf_counter() - mark) * 1000
+    return item
+
+def retrieve_query(vectorstore: Chroma, query: str, category: Optional[str] = None,
+                   source: Optional[str] = None, cache=None) -> dict:
+    """start_retrieval() and, when needed, the embedding and finish_retrieval()."""
+    item = start_retrieval(vectorstore, query, category, source, cache)
+    if item["cached"] is None and item["docs"] is None:
+        mark = time.perf_counter()
+        vector = vectorstore.embeddings.embed_query(query)
+        item["timings"]["embed_ms"] = (time.perf_counter() - mark) * 1000
+        finish_retrieval(vectorstore, item, vector, cache)
+    return item
+
+def direct_answer(item: dict, llm) -> Optional[str]:
+    """The spec-index listing when it answers the query without the LLM."""
+    if item["spec_hit"] and (SPEC_DIRECT or llm is None):
+        return format_spec_answer(item["spec"])
+    return None
+
+def make_result(item: dict, text: Optional[str], cache=None) -> dict:
+    """The answer of a retrieved query; pass the cache only for generated answers."""
+    result = {
+        "answer": text,
+        "category": item["detected"],
+        "source": item["detected_source"],
+        "sources": [
+            {"category": doc.metadata.get("category"), "source": doc.metadata.get("source")}
+            for doc in item["docs"]
+        ],
+    }
+    if item["spec_hit"]:
+        result["products"] = item["spec"]["products"]
+        result["matches"] = item["spec"]["total"]
+    if cache is not None:
+        cache.put(item["query"], item["vector"], item["detected"], item["detected_source"], result)
+    return result
+
+def answer(query: str, category: Optional[str] = None, source: Optional[str] = None, use_cache: bool = True) -> dict:
+    """Route, retrieve and generate; returns the answer with its sources and timings.
+
+    Answers are cached (query_cache.py): an exact hit skips everything after
+    routing, a semantic hit everything after embedding the query. Retrieval
+    fuses BM25 and vector results; a strong part-number match in the BM25
+    index skips the embedding (and the semantic cache) altogether.
+
+    A routed query fully described by its category and numeric constraints
+    that the spec index can satisfy skips retrieval: with SPEC_DIRECT the
+    matching products are listed without the LLM; the result then also
+    carries "products" and "matches". When nothing was routed or the query
+    names more than that (a part number, a value without a unit, a product
+    the router doesn't know), the spec matches instead narrow a
+    wider BM25 and vector search, and the semantic cache is skipped: a
+    similar question may ask for another rating.
+    """
+    started = time.perf_counter()
+    vectorstore = get_vectorstore()
+    cache = get_query_cache() if use_cache else None
+    item = retrieve_query(vectorstore, query, category, source, cache)
+    timings = item["timings"]
+
+    def finish(result, cache_level):
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+        return {
+            **result,
+            "cache": cache_level,
+            "timings": {name: round(value, 1) for name, value in timings.items()},
+        }
+
+    if item["cached"] is not None:
+        return finish(item["cached"], item["cache"])
+
+    llm = get_llm()
+    text = direct_answer(item, llm)
+    if text is not None:
+        return finish(make_result(item, text), None)  # nothing generated, nothing to cache
+    if llm is None:
+        return finish(make_result(item, "Cohere API key not set. Showing sources only."), None)
+    mark = time.perf_counter()
+    text = generate(llm, query, item["docs"])
+    timings["generate_ms"] = (time.perf_counter() - mark) * 1000
+    return finish(make_result(item, text, cache), None)
+
+def run(query: str, show_sources: bool = False, category: Optional[str] = None, source: Optional[str] = None,
+        use_cache: bool = True) -> str:
+    result = answer(query, category=category, source=source, use_cache=use_cache)
+
+    if show_sources:
+        if result["source"]:
+            print(f"[source filter] {result['source']}")
+        elif result["category"]:
+            print(f"[category filter] {result['category']}")
+        for i, doc in enumerate(result["sources"], 1):
+            print(f"[{i}] {doc['category'] or 'N/A'} :: {doc['source'] or 'N/A'}")
+
+    return result["answer"]
 
 # direct helper for code usage
 def ask(query: str, show_sources: bool = False):
@@ -202,11 +530,13 @@ if __name__ == "__main__":
     parser.add_argument("--show-sources", action="store_true")
     parser.add_argument("--category", default="")
     parser.add_argument("--source", default="")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the answer cache")
     args = parser.parse_args()
 
     query = args.query.strip() or input("Enter your question: ").strip()
     if not query:
         print("No query provided.")
     else:
-        answer = run(query, show_sources=args.show_sources, category=(args.category or None), source=(args.source or None))
-        print("\nAnswer:\n" + answer)
+        text = run(query, show_sources=args.show_sources, category=(args.category or None), source=(args.source or None),
+                   use_cache=not args.no_cache)
+        print("\nAnswer:\n" + text)
@@ -0,0 +1,118 @@
+import asyncio
+import random
+import time
+from urllib.parse import urlparse
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RetryableError(Exception):
+    """Raised for responses that should be retried after backing off."""
+
+    def __init__(self, url, status, retry_after=None):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+class HostPacer:
+    """AIMD pacing for one host plus a circuit breaker.
+
+    The request rate grows additively while responses are healthy and fast,
+    is halved on errors, 429 and 5xx responses, and the breaker pauses every
+    request to the host after too many consecutive failures.
+    """
+
+    def __init__(
+        self,
+        host,
+        initial_interval=1.0,
+        min_interval=0.1,
+        max_interval=30.0,
+        target_latency=3.0,
+        increase_step=0.05,
+        decrease_factor=0.5,
+        breaker_threshold=8,
+        breaker_cooldown=120.0,
+        log=print,
+    ):
+        self.host = host
+        self.rate = 1.0 / initial_interval
+        self.min_rate = 1.0 / max_interval
+        self.max_rate = 1.0 / min_interval
+        self.target_latency = target_latency
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.log = log
+
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.next_slot = 0.0
+        self.requests = 0
+        self.failures = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until the next request to this host is allowed to start."""
+        async with self._lock:
+            now = time.monotonic()
+            if self.open_until > now:
+                await asyncio.sleep(self.open_until - now)
+                now = time.monotonic()
+            if self.next_slot > now:
+                await asyncio.sleep(self.next_slot - now)
+                now = time.monotonic()
+            self.next_slot = now + 1.0 / self.rate
+            self.requests += 1
+
+    def record(self, latency, status=None, error=False, retry_after=None):
+        now = time.monotonic()
+        if error or (status is not None and status in RETRY_STATUSES):
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            if retry_after:
+                self.next_slot = max(self.next_slot, now + retry_after)
+            if self.consecutive_failures >= self.breaker_threshold and self.open_until <= now:
+                self.open_until = now + self.breaker_cooldown
+                self.log(
+                    f"🛑 {self.host}: {self.consecutive_failures} خطای پیاپی — "
+                    f"توقف {self.breaker_cooldown:.0f} ثانیه"
+                )
+            return
+
+        self.consecutive_failures = 0
+        if latency > self.target_latency:
+            self.rate = max(self.min_rate, self.rate * 0.9)
+        else:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+class RetryBudget:
+    """Caps retries at a fraction of first attempts, plus a small reserve."""
+
+    def __init__(self, ratio=0.2, reserve=10):
+        self.ratio = ratio
+        self.tokens = float(reserve)
+        self.max_tokens = float(reserve) * 10
+
+    def record_attempt(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+def backoff_delay(attempt, base=2.0, cap=60.0):
+    """Full-jitter exponential backoff for the given (0-based) retry."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def host_of(url):
+    return urlparse(url).hostname or ""
@@ -0,0 +1,267 @@
+"""Category/source routing for rag_system with one pass over the query.
+
+All normalized category names, subcategory (source) names and product
+families - part numbers from product titles that occur in exactly one
+subcategory, like "7810" or "bc547" - are compiled into one Aho-Corasick
+automaton. Routing a query walks it once, so the cost depends on the query
+length, not on how many subcategories or products the catalog has. The
+longest match decides: a subcategory name or family picks its category
+even without the category's own name in the query, and the source is the
+longest source name or family found inside that category.
+
+The index is built from the merged tree (eca_products_merged) or from the
+product store, and rebuilt when the merge manifest or the store changes.
+
+    python routing_index.py "قیمت رگولاتور 7810"
+"""
+import argparse
+import os
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from lexical_index import is_part_number, tokenize
+
+DATA_DIR = "eca_products_merged"
+MANIFEST_NAME = ".merge_manifest.json"
+CHECK_INTERVAL = 2.0  # seconds between checks whether the source data changed
+
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_LETTERS = str.maketrans({"ي": "ی", "ك": "ک"})
+_TITLE = re.compile(r"^عنوان:\s*\n(.+)$", re.MULTILINE)
+_VALUE = re.compile(r"\d+(?:\.\d+)?[a-zµ]{1,3}")  # "4.7k", "100uh", "0.25w": values, not families
+
+def _is_latin(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+def normalize(text: str) -> str:
+    text = text.replace("_merged.txt", "").replace(".txt", "")
+    text = text.translate(_DIGITS).translate(_LETTERS)
+    for ch in ("_", "-", "(", ")", "[", "]"):
+        text = text.replace(ch, " ")
+    return " ".join(text.split()).strip().lower()
+
+class Automaton:
+    """Aho-Corasick over strings; find() yields (start, end, payload)."""
+
+    def __init__(self, patterns: dict):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pattern, payload in patterns.items():
+            state = 0
+            for ch in pattern:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.out[state].append((len(pattern), payload))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text: str):
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for length, payload in self.out[state]:
+                yield end - length, end, payload
+
+class RoutingIndex:
+    def __init__(self, categories: dict, titles=()):
+        """categories: category -> source file names; titles: (category, source, title)."""
+        self.categories = sorted(categories)
+        self.sources = {category: sorted(sources) for category, sources in categories.items()}
+
+        patterns = {}
+
+        def add(pattern, target):
+            if pattern:
+                patterns.setdefault(pattern, []).append(target)
+
+        for category, sources in categories.items():
+            add(normalize(category), ("category", category, None))
+            for source in sources:
+                add(normalize(source), ("source", category, source))
+
+        families = {}
+        for category, source, title in titles:
+            for term in tokenize(title or ""):
+                if is_part_number(term) and not _VALUE.fullmatch(term):
+                    families.setdefault(term, set()).add((category, source))
+        for term, targets in families.items():
+            if len(targets) == 1:
+                category, source = next(iter(targets))
+                add(term, ("family", category, source))
+        self.families = sum(1 for targets in families.values() if len(targets) == 1)
+        self.automaton = Automaton(patterns)
+
+    def matches(self, query: str):
+        """(length, kind, category, source) for every pattern in the query."""
+        text = normalize(query)
+        found = []
+        for start, end, targets in self.automaton.find(text):
+            # part numbers only count as whole tokens ("7810" is not in "78100"),
+            # names only at Latin word edges ("pic" is not in "picoblade")
+            left = start > 0 and text[start - 1].isalnum()
+            right = end < len(text) and text[end].isalnum()
+            latin = (left and _is_latin(text[start])) or (right and _is_latin(text[end - 1]))
+            for kind, category, source in targets:
+                if not latin and not (kind == "family" and (left or right)):
+                    found.append((end - start, kind, category, source))
+        return found
+
+    def detect_category(self, query: str, matches=None):
+        """The longest category name in the query."""
+        matches = self.matches(query) if matches is None else matches
+        names = [(length, category) for length, kind, category, _ in matches if kind == "category"]
+        return max(names)[1] if names else None
+
+    def detect_source(self, query: str, category: str, matches=None):
+        """The longest source name or product family of `category` in the query."""
+        matches = self.matches(query) if matches is None else matches
+        sources = [(length, source) for length, kind, cat, source in matches if source and cat == category]
+        return max(sources)[1] if sources else None
+
+    def route(self, query: str, category=None):
+        """(category, source) for a query; an explicit category is kept.
+
+        Otherwise the longest name or family in the query decides the
+        category ("سلف مقاومتی" beats "مقاومت"); when that match exists in
+        several categories, the longest category name does.
+        """
+        matches = self.matches(query)
+        if not category and matches:
+            longest = max(length for length, *_ in matches)
+            found = {cat for length, _, cat, _ in matches if length == longest}
+            if len(found) == 1:
+                category = next(iter(found))
+        category = category or self.detect_category(query, matches)
+        if not category:
+            return None, None
+        return category, self.detect_source(query, category, matches)
+
+def tree_signature(data_dir: str):
+    """Changes whenever merge_all_categories rewrites the tree."""
+    manifest = Path(data_dir) / MANIFEST_NAME
+    try:
+        stat = manifest.stat()
+        return ("manifest", stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        pass
+    # no manifest (hand-made tree): the directory listing times
+    path = Path(data_dir)
+    if not path.is_dir():
+        return None
+    return ("dirs",) + tuple(sorted((p.name, p.stat().st_mtime_ns) for p in path.iterdir() if p.is_dir())) + (
+        path.stat().st_mtime_ns,
+    )
+
+def store_signature(store_path: str):
+    signature = []
+    for path in (store_path, store_path + "-wal"):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def build_from_tree(data_dir: str = DATA_DIR) -> RoutingIndex:
+    categories, titles = {}, []
+    path = Path(data_dir)
+    if path.is_dir():
+        for category_dir in path.iterdir():
+            if not category_dir.is_dir():
+                continue
+            sources = [p.name for p in category_dir.iterdir() if p.is_file()]
+            categories[category_dir.name] = sources
+            for source in sources:
+                text = (category_dir / source).read_text(encoding="utf-8", errors="ignore")
+                titles.extend((category_dir.name, source, title) for title in _TITLE.findall(text))
+    return RoutingIndex(categories, titles)
+
+def build_from_store(store_path: str) -> RoutingIndex:
+    from product_record import clean_name
+    from product_store import ProductStore
+
+    store = ProductStore(store_path)
+    categories, titles = {}, []
+    try:
+        for category, subcategory, title in store.iter_titles():
+            # same names as the merged files and the vector store metadata
+            category = clean_name(category)
+            source = f"{clean_name(subcategory)}_merged.txt"
+            sources = categories.setdefault(category, [])
+            if not sources or sources[-1] != source:
+                sources.append(source)
+            titles.append((category, source, title))
+    finally:
+        store.close()
+    return RoutingIndex(categories, titles)
+
+class RoutingCache:
+    """The current RoutingIndex for a data dir or store, rebuilt when it changes.
+
+    Safe to share between rag_service's request threads: one thread checks
+    and rebuilds while the others wait for the new index.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, store_path: str = ""):
+        self.data_dir = data_dir
+        self.store_path = store_path
+        self.index = None
+        self.signature = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self) -> RoutingIndex:
+        index = self.index
+        if index is not None and time.monotonic() - self.checked_at < CHECK_INTERVAL:
+            return index
+        with self.lock:
+            now = time.monotonic()
+            if self.index is not None and now - self.checked_at < CHECK_INTERVAL:
+                return self.index  # another thread just checked
+            if self.store_path:
+                signature = store_signature(self.store_path)
+            else:
+                signature = tree_signature(self.data_dir)
+            if self.index is None or signature != self.signature:
+                if self.store_path:
+                    self.index = build_from_store(self.store_path)
+                else:
+                    self.index = build_from_tree(self.data_dir)
+                self.signature = signature
+            self.checked_at = now
+            return self.index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query", nargs="+")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--store", default="", help="build from a product store instead of the merged tree")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = RoutingCache(args.data_dir, args.store).get()
+    print(f"{len(index.categories)} categories, {sum(map(len, index.sources.values()))} sources, "
+          f"{index.families} product families in {time.perf_counter() - started:.2f}s")
+    for query in args.query:
+        started = time.perf_counter()
+        category, source = index.route(query)
+        print(f"{query!r} -> {category} / {source} ({(time.perf_counter() - started) * 1e6:.0f} µs)")
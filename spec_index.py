@@ -0,0 +1,266 @@
+"""Typed spec index for numeric questions ("دیود پل 10 آمپر 1000 ولت زیر 20,000 تومان").
+
+Every product's title and structured specs are parsed into quantities in
+base units (V, A, Ω, F, W), packages ("TO220", "SOT23", "SMD1210") and a
+numeric price, after unifying Persian digits and thousands separators.
+The index is columnar: one array per product field, and per attribute a
+value-sorted (values, rows) pair, so a range constraint is two binary
+searches and a query is a handful of numpy operations.
+
+ingest_eca_products.py rebuilds it next to the vector store on every run;
+rag_system.answer() uses it for queries with numeric constraints.
+
+    python spec_index.py "خازن 100 میکروفاراد 25 ولت"
+"""
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+INDEX_FILE = "spec_index.npz"  # inside the vector store directory
+UNITS = ("V", "A", "Ω", "F", "W")
+TOLERANCE = 1e-6  # relative; "equal" values may differ by float noise only
+
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٫٬", "01234567890123456789.,")
+# "1/4" (a 1/4 W resistor) is a fraction; the second number of any other
+# "a/b" ("12/24V") is never read on its own
+_NUMBER = r"(?<![\w./])([1-9]/(?:2|4|8|16|32)(?!\d)|\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)"
+_PREFIXES = {
+    "p": 1e-12, "n": 1e-9, "u": 1e-6, "µ": 1e-6, "μ": 1e-6, "m": 1e-3, "k": 1e3, "K": 1e3, "M": 1e6, "G": 1e9,
+    "پیکو": 1e-12, "نانو": 1e-9, "میکرو": 1e-6, "میلی": 1e-3, "کیلو": 1e3, "مگا": 1e6,
+}
+_UNIT_NAMES = {
+    "V": "V", "v": "V", "ولت": "V",
+    "A": "A", "آمپر": "A",
+    "Ω": "Ω", "ohm": "Ω", "Ohm": "Ω", "OHM": "Ω", "اهم": "Ω",
+    "F": "F", "f": "F", "فاراد": "F",
+    "W": "W", "w": "W", "وات": "W",
+}
+_QUANTITY = re.compile(
+    _NUMBER
+    + r"\s*(" + "|".join(sorted(map(re.escape, _PREFIXES), key=len, reverse=True)) + r")?\s*"
+    + r"(" + "|".join(sorted(map(re.escape, _UNIT_NAMES), key=len, reverse=True)) + r")(?![A-Za-z0-9])"
+)
+_PRICE = re.compile(_NUMBER + r"\s*(هزار|میلیون)?\s*(تومان|تومن|ریال)")
+_PACKAGE = re.compile(
+    r"\b(TO|SOT|SOD|SOP|SOIC|SSOP|TSSOP|MSOP|DIP|PDIP|QFN|DFN|QFP|LQFP|TQFP|DO|TSOT|DPAK|D2PAK)[- ]?(\d+(?:-\d+)?)\b"
+    r"|\bSMD[- ]?(0201|0402|0603|0805|1206|1210|1812|2010|2512)\b"
+)
+_LESS = re.compile(r"(زیر|کمتر از|کمتر|حداکثر|تا|ارزان\S* از|پایین\S* از|<=?|under|below|max)\s*$", re.IGNORECASE)
+_MORE = re.compile(r"(بالای|بیشتر از|بیشتر|حداقل|بالاتر از|>=?|over|above|min|at least)\s*$", re.IGNORECASE)
+# words a spec question carries besides its constraints and the product's name
+_FILLER = frozenset(
+    "قیمت خرید چند چنده چقدر میخوام می‌خوام میخواهم لطفا موجود دارید دارین هست است مدل نوع عدد پکیج "
+    "و در با به از که را این آن برای یا تا ها های هر یک چه "
+    "زیر کمتر حداکثر حداقل بیشتر بالای بالاتر پایین ارزان ارزان‌تر "
+    "price package the and of for with under below max over above min at least".split()
+)
+_LESS_AFTER = re.compile(r"^\s*(به پایین|یا کمتر|و کمتر)")
+_MORE_AFTER = re.compile(r"^\s*(به بالا|یا بیشتر|و بیشتر)")
+# unit hints in spec names, for bare numbers like {"ولتاژ (v)": "25"}
+_KEY_UNITS = (
+    (re.compile(r"\((\w+)\)"), None),
+    (re.compile(r"ولتاژ|voltage", re.IGNORECASE), "V"),
+    (re.compile(r"جریان|current", re.IGNORECASE), "A"),
+    (re.compile(r"توان|power", re.IGNORECASE), "W"),
+    (re.compile(r"مقاومت|resistance", re.IGNORECASE), "Ω"),
+    (re.compile(r"ظرفیت|capacitance", re.IGNORECASE), "F"),
+)
+
+def normalize_digits(text: str) -> str:
+    return (text or "").translate(_DIGITS)
+
+def parse_number(text: str) -> float:
+    if "/" in text:
+        numerator, denominator = text.split("/")
+        return int(numerator) / int(denominator)
+    return float(text.replace(",", ""))
+
+def parse_quantities(text: str):
+    """(unit, value in base units, start, end) for every quantity in the text."""
+    text = normalize_digits(text)
+    for match in _QUANTITY.finditer(text):
+        number, prefix, unit = match.groups()
+        if unit == "f" and not prefix:
+            continue  # "10f" is not a capacitance, "10uf" is
+        yield _UNIT_NAMES[unit], parse_number(number) * _PREFIXES.get(prefix, 1.0), match.start(), match.end()
+
+def parse_price(text) -> float:
+    digits = re.sub(r"[^\d]", "", normalize_digits(str(text or "")))
+    return float(digits) if digits and int(digits) else float("nan")  # 0: price not listed
+
+def parse_packages(text: str) -> set:
+    packages = set()
+    for match in _PACKAGE.finditer(normalize_digits(text).upper()):
+        family, size, smd = match.groups()
+        packages.add(f"SMD{smd}" if smd else f"{family}{size}")
+    return packages
+
+def spec_values(name: str, value: str):
+    """Quantities of one spec; bare numbers take their unit from the spec name."""
+    value = normalize_digits(str(value)).strip()
+    found = [(unit, number) for unit, number, _, _ in parse_quantities(value)]
+    if found or not re.fullmatch(r"\d+(?:[.,]\d+)?", value):
+        return found
+    for pattern, unit in _KEY_UNITS:
+        match = pattern.search(name)
+        if match:
+            hint = unit or match.group(1)
+            return [(unit, number) for unit, number, _, _ in parse_quantities(f"{value} {hint}")]
+    return []
+
+def product_attributes(record: dict):
+    """Quantities by unit and packages of one product (title + specs)."""
+    quantities = {unit: set() for unit in UNITS}
+    for unit, value, _, _ in parse_quantities(record.get("title") or ""):
+        quantities[unit].add(value)
+    packages = parse_packages(record.get("title") or "")
+    for name, value in (record.get("specs") or {}).items():
+        for unit, number in spec_values(name, value):
+            quantities[unit].add(number)
+        if "پکیج" in name or "package" in name.lower():
+            packages.add(re.sub(r"[\s-]", "", normalize_digits(str(value)).upper()))
+            packages |= parse_packages(str(value))
+    return quantities, packages
+
+def parse_constraints(query: str):
+    """(attribute, op, value) constraints in a question; op is "eq", "le" or "ge"."""
+    text = normalize_digits(query)
+    constraints, taken = [], []
+
+    def op_at(start, end):
+        if _LESS.search(text[max(0, start - 20):start]) or _LESS_AFTER.match(text[end:]):
+            return "le"
+        if _MORE.search(text[max(0, start - 20):start]) or _MORE_AFTER.match(text[end:]):
+            return "ge"
+        return "eq"
+
+    for match in _PRICE.finditer(text):
+        number, scale, currency = match.groups()
+        price = parse_number(number) * {"هزار": 1e3, "میلیون": 1e6}.get(scale, 1.0)
+        if currency == "ریال":
+            price /= 10
+        op = op_at(match.start(), match.end())
+        constraints.append(("price", "le" if op == "eq" else op, price))
+        taken.append((match.start(), match.end()))
+    for unit, value, start, end in parse_quantities(text):
+        if not any(a <= start < b for a, b in taken):
+            constraints.append((unit, op_at(start, end), value))
+    for package in parse_packages(text):
+        constraints.append(("package", "eq", package))
+    return constraints
+
+def uncovered_terms(query: str) -> list:
+    """Words no constraint accounts for: part numbers ("BC547"), values
+    without a unit ("10K") and names ("LED", "فیوز"), minus filler words.
+    The caller decides which names its routing covers; a query without
+    any leftover is fully described by parse_constraints()."""
+    text = list(normalize_digits(query))
+    joined = "".join(text)
+    spans = [match.span() for match in _PRICE.finditer(joined)]
+    spans += [(start, end) for _, _, start, end in parse_quantities(joined)]
+    spans += [match.span() for match in _PACKAGE.finditer(joined.upper())]
+    for start, end in spans:
+        text[start:end] = " " * (end - start)
+    words = [word.strip("؟?!.,،:;()") for word in "".join(text).split()]
+    return [word for word in words if word and word.lower() not in _FILLER]
+
+def build(records, path: str) -> int:
+    """Write the index for an iterable of records with id, title, price,
+    category, source, url and specs; returns the number of products."""
+    columns = {name: [] for name in ("id", "title", "price_text", "category", "source", "url")}
+    prices, values, packages = [], {unit: ([], []) for unit in UNITS}, ([], [])
+    for row, record in enumerate(records):
+        for name in columns:
+            columns[name].append(str(record.get(name if name != "price_text" else "price") or ""))
+        prices.append(parse_price(record.get("price")))
+        quantities, product_packages = product_attributes(record)
+        for unit, found in quantities.items():
+            values[unit][0].extend(found)
+            values[unit][1].extend([row] * len(found))
+        packages[0].extend(product_packages)
+        packages[1].extend([row] * len(product_packages))
+
+    arrays = {name: np.array(column, dtype=str) for name, column in columns.items()}
+    arrays["price"] = np.array(prices, dtype=np.float64)
+    for unit, (unit_values, rows) in values.items():
+        order = np.argsort(np.array(unit_values, dtype=np.float64), kind="stable")
+        arrays[f"{unit}_values"] = np.array(unit_values, dtype=np.float64)[order]
+        arrays[f"{unit}_rows"] = np.array(rows, dtype=np.int32)[order]
+    order = np.argsort(np.array(packages[0], dtype=str), kind="stable")
+    arrays["package_values"] = np.array(packages[0], dtype=str)[order]
+    arrays["package_rows"] = np.array(packages[1], dtype=np.int32)[order]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return len(columns["id"])
+
+class SpecIndex:
+    def __init__(self, path: str):
+        with np.load(path) as data:
+            self.arrays = {name: data[name] for name in data.files}
+        self.size = len(self.arrays["id"])
+
+    def _rows(self, attribute, op, value):
+        """Boolean mask of the products satisfying one constraint."""
+        mask = np.zeros(self.size, dtype=bool)
+        if attribute == "price":
+            price = self.arrays["price"]
+            with np.errstate(invalid="ignore"):
+                if op == "le":
+                    return price <= value
+                if op == "ge":
+                    return price >= value
+                return np.abs(price - value) <= value * TOLERANCE
+        values, rows = self.arrays[f"{attribute}_values"], self.arrays[f"{attribute}_rows"]
+        if attribute == "package":
+            lo, hi = np.searchsorted(values, value, "left"), np.searchsorted(values, value, "right")
+        elif op == "le":
+            lo, hi = 0, np.searchsorted(values, value * (1 + TOLERANCE), "right")
+        elif op == "ge":
+            lo, hi = np.searchsorted(values, value * (1 - TOLERANCE), "left"), len(values)
+        else:
+            lo = np.searchsorted(values, value * (1 - TOLERANCE), "left")
+            hi = np.searchsorted(values, value * (1 + TOLERANCE), "right")
+        mask[rows[lo:hi]] = True
+        return mask
+
+    def search(self, constraints, category=None, source=None, limit=10):
+        """Products matching every constraint, cheapest first; returns (total, products)."""
+        mask = np.ones(self.size, dtype=bool)
+        if source:
+            mask &= self.arrays["source"] == source
+        elif category:
+            mask &= self.arrays["category"] == category
+        for attribute, op, value in constraints:
+            mask &= self._rows(attribute, op, value)
+        rows = np.flatnonzero(mask)
+        price = self.arrays["price"][rows]
+        rows = rows[np.argsort(np.where(np.isnan(price), np.inf, price), kind="stable")]
+        products = [
+            {name: str(self.arrays[name][row]) for name in ("id", "title", "price_text", "category", "source", "url")}
+            for row in rows[:limit]
+        ]
+        return len(rows), products
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query")
+    parser.add_argument("--persist-directory", default="eca_products_vector_db")
+    parser.add_argument("--category", default="")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    index = SpecIndex(os.path.join(args.persist_directory, INDEX_FILE))
+    constraints = parse_constraints(args.query)
+    print(f"constraints: {constraints}")
+    started = time.perf_counter()
+    total, products = index.search(constraints, category=args.category or None, limit=args.limit)
+    print(f"{total} of {index.size} products in {(time.perf_counter() - started) * 1000:.2f} ms")
+    for product in products:
+        print(f"  {product['price_text'] or '-':>12}  {product['title']}")
@@ -0,0 +1,149 @@
+"""Push products saved by web_sc straight into the vector store.
+
+A VectorPipeline sits behind scrape_product: every new or changed product
+is put on a bounded asyncio queue (crawl workers wait while it is full),
+and one consumer task groups products into batches, chunks them exactly
+like ``ingest_eca_products.py --source jsonl``, embeds only chunk texts
+the store doesn't already have and upserts them, deleting the product's
+superseded chunks (in Chroma and the lexical index). Embedding and Chroma calls run in a worker thread, so
+crawling and ingesting overlap and a product is searchable seconds after
+it was scraped.
+
+    python stream_ingest.py            # crawl with the pipeline enabled
+"""
+import asyncio
+import time
+
+from embedding_cache import with_cache
+from lexical_index import open_index
+from query_cache import bump_store_version
+from ingest_eca_products import (
+    BATCH_SIZE,
+    PERSIST_DIRECTORY,
+    embedding_model_name,
+    load_embedding,
+    product_chunks,
+    upsert_batch,
+    with_id,
+)
+
+QUEUE_SIZE = 256
+FLUSH_INTERVAL = 2.0  # seconds a partial batch waits for more products
+
+class VectorPipeline:
+    def __init__(self, persist_directory=PERSIST_DIRECTORY, queue_size=QUEUE_SIZE,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, log=print):
+        self.persist_directory = persist_directory
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.log = log
+        self.queue = None
+        self.task = None
+        self.embedding = None
+        self.vectorstore = None
+        self.lexical = None
+        self.products = self.failed = 0
+        self.chunks_embedded = self.chunks_unchanged = self.chunks_deleted = 0
+        self.lag_total = self.lag_max = 0.0
+
+    async def start(self):
+        """Load the model and open the store (off the event loop), then start consuming."""
+        from langchain_chroma import Chroma
+
+        def open_store():
+            embedding = with_cache(load_embedding(), embedding_model_name())
+            vectorstore = Chroma(persist_directory=self.persist_directory, embedding_function=embedding)
+            return embedding, vectorstore, open_index(self.persist_directory)
+
+        self.embedding, self.vectorstore, self.lexical = await asyncio.to_thread(open_store)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    async def put(self, record):
+        """Queue one JSONL-style record; waits while the pipeline is behind."""
+        await self.queue.put((time.monotonic(), record))
+
+    async def close(self):
+        """Flush everything queued so far and stop the consumer."""
+        await self.queue.put(None)
+        await self.task
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+
+            try:
+                await asyncio.to_thread(self._ingest, [record for _, record in batch])
+            except Exception as e:
+                self.failed += len(batch)
+                self.log(f"❌ خطا در به‌روزرسانی پایگاه برداری ({len(batch)} محصول): {e}")
+                continue
+            now = time.monotonic()
+            for queued_at, _ in batch:
+                self.lag_total += now - queued_at
+                self.lag_max = max(self.lag_max, now - queued_at)
+            self.products += len(batch)
+
+    def _ingest(self, records):
+        # a product scraped twice in one batch only keeps its latest version
+        records = list({record["url"]: record for record in records}.values())
+        chunks = {}
+        for record in records:
+            for position, chunk in enumerate(product_chunks(record)):
+                chunk = with_id(chunk, record["url"], position)
+                chunks[chunk.id] = chunk
+
+        collection = self.vectorstore._collection
+        urls = [record["url"] for record in records]
+        stored = set(collection.get(where={"url": {"$in": urls}}, include=[])["ids"])
+
+        fresh = [chunk for chunk_id, chunk in chunks.items() if chunk_id not in stored]
+        if fresh:
+            vectors = self.embedding.embed_documents([c.page_content for c in fresh])
+            upsert_batch(self.vectorstore, fresh, vectors, self.lexical)
+        # unchanged chunks too, in case the store predates the lexical index
+        self.lexical.add(chunk for chunk_id, chunk in chunks.items() if chunk_id in stored)
+        stale = [chunk_id for chunk_id in stored if chunk_id not in chunks]
+        if stale:
+            collection.delete(ids=stale)
+            self.lexical.delete(stale)
+        if fresh or stale:
+            bump_store_version(self.persist_directory)
+
+        self.chunks_embedded += len(fresh)
+        self.chunks_unchanged += len(chunks) - len(fresh)
+        self.chunks_deleted += len(stale)
+
+    def summary(self) -> str:
+        mean_lag = self.lag_total / self.products if self.products else 0.0
+        return (
+            f"{self.products} محصول، {self.chunks_embedded} chunk جدید، {self.chunks_unchanged} بدون تغییر، "
+            f"{self.chunks_deleted} حذف، {self.failed} خطا — تأخیر تا جستجوپذیری: "
+            f"میانگین {mean_lag:.1f}s، بیشینه {self.lag_max:.1f}s"
+        )
+
+if __name__ == "__main__":
+    import web_sc
+
+    web_sc.PIPELINE = True
+    asyncio.run(web_sc.scrape())
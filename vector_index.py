@@ -0,0 +1,310 @@
+"""Memory-mapped vector index exported from the Chroma collection.
+
+The catalog's embedding matrix is a few MB, so instead of asking Chroma
+(with a metadata filter) on every query, the collection is exported once
+into flat files under <vector store>/mmap_index/: a float16 (or int8 with
+per-row scales) matrix whose rows are sorted by category and source, so
+every category and every source is one contiguous slice, plus the row
+norms, ids, texts and metadata. Loading maps the files without reading
+them. A filtered query touches only its slice: the first time, the slice
+is converted to unit-norm float32 (float16 -> float32 conversion is the
+slow part, so it is done once per process), then every query is one
+matrix-vector product plus MMR over the best fetch_k rows in numpy.
+
+ingest_eca_products.py re-exports after every run that changed the
+store. Select it in rag_system with VECTOR_BACKEND=mmap.
+
+    python vector_index.py export [--dtype int8]
+    python vector_index.py bench
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+
+INDEX_DIR = "mmap_index"  # inside the vector store directory
+CURRENT_FILE = "current.json"
+DTYPE = os.getenv("MMAP_INDEX_DTYPE", "float16")  # or "int8"
+PAGE_SIZE = 5000
+
+def _write_strings(path, values):
+    """Strings as one UTF-8 blob plus an offsets array."""
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(path + ".bin", "wb") as f:
+        for i, value in enumerate(values):
+            data = value.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(path + ".offsets.npy", offsets)
+
+class _Strings:
+    def __init__(self, path):
+        self.offsets = np.load(path + ".offsets.npy", mmap_mode="r")
+        size = int(self.offsets[-1])
+        self.data = np.memmap(path + ".bin", dtype=np.uint8, mode="r") if size else np.zeros(0, np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[int(self.offsets[i]):int(self.offsets[i + 1])].tobytes().decode("utf-8")
+
+def export(collection, directory: str, dtype: str = DTYPE) -> int:
+    """Write the collection as a new index version and make it current."""
+    ids, vectors, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+        documents.extend(text or "" for text in page["documents"])
+        metadatas.extend(metadata or {} for metadata in page["metadatas"])
+        if len(page["ids"]) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    order = sorted(
+        range(len(ids)),
+        key=lambda i: (str(metadatas[i].get("category") or ""), str(metadatas[i].get("source") or ""), ids[i]),
+    )
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)[order] if ids else np.zeros((0, 0), np.float32)
+
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    target = os.path.join(directory, version)
+    os.makedirs(target)
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.zeros(0, np.float32)
+        scales[scales == 0] = 1.0
+        stored = np.round(matrix / scales[:, None]).astype(np.int8)
+        np.save(os.path.join(target, "scales.npy"), scales.astype(np.float32))
+        restored = stored.astype(np.float32) * scales[:, None]
+    else:
+        stored = matrix.astype(np.float16)
+        restored = stored.astype(np.float32)
+    np.save(os.path.join(target, "vectors.npy"), stored)
+    np.save(os.path.join(target, "norms.npy"), np.linalg.norm(restored, axis=1).astype(np.float32))
+
+    categories, sources = {}, {}
+    for row, i in enumerate(order):
+        for ranges, name in ((categories, metadatas[i].get("category")), (sources, metadatas[i].get("source"))):
+            spans = ranges.setdefault(str(name), [])
+            if spans and spans[-1][1] == row:
+                spans[-1][1] = row + 1
+            else:
+                spans.append([row, row + 1])
+    _write_strings(os.path.join(target, "ids"), [ids[i] for i in order])
+    _write_strings(os.path.join(target, "documents"), [documents[i] for i in order])
+    _write_strings(
+        os.path.join(target, "metadatas"), [json.dumps(metadatas[i], ensure_ascii=False) for i in order]
+    )
+    with open(os.path.join(target, "partitions.json"), "w", encoding="utf-8") as f:
+        json.dump({"dtype": dtype, "categories": categories, "sources": sources}, f, ensure_ascii=False)
+
+    current = os.path.join(directory, CURRENT_FILE)
+    try:
+        with open(current, "r", encoding="utf-8") as f:
+            previous = json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        previous = None
+    with open(current + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": version}, f)
+    os.replace(current + ".tmp", current)
+    # the previous version stays for one generation: a reader in another
+    # process may have read current.json but not opened its files yet.
+    # Readers that still map an older one keep their (unlinked) files.
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name not in (version, previous) and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+    return len(ids)
+
+def mmr(query, candidates, k, lambda_mult):
+    """Maximal marginal relevance over unit-norm rows; returns positions."""
+    relevance = candidates @ query
+    selected = [int(np.argmax(relevance))]
+    redundancy = candidates @ candidates[selected[0]]
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return selected
+
+class _Version:
+    """One exported version, mapped; the unit-norm blocks and the id -> row
+    map are filled on first use and belong to this version only."""
+
+    def __init__(self, path: str, version: str):
+        with open(os.path.join(path, "partitions.json"), "r", encoding="utf-8") as f:
+            partitions = json.load(f)
+        self.version = version
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(path, "norms.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if partitions["dtype"] == "int8" else None
+        self.ids = _Strings(os.path.join(path, "ids"))
+        self.documents = _Strings(os.path.join(path, "documents"))
+        self.metadatas = _Strings(os.path.join(path, "metadatas"))
+        self.categories = partitions["categories"]
+        self.sources = partitions["sources"]
+        self.blocks = {}
+        self.row_of = None
+
+    def spans(self, filter):
+        if not filter:
+            return [(0, len(self.ids))]
+        if "source" in filter:
+            return self.sources.get(filter["source"], [])
+        if "category" in filter:
+            return self.categories.get(filter["category"], [])
+        raise ValueError(f"unsupported filter: {filter}")
+
+    def rows(self, rows):
+        """Float32 unit-norm vectors of the given rows."""
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors / np.maximum(self.norms[rows], 1e-12)[:, None]
+
+    def block(self, start, end):
+        """Unit-norm float32 rows start:end, converted on first use."""
+        block = self.blocks.get((start, end))
+        if block is None:
+            block = self.blocks[(start, end)] = self.rows(np.arange(start, end))
+        return block
+
+    def top(self, embedding, k, filter):
+        """The k rows most similar (cosine) to the embedding, best first."""
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        rows, scores = [], []
+        for start, end in self.spans(filter):
+            scores.append(self.block(start, end) @ query)
+            rows.append(np.arange(start, end))
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        return rows[np.argsort(-scores, kind="stable")]
+
+    def document(self, row):
+        from langchain_core.documents import Document
+
+        row = int(row)
+        return Document(page_content=self.documents[row], metadata=json.loads(self.metadatas[row]), id=self.ids[row])
+
+    def rows_of(self, ids):
+        if self.row_of is None:
+            self.row_of = {self.ids[row]: row for row in range(len(self.ids))}
+        return [self.row_of[i] for i in ids if i in self.row_of]
+
+class VectorIndex:
+    """A read-only vector store over an exported index, with the parts of
+    the Chroma interface rag_system uses.
+
+    Safe to share between rag_service's request threads: a new export is
+    loaded into its own _Version and swapped in with one assignment, and
+    every query works on the version it started with.
+    """
+
+    def __init__(self, directory: str, embeddings=None):
+        self.directory = directory
+        self.embeddings = embeddings
+        self.current = None
+        self.checked = None
+        self.lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> _Version:
+        """Switch to a newer export if ingest wrote one; one stat when not."""
+        with self.lock:
+            current = os.path.join(self.directory, CURRENT_FILE)
+            stat = os.stat(current)
+            if (stat.st_mtime_ns, stat.st_size) != self.checked:
+                with open(current, "r", encoding="utf-8") as f:
+                    version = json.load(f)["version"]
+                if self.current is None or version != self.current.version:
+                    self.current = _Version(os.path.join(self.directory, version), version)
+                self.checked = (stat.st_mtime_ns, stat.st_size)
+            return self.current
+
+    @property
+    def version(self):
+        return self.current.version
+
+    def __len__(self):
+        return len(self.current.ids)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        version = self.refresh()
+        return [version.document(row) for row in version.top(embedding, k, filter)]
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k=4, fetch_k=20, lambda_mult=0.5, filter=None,
+                                                **kwargs):
+        version = self.refresh()
+        rows = version.top(embedding, fetch_k, filter)
+        if not len(rows):
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        picked = mmr(query, version.rows(rows), k, lambda_mult)
+        return [version.document(rows[i]) for i in picked]
+
+    def get_by_ids(self, ids):
+        version = self.refresh()
+        return [version.document(row) for row in version.rows_of(ids)]
+
+def open_index(persist_directory: str, embeddings=None) -> VectorIndex:
+    return VectorIndex(os.path.join(persist_directory, INDEX_DIR), embeddings)
+
+def bench(index: VectorIndex, queries: int):
+    version = index.refresh()
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, len(index), size=queries)
+    vectors = version.rows(np.sort(rows))
+    for label, filters in (
+        ("unfiltered", [None] * queries),
+        ("category", [{"category": json.loads(version.metadatas[int(r)])["category"]} for r in np.sort(rows)]),
+        ("source", [{"source": json.loads(version.metadatas[int(r)])["source"]} for r in np.sort(rows)]),
+    ):
+        started = time.perf_counter()
+        for vector, flt in zip(vectors, filters):
+            version.top(vector, 6, flt)
+        search_ms = (time.perf_counter() - started) * 1000 / queries
+        started = time.perf_counter()
+        for vector, flt in zip(vectors, filters):
+            index.max_marginal_relevance_search_by_vector(vector, k=3, fetch_k=6, lambda_mult=0.5, filter=flt)
+        mmr_ms = (time.perf_counter() - started) * 1000 / queries
+        print(f"{label:<11} top-6 {search_ms:.3f} ms, MMR + documents {mmr_ms:.3f} ms per query")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--persist-directory", default="eca_products_vector_db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export")
+    p_export.add_argument("--dtype", choices=["float16", "int8"], default=DTYPE)
+    p_bench = sub.add_parser("bench")
+    p_bench.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=args.persist_directory).get_collection("langchain")
+        started = time.perf_counter()
+        count = export(collection, os.path.join(args.persist_directory, INDEX_DIR), args.dtype)
+        print(f"✅ Exported {count} vectors ({args.dtype}) in {time.perf_counter() - started:.1f}s")
+    else:
+        started = time.perf_counter()
+        index = open_index(args.persist_directory)
+        version = index.current
+        print(f"{len(index)} vectors, {len(version.categories)} categories, {len(version.sources)} sources; "
+              f"opened in {(time.perf_counter() - started) * 1000:.1f} ms")
+        bench(index, args.queries)
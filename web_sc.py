@@ -1,56 +1,199 @@
 import asyncio
+import multiprocessing
 import os
 import random
 from playwright.async_api import async_playwright
-import re
 from datetime import datetime
 import json
-from html import unescape
-
-def clean_name(name: str) -> str:
-    if not name:
-        return "unknown"
-    name = re.sub(r'[\\/:*?"<>|]', '-', name)
-    name = name.replace('/', '-').replace('\\', '-')
-    return name.strip()
-
-def clean_html(html_text: str) -> str:
-    if not html_text:
-        return ""
-    text = re.sub(r'<br\s*/?>', '\n', html_text)
-    text = re.sub(r'</?p[^>]*>', '\n', text)
-    text = re.sub(r'<[^>]+>', '', text)
-    text = unescape(text)
-    text = re.sub(r'\n\s*\n+', '\n\n', text)
-    text = re.sub(r'[ \t]+', ' ', text)
-    return text.strip()
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import aclosing
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from crawl_state import CrawlState, compact_jsonl
+from output_sink import OutputSink
+from product_record import build_record, clean_html
+from product_store import ProductStore
+from rate_control import (
+    RETRY_STATUSES, HostPacer, RetryableError, RetryBudget,
+    backoff_delay, host_of, parse_retry_after,
+)
+
+try:
+    import httpx
+    from selectolax.parser import HTMLParser
+except ImportError:  # the browser path works without them
+    httpx = None
+    HTMLParser = None
 
 LIMIT_SUBCATEGORIES = None
 LIMIT_CATEGORY_ITEMS = 20
 LIMIT_PRODUCTS = 2500
+CONCURRENCY = 4
+QUEUE_SIZE = 100
+# set by crawl_coordinator.py: this process only walks the top-level
+# categories whose menu index % SHARD_COUNT == SHARD_INDEX
+SHARD_INDEX = 0
+SHARD_COUNT = 1
 SAVE_TXT = True
 SAVE_JSONL = True
+SAVE_STORE = True
+# push every new/changed product into the vector store while crawling
+# (stream_ingest.py); the queue bounds how far ingest may fall behind
+PIPELINE = False
+PIPELINE_QUEUE_SIZE = 256
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_URL = "https://eshop.eca.ir"
 OUTPUT_DIR = "eca_products_short"
 JSONL_FILENAME = "products_dataset_short.jsonl"
+STATE_FILENAME = "crawl_state.sqlite3"
+STORE_FILENAME = "products_store.sqlite3"  # relative to the script dir, or absolute
+# RESUME keeps the JSONL and crawl state of the previous run; products and
+# listings fetched less than REFRESH_AFTER_HOURS ago are skipped
+RESUME = True
+REFRESH_AFTER_HOURS = 24
 MIN_DELAY = 2
 MAX_DELAY = 4
 TIMEOUT = 120000
+SINK_QUEUE_SIZE = 1000
+SINK_FLUSH_INTERVAL = 1.0
+# processes that clean descriptions and format records; 0 runs them inline
+POSTPROCESS_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# adaptive pacing (per host) replaces the fixed sleeps between page loads;
+# human_wait is only used after menu clicks
+PACE_INITIAL_INTERVAL = 1.0
+PACE_MIN_INTERVAL = 0.1
+PACE_MAX_INTERVAL = 30
+PACE_TARGET_LATENCY = 3.0
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 2
+RETRY_MAX_DELAY = 60
+RETRY_BUDGET_RATIO = 0.2
+BREAKER_THRESHOLD = 8
+BREAKER_COOLDOWN = 120
+
+# "http": fetch product pages with a pooled HTTP client and parse the
+# server-rendered HTML, falling back to the browser when a required field
+# is missing. "evaluate": navigate with Playwright, block heavy resources
+# and read every field in a single page.evaluate call. "browser": the
+# original per-selector Playwright extraction, kept as a baseline.
+CRAWL_MODE = "http"
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+REQUIRED_FIELDS = ("title",)
+HTTP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+    "Accept-Language": "fa-IR,fa;q=0.9,en;q=0.8",
+}
+
+TITLE_SELECTOR = "#mainProduct h1"
+PRICE_SELECTOR = "span.current-price.fa-number-conv"
+SHORT_DESC_SELECTOR = "div.product-description-short.typo"
+DESC_SELECTOR = "div.product-description.typo"
+SPEC_NAME_SELECTOR = "section.product-features dl.data-sheet dt.name"
+SPEC_VALUE_SELECTOR = "section.product-features dl.data-sheet dd.value"
+PRODUCT_LINK_SELECTOR = "#js-product-list article a"
+PAGINATION_SELECTOR = "#js-product-list .pagination a"
+# listing pages fetched ahead of the one whose products are being queued
+LISTING_PREFETCH = 3
 
 product_counter = 0
+products_reserved = 0
 start_time = None
 log_file = None
 jsonl_file = None
+http_client = None
+state = None
+records_updated = 0
+sink = None
+listing_pages = None
+postprocess_pool = None
+store = None
+store_executor = None
+pipeline = None
+extract_timings = {}
+pacers = {}
+retry_budget = RetryBudget(RETRY_BUDGET_RATIO)
 
 async def human_wait():
     await asyncio.sleep(random.uniform(MIN_DELAY, MAX_DELAY))
 
+def get_pacer(url):
+    host = host_of(url)
+    if host not in pacers:
+        pacers[host] = HostPacer(
+            host,
+            initial_interval=PACE_INITIAL_INTERVAL,
+            min_interval=PACE_MIN_INTERVAL,
+            max_interval=PACE_MAX_INTERVAL,
+            target_latency=PACE_TARGET_LATENCY,
+            breaker_threshold=BREAKER_THRESHOLD,
+            breaker_cooldown=BREAKER_COOLDOWN,
+            log=log_message,
+        )
+    return pacers[host]
+
+async def paced_goto(page, url, wait_until="networkidle"):
+    pacer = get_pacer(url)
+    await pacer.acquire()
+    started = time.perf_counter()
+    try:
+        response = await page.goto(url, wait_until=wait_until, timeout=TIMEOUT)
+    except Exception:
+        pacer.record(time.perf_counter() - started, error=True)
+        raise
+    status = response.status if response else None
+    retry_after = parse_retry_after(response.headers.get("retry-after")) if response else None
+    pacer.record(time.perf_counter() - started, status, retry_after=retry_after)
+    if status in RETRY_STATUSES:
+        raise RetryableError(url, status, retry_after)
+    return response
+
+async def paced_get(url):
+    pacer = get_pacer(url)
+    await pacer.acquire()
+    started = time.perf_counter()
+    try:
+        response = await http_client.get(url)
+    except Exception:
+        pacer.record(time.perf_counter() - started, error=True)
+        raise
+    retry_after = parse_retry_after(response.headers.get("retry-after"))
+    pacer.record(time.perf_counter() - started, response.status_code, retry_after=retry_after)
+    if response.status_code in RETRY_STATUSES:
+        raise RetryableError(url, response.status_code, retry_after)
+    response.raise_for_status()
+    return response
+
+def limit_reached() -> bool:
+    return bool(LIMIT_PRODUCTS) and product_counter >= LIMIT_PRODUCTS
+
+def reserve_product_slot() -> bool:
+    # workers reserve a slot before scraping so that concurrent pages never
+    # push the saved count past LIMIT_PRODUCTS
+    global products_reserved
+    if LIMIT_PRODUCTS and products_reserved >= LIMIT_PRODUCTS:
+        return False
+    products_reserved += 1
+    return True
+
+def release_product_slot():
+    global products_reserved
+    products_reserved -= 1
+
 def log_message(msg):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     log_line = f"[{timestamp}] {msg}"
     print(log_line)
-    if log_file:
+    if not log_file:
+        return
+    if sink is not None and sink.running:
+        sink.append_line(log_file, log_line)
+    else:
         with open(log_file, "a", encoding="utf-8") as f:
             f.write(log_line + "\n")
 
@@ -71,264 +214,671 @@ async def get_text(page, selector):
     except:
         return None
 
-async def scrape_product(page, product_url, category_name, subcategory_name):
-    global product_counter
-
-    if LIMIT_PRODUCTS and product_counter >= LIMIT_PRODUCTS:
-        log_message("⛔ به محدودیت تست رسیدیم — توقف اسکرپ محصول.")
-        return False
-
-    try:
-        await page.goto(product_url, wait_until="networkidle", timeout=TIMEOUT)
-
-        title = await get_text(page, "#mainProduct h1")
-        
-        price = None
-        try:
-            price_elem = await page.query_selector("span.current-price.fa-number-conv")
-            if price_elem:
-                price = await price_elem.inner_text()
-        except:
-            pass
-        
-        short_desc = None
-        try:
-            short_desc_elem = await page.query_selector("div.product-description-short.typo")
-            if short_desc_elem:
-                short_desc = await short_desc_elem.inner_text()
-        except:
-            pass
-        
-        desc_html = None
-        desc_clean = None
-        try:
-            desc_elem = await page.query_selector("div.product-description.typo")
-            if desc_elem:
-                desc_html = await desc_elem.inner_html()
-                desc_clean = clean_html(desc_html)
-        except:
-            pass
-        
-        specs = {}
-        specs_text = ""
-        try:
-            spec_names = await page.query_selector_all("section.product-features dl.data-sheet dt.name")
-            spec_values = await page.query_selector_all("section.product-features dl.data-sheet dd.value")
-            
-            if spec_names and spec_values and len(spec_names) == len(spec_values):
-                for i in range(len(spec_names)):
-                    name = await spec_names[i].inner_text()
-                    value = await spec_values[i].inner_text()
-                    specs[name] = value
-                    specs_text += f"{name}: {value}\n"
-        except:
-            pass
-
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        if SAVE_TXT:
-            folder = os.path.join(
-                script_dir,
-                OUTPUT_DIR, 
-                clean_name(category_name),
-                clean_name(subcategory_name)
-            )
-            os.makedirs(folder, exist_ok=True)
-            filename = clean_name(title[:50]) + ".txt"
-            filepath = os.path.join(folder, filename)
-
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(f"URL: {product_url}\n")
-                f.write(f"{'='*80}\n\n")
-                f.write(f"عنوان:\n{title}\n\n")
-                if price:
-                    f.write(f"قیمت:\n{price}\n\n")
-                if short_desc:
-                    f.write(f"توضیحات کوتاه:\n{short_desc}\n\n")
-                if specs_text:
-                    f.write(f"مشخصات فنی:\n{specs_text}\n")
-                if desc_clean:
-                    f.write(f"توضیحات کامل:\n{desc_clean}\n\n")
-        
-        if SAVE_JSONL:
-            combined_text = f"عنوان: {title or ''}"
-            if short_desc:
-                combined_text += f". توضیحات کوتاه: {short_desc}"
-            if specs:
-                specs_str = ", ".join([f"{k}: {v}" for k, v in specs.items()])
-                combined_text += f". مشخصات: {specs_str}"
-            if desc_clean:
-                combined_text += f". توضیحات: {desc_clean[:500]}"
-            
-            product_data = {
-                "id": f"prod_{product_counter:04d}",
-                "url": product_url,
-                "title": title,
-                "price": price,
-                "short_desc": short_desc,
-                "specs": specs,
-                "description": desc_clean,
-                "category": category_name,
-                "subcategory": subcategory_name,
-                "combined_text": combined_text
-            }
-            
-            with open(jsonl_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(product_data, ensure_ascii=False) + "\n")
-
-        product_counter += 1
-        log_message(f"✅ محصول ذخیره شد [{product_counter}/{LIMIT_PRODUCTS}]: {title}")
-
-        return True
-
-    except Exception as e:
-        log_message(f"❌ خطا در اسکرپ محصول {product_url}: {e}")
-        return False
+async def extract_product_browser(page, product_url):
+    await paced_goto(page, product_url, "networkidle")
 
-async def scrape():
-    global start_time, log_file, jsonl_file
-    
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    full_output_dir = os.path.join(script_dir, OUTPUT_DIR)
-    os.makedirs(full_output_dir, exist_ok=True)
+    title = await get_text(page, TITLE_SELECTOR)
     
-    log_filename = f"scrape_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    log_file = os.path.join(full_output_dir, log_filename)
+    price = None
+    try:
+        price_elem = await page.query_selector(PRICE_SELECTOR)
+        if price_elem:
+            price = await price_elem.inner_text()
+    except:
+        pass
     
-    if SAVE_JSONL:
-        jsonl_file = os.path.join(script_dir, JSONL_FILENAME)
-        if os.path.exists(jsonl_file):
-            os.remove(jsonl_file)
+    short_desc = None
+    try:
+        short_desc_elem = await page.query_selector(SHORT_DESC_SELECTOR)
+        if short_desc_elem:
+            short_desc = await short_desc_elem.inner_text()
+    except:
+        pass
     
-    start_time = datetime.now()
-    log_message("=" * 60)
-    log_message("🚀 شروع اسکرپ")
-    log_message(f"⚙️ تنظیمات: SUBCATEGORIES={LIMIT_SUBCATEGORIES}, ITEMS={LIMIT_CATEGORY_ITEMS}, PRODUCTS={LIMIT_PRODUCTS}")
-    log_message(f"💾 ذخیره TXT: {SAVE_TXT}, ذخیره JSONL: {SAVE_JSONL}")
-    log_message("=" * 60)
+    desc_html = None
+    try:
+        desc_elem = await page.query_selector(DESC_SELECTOR)
+        if desc_elem:
+            desc_html = await desc_elem.inner_html()
+    except:
+        pass
     
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=True)
-        page = await browser.new_page()
-        page.set_default_timeout(TIMEOUT)
+    specs = {}
+    try:
+        spec_names = await page.query_selector_all(SPEC_NAME_SELECTOR)
+        spec_values = await page.query_selector_all(SPEC_VALUE_SELECTOR)
         
+        if spec_names and spec_values and len(spec_names) == len(spec_values):
+            for i in range(len(spec_names)):
+                name = await spec_names[i].inner_text()
+                value = await spec_values[i].inner_text()
+                specs[name] = value
+    except:
+        pass
+
+    return {
+        "title": title,
+        "price": price,
+        "short_desc": short_desc,
+        "desc_html": desc_html,
+        "specs": specs,
+    }
+
+def node_text(node, single_line=False):
+    # rough equivalent of Playwright's inner_text for server-rendered nodes
+    if node is None:
+        return None
+    text = clean_html(node.html)
+    if single_line:
+        text = " ".join(text.split())
+    return text
+
+def parse_product_html(html):
+    tree = HTMLParser(html)
+
+    desc_node = tree.css_first(DESC_SELECTOR)
+    spec_names = tree.css(SPEC_NAME_SELECTOR)
+    spec_values = tree.css(SPEC_VALUE_SELECTOR)
+
+    specs = {}
+    if spec_names and spec_values and len(spec_names) == len(spec_values):
+        for name_node, value_node in zip(spec_names, spec_values):
+            specs[node_text(name_node, True)] = node_text(value_node, True)
+
+    return {
+        "title": node_text(tree.css_first(TITLE_SELECTOR), True),
+        "price": node_text(tree.css_first(PRICE_SELECTOR), True),
+        "short_desc": node_text(tree.css_first(SHORT_DESC_SELECTOR)),
+        "desc_html": desc_node.html if desc_node is not None else None,
+        "specs": specs,
+    }
+
+async def extract_product_http(product_url):
+    response = await paced_get(product_url)
+    return parse_product_html(response.text)
+
+def missing_fields(fields):
+    if not fields:
+        return list(REQUIRED_FIELDS)
+    return [name for name in REQUIRED_FIELDS if not fields.get(name)]
+
+EXTRACT_PRODUCT_JS = """
+(sel) => {
+    const one = (selector) => document.querySelector(selector);
+    const text = (el) => (el ? el.innerText : null);
+    const all = (selector) => Array.from(document.querySelectorAll(selector), (el) => el.innerText);
+    const desc = one(sel.desc);
+    return {
+        title: text(one(sel.title)),
+        price: text(one(sel.price)),
+        short_desc: text(one(sel.shortDesc)),
+        desc_html: desc ? desc.innerHTML : null,
+        spec_names: all(sel.specName),
+        spec_values: all(sel.specValue),
+    };
+}
+"""
+
+async def block_resources(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+        return
+    if request.resource_type == "script" and urlparse(request.url).hostname != urlparse(BASE_URL).hostname:
+        await route.abort()
+        return
+    await route.continue_()
+
+async def extract_product_evaluate(page, product_url):
+    await paced_goto(page, product_url, "domcontentloaded")
+    try:
+        await page.wait_for_selector(TITLE_SELECTOR, state="attached", timeout=6000)
+    except:
+        pass
+
+    data = await page.evaluate(EXTRACT_PRODUCT_JS, {
+        "title": TITLE_SELECTOR,
+        "price": PRICE_SELECTOR,
+        "shortDesc": SHORT_DESC_SELECTOR,
+        "desc": DESC_SELECTOR,
+        "specName": SPEC_NAME_SELECTOR,
+        "specValue": SPEC_VALUE_SELECTOR,
+    })
+
+    names, values = data.pop("spec_names"), data.pop("spec_values")
+    data["specs"] = dict(zip(names, values)) if len(names) == len(values) else {}
+    return data
+
+async def extract_product_page(page, product_url):
+    if CRAWL_MODE == "browser":
+        return await extract_product_browser(page, product_url), "browser"
+    return await extract_product_evaluate(page, product_url), "evaluate"
+
+async def extract_product(page, product_url):
+    if CRAWL_MODE == "http" and http_client is not None:
+        fields = None
         try:
-            await page.goto(BASE_URL, wait_until="networkidle", timeout=TIMEOUT)
+            fields = await extract_product_http(product_url)
+        except RetryableError:
+            # the site is pushing back; retry later instead of hitting it with a browser
+            raise
         except Exception as e:
-            log_message(f"❌ خطا در باز کردن صفحه اصلی: {e}")
-            log_message("⚠️ در حال تلاش مجدد با domcontentloaded...")
-            await page.goto(BASE_URL, wait_until="domcontentloaded", timeout=TIMEOUT)
+            log_message(f"⚠️ خطای HTTP برای {product_url}: {e}")
 
-        await safe_click(page, "#header-main-menu .left-nav-trigger")
+        missing = missing_fields(fields)
+        if not missing:
+            return fields, "http"
+        log_message(f"↩️ فیلدهای ناقص ({', '.join(missing)}) — استفاده از مرورگر: {product_url}")
 
-        await safe_click(page,
-            "#index .st-menu .js-sidebar-category-tree > div > ul > li:nth-child(2) > div.js-collapse-trigger"
-        )
+    return await extract_product_page(page, product_url)
 
-        sub_links = await page.query_selector_all(
-            "#index .js-sub-categories.expanded > ul > li > a"
+async def with_retries(action, url):
+    retry_budget.record_attempt()
+    attempt = 0
+    while True:
+        try:
+            return await action()
+        except Exception as e:
+            if attempt >= MAX_RETRIES or not retry_budget.try_spend():
+                raise
+            delay = backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+            if isinstance(e, RetryableError) and e.retry_after:
+                delay = max(delay, e.retry_after)
+            attempt += 1
+            log_message(f"🔁 تلاش مجدد {attempt}/{MAX_RETRIES} پس از {delay:.1f} ثانیه: {url} ({e})")
+            await asyncio.sleep(delay)
+
+def record_timing(mode, seconds):
+    extract_timings.setdefault(mode, []).append(seconds)
+
+def log_timing_summary():
+    for mode, values in sorted(extract_timings.items()):
+        ordered = sorted(values)
+        p50 = ordered[len(ordered) // 2]
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        mean = sum(ordered) / len(ordered)
+        log_message(
+            f"⏱️ استخراج [{mode}]: {len(ordered)} محصول، "
+            f"میانگین {mean * 1000:.0f}ms، p50 {p50 * 1000:.0f}ms، p95 {p95 * 1000:.0f}ms"
         )
 
-        sub_links_data = []
-        for link in sub_links:
-            url = await link.get_attribute("href")
-            name = await link.inner_text()
-            if url:
-                sub_links_data.append((name.strip(), url))
-
-        log_message(f"🔵 تعداد زیر دسته‌ها پیدا شده: {len(sub_links_data)}")
+async def save_product(built, product_url):
+    global product_counter, records_updated
 
-        if LIMIT_SUBCATEGORIES:
-            sub_links_data = sub_links_data[:LIMIT_SUBCATEGORIES]
-            log_message(f"🔵 محدود شده به: {len(sub_links_data)} زیر دسته")
+    digest = built["digest"]
+    if SAVE_STORE:
+        # the store dedups by content hash itself, so it is always offered the record
+        await in_store_thread(store.upsert, {"id": state.product_id(product_url), **built["record"]}, digest)
 
-        for sub_index, (sub_name, sub_url) in enumerate(sub_links_data, 1):
-
-            global product_counter
-            if LIMIT_PRODUCTS and product_counter >= LIMIT_PRODUCTS:
-                log_message("⛔ پایان — محدودیت تست رسید.")
-                break   
-            def absolute(url: str) -> str:
-                if not url:
-                    return ""
-                if url.startswith("http"):
-                    return url
-                return "https://eshop.eca.ir" + url
+    # unchanged products only get their fetch time refreshed
+    previous_digest = state.stored_hash(product_url)
+    if previous_digest == digest:
+        state.mark_done(product_url)
+        product_counter += 1
+        return built["title"], False
 
-            full_sub_url = absolute(sub_url)
+    # the new hash is only recorded once the sink has flushed the product to
+    # disk; a crash before that leaves it stale, so the next run rewrites it
+    loop = asyncio.get_running_loop()
+    done = lambda: loop.call_soon_threadsafe(state.mark_done, product_url, digest)
+    save_txt = SAVE_TXT and built["txt_path"]
+    if save_txt:
+        await sink.write(built["txt_path"], built["txt"], None if SAVE_JSONL else done)
 
-            log_message(f"\n📂 [{sub_index}/{len(sub_links_data)}] زیر‌دسته: {sub_name}")
-            await page.goto(full_sub_url, wait_until="networkidle")
-            await human_wait()
+    if SAVE_JSONL:
+        product_data = {"id": state.product_id(product_url), **built["record"]}
+        await sink.append(jsonl_file, json.dumps(product_data, ensure_ascii=False), done)
+        if previous_digest is not None:
+            records_updated += 1
+
+    if not save_txt and not SAVE_JSONL:
+        state.mark_done(product_url, digest)
+    product_counter += 1
+    return built["title"], True
+
+async def in_store_thread(fn, *args):
+    """Run a ProductStore call on the store's own thread, off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(store_executor, fn, *args)
+
+async def postprocess(fields, product_url, category_name, subcategory_name):
+    """Clean the description and build the TXT/JSONL payloads off the event loop."""
+    txt_root = os.path.join(SCRIPT_DIR, OUTPUT_DIR) if SAVE_TXT else None
+    args = (fields, product_url, category_name, subcategory_name, txt_root)
+    if postprocess_pool is None:
+        return build_record(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(postprocess_pool, build_record, *args)
+
+LISTING_JS = """
+([productSelector, pagerSelector]) => [
+    Array.from(document.querySelectorAll(productSelector), (a) => a.getAttribute("href")),
+    Array.from(document.querySelectorAll(pagerSelector), (a) => a.getAttribute("href")),
+]
+"""
+
+def absolute(url: str) -> str:
+    if not url:
+        return ""
+    if url.startswith("http"):
+        return url
+    return BASE_URL + url
+
+def with_page(url, page_number):
+    parts = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != "page"]
+    if page_number > 1:
+        query.append(("page", str(page_number)))
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+def page_number_of(url):
+    for key, value in parse_qsl(urlparse(url).query):
+        if key == "page" and value.isdigit():
+            return int(value)
+    return 1
+
+def parse_listing_links(hrefs, pager_hrefs):
+    product_urls = list(dict.fromkeys(absolute(h) for h in hrefs if h))
+    last_page = max([page_number_of(absolute(h)) for h in pager_hrefs if h] + [1])
+    return product_urls, last_page
+
+async def fetch_listing_browser(url):
+    page = await listing_pages.get()
+    try:
+        await paced_goto(page, url, "domcontentloaded")
+        try:
+            await page.wait_for_selector(PRODUCT_LINK_SELECTOR, state="attached", timeout=6000)
+        except:
+            pass
+        hrefs, pager_hrefs = await page.evaluate(LISTING_JS, [PRODUCT_LINK_SELECTOR, PAGINATION_SELECTOR])
+    finally:
+        listing_pages.put_nowait(page)
+    return parse_listing_links(hrefs, pager_hrefs)
+
+async def fetch_listing(url):
+    """Product URLs and the highest page number linked from one listing page."""
+    if http_client is not None:
+        response = await paced_get(url)
+        tree = HTMLParser(response.text)
+        product_urls, last_page = parse_listing_links(
+            [a.attributes.get("href") for a in tree.css(PRODUCT_LINK_SELECTOR)],
+            [a.attributes.get("href") for a in tree.css(PAGINATION_SELECTOR)],
+        )
+        if product_urls:
+            return product_urls, last_page
+        log_message(f"↩️ صفحه فهرست بدون محصول — استفاده از مرورگر: {url}")
+    return await fetch_listing_browser(url)
+
+async def iter_listing(listing_url):
+    """Yield (page_number, product_urls) for every page of a listing, in order.
+
+    While the caller is still queueing the products of one page, the next
+    LISTING_PREFETCH pages are being fetched; the window slides forward as
+    pages are consumed, including pages only linked from later pagination
+    blocks. Closing the generator cancels the pages still in flight.
+    """
+    product_urls, last_page = await with_retries(lambda: fetch_listing(listing_url), listing_url)
+
+    async def fetch_page(page_number):
+        url = with_page(listing_url, page_number)
+        return await with_retries(lambda: fetch_listing(url), url)
+
+    tasks = {}
+    page_number = 1
+    try:
+        while True:
+            for n in range(page_number + 1, min(last_page, page_number + LISTING_PREFETCH) + 1):
+                if n not in tasks:
+                    tasks[n] = asyncio.create_task(fetch_page(n))
+            yield page_number, product_urls
+
+            page_number += 1
+            if page_number > last_page:
+                break
+            product_urls, page_last = await (tasks.pop(page_number, None) or fetch_page(page_number))
+            last_page = max(last_page, page_last)
+            if not product_urls:
+                break
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        # let cancelled browser fetches hand their page back to the pool
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+async def enqueue_products(queue, product_urls, category_name, subcategory_name, max_age):
+    """Queue the stale products; returns False once LIMIT_PRODUCTS is reached."""
+    for url in product_urls:
+        if limit_reached():
+            return False
+        if state.is_fresh(url, max_age):
+            continue
+        await queue.put((url, category_name, subcategory_name))
+    return True
+
+async def walk_listing(queue, listing_url, category_name, subcategory_name, max_age):
+    """Stream a listing's product URLs into the scrape queue as pages arrive."""
+    if state.is_fresh(listing_url, max_age):
+        product_urls = [url for url, _, _ in state.children(listing_url, "product")]
+        if LIMIT_CATEGORY_ITEMS:
+            product_urls = product_urls[:LIMIT_CATEGORY_ITEMS]
+        log_message(f"      🟡 تعداد محصولات (از وضعیت ذخیره‌شده): {len(product_urls)}")
+        await enqueue_products(queue, product_urls, category_name, subcategory_name, max_age)
+        return
+
+    found = 0
+    complete = True
+    async with aclosing(iter_listing(listing_url)) as pages:
+        async for page_number, product_urls in pages:
+            for url in product_urls:
+                state.discover(url, "product", listing_url, category_name, subcategory_name)
+            log_message(f"      🟡 صفحه {page_number}: {len(product_urls)} محصول")
 
-            subcats = await page.query_selector_all(
-                "#js-product-list-header > aside > div.subcategories-wrapper a"
-            )
+            if LIMIT_CATEGORY_ITEMS:
+                product_urls = product_urls[:LIMIT_CATEGORY_ITEMS - found]
+            found += len(product_urls)
 
-            sub_subcats = []
-            for s in subcats:
-                url = await s.get_attribute("href")
-                name = await s.inner_text()
-                if url:
-                    sub_subcats.append((name.strip(), url))
+            if not await enqueue_products(queue, product_urls, category_name, subcategory_name, max_age):
+                complete = False
+                break
+            if LIMIT_CATEGORY_ITEMS and found >= LIMIT_CATEGORY_ITEMS:
+                break
 
-            if not sub_subcats:
-                sub_subcats = [(sub_name, sub_url)]
+    log_message(f"      🟡 تعداد محصولات پیدا شده: {found}")
+    # a listing cut short by LIMIT_PRODUCTS has undiscovered pages left
+    if complete:
+        state.mark_done(listing_url)
 
-            if LIMIT_CATEGORY_ITEMS:
-                sub_subcats = sub_subcats[:LIMIT_CATEGORY_ITEMS]
+async def scrape_product(page, product_url, category_name, subcategory_name):
+    if not reserve_product_slot():
+        log_message("⛔ به محدودیت تست رسیدیم — توقف اسکرپ محصول.")
+        return False
 
-            log_message(f"   📊 تعداد زیر زیر دسته‌ها: {len(sub_subcats)}")
+    async def timed_extract():
+        started = time.perf_counter()
+        fields, mode = await extract_product(page, product_url)
+        return fields, mode, time.perf_counter() - started
 
-            for sc_index, (sc_name, sc_url) in enumerate(sub_subcats, 1):
+    try:
+        fields, mode, elapsed = await with_retries(timed_extract, product_url)
+        record_timing(mode, elapsed)
+
+        built = await postprocess(fields, product_url, category_name, subcategory_name)
+        title, changed = await save_product(built, product_url)
+        if changed and pipeline is not None:
+            await pipeline.put({"id": state.product_id(product_url), **built["record"]})
+        if changed:
+            log_message(f"✅ محصول ذخیره شد [{product_counter}/{LIMIT_PRODUCTS}] ({mode}, {elapsed * 1000:.0f}ms): {title}")
+        else:
+            log_message(f"♻️ بدون تغییر [{product_counter}/{LIMIT_PRODUCTS}] ({mode}, {elapsed * 1000:.0f}ms): {title}")
 
-                if LIMIT_PRODUCTS and product_counter >= LIMIT_PRODUCTS:
-                    break
+        return True
 
-                full_page_url = absolute(sc_url)
+    except Exception as e:
+        release_product_slot()
+        state.mark_failed(product_url, e)
+        log_message(f"❌ خطا در اسکرپ محصول {product_url}: {e}")
+        return False
 
-                log_message(f"   🔸 [{sc_index}/{len(sub_subcats)}] زیر زیر دسته: {sc_name}")
-                await page.goto(full_page_url, wait_until="networkidle")
-                await human_wait()
+async def product_worker(worker_id, context, queue):
+    if CRAWL_MODE != "browser":
+        await context.route("**/*", block_resources)
+    page = await context.new_page()
+    page.set_default_timeout(TIMEOUT)
+    while True:
+        item = await queue.get()
+        try:
+            if item is None:
+                break
+            if limit_reached():
+                continue
+            url, category_name, subcategory_name = item
+            await scrape_product(page, url, category_name, subcategory_name)
+        finally:
+            queue.task_done()
+    await page.close()
+    log_message(f"🧵 کارگر {worker_id} متوقف شد")
 
-                products = await page.query_selector_all(
-                    "#js-product-list article a"
-                )
+async def scrape():
+    global start_time, log_file, jsonl_file, http_client, state, sink, listing_pages
+    global postprocess_pool, store, store_executor, pipeline
+    
+    script_dir = SCRIPT_DIR
+    full_output_dir = os.path.join(script_dir, OUTPUT_DIR)
+    os.makedirs(full_output_dir, exist_ok=True)
+    
+    log_filename = f"scrape_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    log_file = os.path.join(full_output_dir, log_filename)
+    
+    state_file = os.path.join(script_dir, STATE_FILENAME)
+    if not RESUME and os.path.exists(state_file):
+        os.remove(state_file)
+    state = CrawlState(state_file)
+    max_age = REFRESH_AFTER_HOURS * 3600 if REFRESH_AFTER_HOURS else None
 
-                product_urls = []
-                for p in products:
-                    href = await p.get_attribute("href")
-                    if href:
-                        product_urls.append(absolute(href))
+    try:
+        if SAVE_STORE:
+            # one thread owns the SQLite connection, so upserts stay in order
+            store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="product-store")
+            store = await in_store_thread(ProductStore, os.path.join(script_dir, STORE_FILENAME))
 
+        if SAVE_JSONL:
+            jsonl_file = os.path.join(script_dir, JSONL_FILENAME)
+            if not RESUME and os.path.exists(jsonl_file):
+                os.remove(jsonl_file)
+    
+        sink = OutputSink(maxsize=SINK_QUEUE_SIZE, flush_interval=SINK_FLUSH_INTERVAL).start()
+        if POSTPROCESS_WORKERS:
+            # spawn, not fork: the sink thread is already running
+            postprocess_pool = ProcessPoolExecutor(
+                max_workers=POSTPROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
 
-                log_message(f"      🟡 تعداد محصولات پیدا شده: {len(product_urls)}")
+        if PIPELINE:
+            from stream_ingest import VectorPipeline
+            pipeline = await VectorPipeline(queue_size=PIPELINE_QUEUE_SIZE, log=log_message).start()
 
-                if LIMIT_CATEGORY_ITEMS:
-                    product_urls = product_urls[:LIMIT_CATEGORY_ITEMS]
-                    log_message(f"      🟡 محدود شده به: {len(product_urls)} محصول")
+        start_time = datetime.now()
+        log_message("=" * 60)
+        log_message("🚀 شروع اسکرپ")
+        log_message(f"⚙️ تنظیمات: SUBCATEGORIES={LIMIT_SUBCATEGORIES}, ITEMS={LIMIT_CATEGORY_ITEMS}, PRODUCTS={LIMIT_PRODUCTS}, CONCURRENCY={CONCURRENCY}")
+        log_message(f"💾 ذخیره TXT: {SAVE_TXT}, ذخیره JSONL: {SAVE_JSONL}, پایگاه برداری همزمان: {PIPELINE}")
+        log_message(f"🗂️ ادامه از اجرای قبل: {RESUME}، محصولات تکمیل‌شده: {state.count('product', 'done')}")
+        log_message("=" * 60)
 
-                for url in product_urls:
-                    if LIMIT_PRODUCTS and product_counter >= LIMIT_PRODUCTS:
-                        break
+        if CRAWL_MODE == "http":
+            if httpx is None or HTMLParser is None:
+                log_message("⚠️ httpx/selectolax نصب نیست — استفاده از حالت مرورگر")
+            else:
+                http_client = httpx.AsyncClient(
+                    headers=HTTP_HEADERS,
+                    timeout=TIMEOUT / 1000,
+                    follow_redirects=True,
+                    limits=httpx.Limits(
+                        max_connections=CONCURRENCY * 2,
+                        max_keepalive_connections=CONCURRENCY,
+                    ),
+                )
+        log_message(f"🌐 حالت اسکرپ: {'http' if http_client else 'browser'}")
+    
+        async with async_playwright() as pw:
+            browser = await pw.chromium.launch(headless=True)
+            page = await browser.new_page()
+            page.set_default_timeout(TIMEOUT)
+
+            # pool of isolated contexts; the menu/listing walk below fills the
+            # queue while the workers drain it
+            queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+            contexts = [await browser.new_context() for _ in range(CONCURRENCY)]
+            workers = [
+                asyncio.create_task(product_worker(i, ctx, queue))
+                for i, ctx in enumerate(contexts, 1)
+            ]
+
+            # pages used to fetch listing pages (first page and prefetch)
+            listing_context = await browser.new_context()
+            await listing_context.route("**/*", block_resources)
+            listing_pages = asyncio.Queue()
+            for _ in range(LISTING_PREFETCH + 1):
+                listing_page = await listing_context.new_page()
+                listing_page.set_default_timeout(TIMEOUT)
+                listing_pages.put_nowait(listing_page)
+        
+            try:
+                try:
+                    await page.goto(BASE_URL, wait_until="networkidle", timeout=TIMEOUT)
+                except Exception as e:
+                    log_message(f"❌ خطا در باز کردن صفحه اصلی: {e}")
+                    log_message("⚠️ در حال تلاش مجدد با domcontentloaded...")
+                    await page.goto(BASE_URL, wait_until="domcontentloaded", timeout=TIMEOUT)
+
+                await safe_click(page, "#header-main-menu .left-nav-trigger")
+
+                await safe_click(page,
+                    "#index .st-menu .js-sidebar-category-tree > div > ul > li:nth-child(2) > div.js-collapse-trigger"
+                )
 
-                    await scrape_product(page, url, sub_name, sc_name)
-                    await human_wait()
+                sub_links = await page.query_selector_all(
+                    "#index .js-sub-categories.expanded > ul > li > a"
+                )
 
-        await browser.close()
-        
-        end_time = datetime.now()
-        duration = end_time - start_time
-        log_message("\n" + "=" * 60)
-        log_message("🎉 اسکرپ به پایان رسید")
-        log_message(f"📊 تعداد کل محصولات ذخیره شده: {product_counter}")
-        log_message(f"⏱️ مدت زمان: {duration}")
-        if SAVE_TXT:
-            log_message(f"📁 محل ذخیره TXT: {os.path.abspath(full_output_dir)}")
-        if SAVE_JSONL:
-            log_message(f"📄 فایل JSONL: {os.path.abspath(jsonl_file)}")
-        log_message(f"📋 فایل لاگ: {log_filename}")
-        log_message("=" * 60)
+                sub_links_data = []
+                for link in sub_links:
+                    url = await link.get_attribute("href")
+                    name = await link.inner_text()
+                    if url:
+                        sub_links_data.append((name.strip(), url))
+
+                log_message(f"🔵 تعداد زیر دسته‌ها پیدا شده: {len(sub_links_data)}")
+
+                if LIMIT_SUBCATEGORIES:
+                    sub_links_data = sub_links_data[:LIMIT_SUBCATEGORIES]
+                    log_message(f"🔵 محدود شده به: {len(sub_links_data)} زیر دسته")
+
+                if SHARD_COUNT > 1:
+                    sub_links_data = [
+                        item for index, item in enumerate(sub_links_data)
+                        if index % SHARD_COUNT == SHARD_INDEX
+                    ]
+                    log_message(f"🧩 شارد {SHARD_INDEX + 1}/{SHARD_COUNT}: {len(sub_links_data)} زیر دسته")
+
+                for sub_index, (sub_name, sub_url) in enumerate(sub_links_data, 1):
+
+                    if limit_reached():
+                        log_message("⛔ پایان — محدودیت تست رسید.")
+                        break   
+                    full_sub_url = absolute(sub_url)
+
+                    log_message(f"\n📂 [{sub_index}/{len(sub_links_data)}] زیر‌دسته: {sub_name}")
+                    state.discover(full_sub_url, "category", category=sub_name)
+
+                    category_fresh = state.is_fresh(full_sub_url, max_age)
+                    if category_fresh:
+                        sub_subcats = [(sc_name, url) for url, _, sc_name in state.children(full_sub_url, "listing")]
+                        if not sub_subcats:
+                            sub_subcats = [(sub_name, sub_url)]
+                    else:
+                        await with_retries(lambda: paced_goto(page, full_sub_url), full_sub_url)
+
+                        subcats = await page.query_selector_all(
+                            "#js-product-list-header > aside > div.subcategories-wrapper a"
+                        )
+
+                        sub_subcats = []
+                        for s in subcats:
+                            url = await s.get_attribute("href")
+                            name = await s.inner_text()
+                            if url:
+                                sub_subcats.append((name.strip(), url))
+
+                        if not sub_subcats:
+                            sub_subcats = [(sub_name, sub_url)]
+
+                        for sc_name, sc_url in sub_subcats:
+                            if absolute(sc_url) != full_sub_url:
+                                state.discover(absolute(sc_url), "listing", full_sub_url, sub_name, sc_name)
+
+                    if LIMIT_CATEGORY_ITEMS:
+                        sub_subcats = sub_subcats[:LIMIT_CATEGORY_ITEMS]
+
+                    log_message(f"   📊 تعداد زیر زیر دسته‌ها: {len(sub_subcats)}")
+
+                    for sc_index, (sc_name, sc_url) in enumerate(sub_subcats, 1):
+
+                        if limit_reached():
+                            break
+
+                        full_page_url = absolute(sc_url)
+
+                        log_message(f"   🔸 [{sc_index}/{len(sub_subcats)}] زیر زیر دسته: {sc_name}")
+
+                        await walk_listing(queue, full_page_url, sub_name, sc_name, max_age)
+                    else:
+                        # the category is only fresh once every listing under it was walked
+                        if not category_fresh:
+                            state.mark_done(full_sub_url)
+            finally:
+                # also on errors: the workers finish what is queued, so
+                # every product handed to the sink is saved
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+                for ctx in contexts:
+                    await ctx.close()
+                await listing_context.close()
+                await browser.close()
+    finally:
+        if pipeline is not None:
+            await pipeline.close()
+        if http_client is not None:
+            await http_client.aclose()
+
+        # drain pending TXT/JSONL writes; the products they complete are
+        # marked done before the state is closed. A write error is raised
+        # after the pool, store and state are closed.
+        try:
+            if sink is not None:
+                try:
+                    await asyncio.to_thread(sink.close)
+                except Exception as e:
+                    log_message(f"❌ خطا در نوشتن فایل‌های خروجی: {e}")
+                    raise
+                finally:
+                    await asyncio.sleep(0)  # the done callbacks of what was flushed
+        finally:
+            if postprocess_pool is not None:
+                postprocess_pool.shutdown()
+                postprocess_pool = None
+            if store is not None:
+                await in_store_thread(store.close)
+                store_executor.shutdown()
+            state.close()
+
+    if SAVE_JSONL and records_updated and os.path.exists(jsonl_file):
+        kept = compact_jsonl(jsonl_file)
+        log_message(f"🧹 JSONL فشرده شد: {records_updated} رکورد به‌روز، {kept} رکورد نهایی")
+
+    end_time = datetime.now()
+    duration = end_time - start_time
+    log_message("\n" + "=" * 60)
+    log_message("🎉 اسکرپ به پایان رسید")
+    log_message(f"📊 تعداد کل محصولات ذخیره شده: {product_counter}")
+    log_message(f"⏱️ مدت زمان: {duration}")
+    log_timing_summary()
+    if pipeline is not None:
+        log_message(f"🧠 پایگاه برداری: {pipeline.summary()}")
+    for pacer in pacers.values():
+        log_message(
+            f"🚦 {pacer.host}: {pacer.requests} درخواست، {pacer.failures} خطا، "
+            f"نرخ نهایی {pacer.rate:.2f} درخواست/ثانیه"
+        )
+    if SAVE_TXT:
+        log_message(f"📁 محل ذخیره TXT: {os.path.abspath(full_output_dir)}")
+    if SAVE_JSONL:
+        log_message(f"📄 فایل JSONL: {os.path.abspath(jsonl_file)}")
+    if SAVE_STORE:
+        log_message(f"🗄️ انبار محصولات: {os.path.abspath(store.path)}")
+    log_message(f"📋 فایل لاگ: {log_filename}")
+    log_message("=" * 60)
 
 
 if __name__ == "__main__":